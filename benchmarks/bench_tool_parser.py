@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark: single-pass tool command tokenizer vs. the previous regex parser.
+
+Usage:
+    python benchmarks/bench_tool_parser.py [--repeat N]
+
+The regex baseline reproduces the old ToolSystem.process_response, which
+first searched the response (has_tool_commands), then ran findall and built
+a ToolCommand for each match.
+"""
+
+import re
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.tool_parser import ToolCommand, ToolParser  # noqa: E402
+
+# The pattern ToolParser used before the tokenizer
+OLD_PATTERN = re.compile(r'\{tool\s+([^\s\}]+)(?:\s+([\s\S]+?))?\}', re.DOTALL)
+
+
+def old_process_response(text: str) -> list:
+    """Old two-pass parse: search, then findall and build the commands."""
+    if not OLD_PATTERN.search(text):
+        return []
+    commands = []
+    for tool_name, raw_args in OLD_PATTERN.findall(text):
+        tool_args = (raw_args or '').strip()
+        if tool_args:
+            raw_command = f"{{tool {tool_name} {tool_args}}}"
+        else:
+            raw_command = f"{{tool {tool_name}}}"
+        commands.append(ToolCommand(name=tool_name, args=tool_args, raw_command=raw_command))
+    return commands
+
+
+def make_prose(size: int) -> str:
+    """A response with no tool commands at all."""
+    sentence = "The quick brown fox jumps over the lazy dog while thinking about {braces}. "
+    return (sentence * (size // len(sentence) + 1))[:size]
+
+
+def make_many_commands(size: int) -> str:
+    """Many short commands separated by a little text."""
+    chunk = 'Reading next. {tool main.files read="c:/Users/test/src/file.py" lines="3-6"} '
+    return chunk * (size // len(chunk) + 1)
+
+
+def make_big_write(size: int) -> str:
+    """One write whose content is code full of braces and quotes."""
+    code_line = 'def f(x):\n    return {"key": x, "nested": {"a": [1, 2, 3]}}\n'
+    content = code_line * (size // len(code_line) + 1)
+    return f'Writing the file now. {{tool main.files write="c:/tmp/out.py" content="""{content}"""}} {{tool main.stop}}'
+
+
+def bench(func, text: str, repeat: int) -> float:
+    """Best wall time of `repeat` runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs per case (best is reported)')
+    options = arg_parser.parse_args()
+
+    parser = ToolParser()
+    shapes = [('prose', make_prose), ('many commands', make_many_commands), ('big write', make_big_write)]
+    sizes = [10_000, 100_000, 1_000_000, 5_000_000]
+
+    print(f"{'shape':<15}{'size':>10}{'regex ms':>12}{'tokenizer ms':>15}{'regex cmds':>12}{'tokenizer cmds':>16}")
+    for shape_name, make in shapes:
+        for size in sizes:
+            text = make(size)
+            regex_ms = bench(old_process_response, text, options.repeat)
+            tokenizer_ms = bench(parser.parse_commands, text, options.repeat)
+            regex_count = len(old_process_response(text))
+            tokenizer_count = len(parser.parse_commands(text))
+            print(f"{shape_name:<15}{len(text):>10}{regex_ms:>12.2f}{tokenizer_ms:>15.2f}"
+                  f"{regex_count:>12}{tokenizer_count:>16}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+"""
+Load test for the chat endpoints of server.py.
+
+Starts the Flask app on a local port with the scripted (fake) AI backend and
+drives concurrent simulated users through multi-turn tool loops on
+/api/chat and /api/stream-chat. Reports p50/p95/p99 latency, time to the
+first SSE event and throughput, and writes the results as JSON.
+
+Usage:
+    python benchmarks/load_test.py --users 20 --requests 5 --turns 3 --latency 0.2
+    python benchmarks/load_test.py --baseline benchmarks/results/old.json
+"""
+
+import os
+import sys
+import json
+import time
+import yaml
+import logging
+import argparse
+import tempfile
+import platform
+import threading
+import subprocess
+import http.client
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+ENDPOINTS = {'chat': '/api/chat', 'stream': '/api/stream-chat'}
+
+
+def make_script(turns: int) -> List[Dict[str, str]]:
+    """
+    Script for the fake backend: speak `turns` times, then stop.
+
+    Every reply speaks "turn k". The tool results prompt lists all results so
+    far, so the rule for the highest turn in it decides what comes next.
+    """
+    rules = [{'match': rf'Result: turn {turns}\b', 'reply': '{tool main.stop reason="done"}'}]
+    for k in range(turns - 1, 0, -1):
+        rules.append({'match': rf'Result: turn {k}\b', 'reply': f'{{tool main.speak text="turn {k + 1}"}}'})
+    rules.append({'reply': '{tool main.speak text="turn 1"}'})
+    return rules
+
+
+def write_config(options: argparse.Namespace) -> str:
+    """Write a copy of zen_config.yaml that selects the fake backend; return its path."""
+    with open(ROOT / 'config' / 'zen_config.yaml', 'r') as file:
+        config = yaml.safe_load(file)
+    config['ai']['backend'] = {
+        'type': 'fake',
+        'latency': options.latency,
+        'chunk_latency': options.chunk_latency,
+        'chunk_size': options.chunk_size,
+        'script': make_script(options.turns)
+    }
+    config.setdefault('tools', {})['hot_reload'] = False
+    sessions = config.setdefault('server', {}).setdefault('sessions', {})
+    sessions['max_sessions'] = max(sessions.get('max_sessions', 256), options.users)
+    # Persist to a throwaway database, not the real session store
+    sessions['store_path'] = os.path.join(tempfile.mkdtemp(prefix='zen_load_test_'), 'sessions.db')
+    fd, path = tempfile.mkstemp(prefix='zen_load_test_', suffix='.yaml')
+    with os.fdopen(fd, 'w') as file:
+        yaml.safe_dump(config, file)
+    return path
+
+
+def start_server() -> Any:
+    """Import server.py and serve its app from a background thread on a free port."""
+    from werkzeug.serving import make_server
+    import server
+
+    httpd = make_server('127.0.0.1', 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, name='zen-load-test-server', daemon=True).start()
+    return httpd
+
+
+def run_request(port: int, endpoint: str, session_id: str, message: str) -> Dict[str, Any]:
+    """
+    Send one chat request and time it.
+
+    Returns:
+        Dictionary with 'latency', 'ttfe' (first SSE event, streams only),
+        'tools' (tool results seen) and 'error'
+    """
+    body = json.dumps({'message': message, 'session_id': session_id})
+    start = time.perf_counter()
+    record = {'latency': None, 'ttfe': None, 'tools': 0, 'error': None}
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+    try:
+        conn.request('POST', ENDPOINTS[endpoint], body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        if response.status != 200:
+            record['error'] = f"HTTP {response.status}"
+            response.read()
+        elif endpoint == 'stream':
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                if line.startswith(b'event:'):
+                    if record['ttfe'] is None:
+                        record['ttfe'] = time.perf_counter() - start
+                    if line.strip() == b'event: tool_result':
+                        record['tools'] += 1
+        else:
+            record['tools'] = len(json.loads(response.read()).get('tools', []))
+    except Exception as e:
+        record['error'] = str(e) or type(e).__name__
+    finally:
+        conn.close()
+    record['latency'] = time.perf_counter() - start
+    return record
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Percentile with linear interpolation between closest ranks."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: List[float]) -> Dict[str, Optional[float]]:
+    """Latency summary in milliseconds."""
+    def ms(value: Optional[float]) -> Optional[float]:
+        return round(value * 1000, 2) if value is not None else None
+
+    return {
+        'p50': ms(percentile(values, 50)),
+        'p95': ms(percentile(values, 95)),
+        'p99': ms(percentile(values, 99)),
+        'mean': ms(sum(values) / len(values)) if values else None,
+        'max': ms(max(values)) if values else None
+    }
+
+
+def run_endpoint(port: int, endpoint: str, options: argparse.Namespace) -> Dict[str, Any]:
+    """Drive `users` concurrent users, each sending `requests` messages in their own session."""
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    barrier = threading.Barrier(options.users)
+
+    def user(index: int) -> None:
+        session_id = f"load-{endpoint}-{index}-{os.getpid()}"
+        barrier.wait()
+        for i in range(options.requests):
+            record = run_request(port, endpoint, session_id, f"User {index} message {i}")
+            with lock:
+                records.append(record)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(options.users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ok = [r for r in records if r['error'] is None]
+    errors = [r['error'] for r in records if r['error'] is not None]
+    result = {
+        'requests': len(records),
+        'errors': len(errors),
+        'error_samples': sorted(set(errors))[:5],
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 2) if elapsed else None,
+        'tool_calls_per_request': round(sum(r['tools'] for r in ok) / len(ok), 2) if ok else None,
+        'latency_ms': summarize([r['latency'] for r in ok])
+    }
+    if endpoint == 'stream':
+        result['ttfe_ms'] = summarize([r['ttfe'] for r in ok if r['ttfe'] is not None])
+    return result
+
+
+def git_revision() -> Optional[str]:
+    """Commit the tree is at, to tell result files apart."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """Print the change of the key numbers against a previous result file."""
+    print(f"\nCompared to {baseline.get('revision')} ({baseline.get('timestamp')}):")
+    for endpoint, current in results['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        rows = [('throughput_rps', current['throughput_rps'], previous.get('throughput_rps'))]
+        for group in ('latency_ms', 'ttfe_ms'):
+            for key in ('p50', 'p95', 'p99'):
+                if group in current:
+                    rows.append((f"{group}.{key}", current[group][key], previous.get(group, {}).get(key)))
+        for name, new, old in rows:
+            if new is None or not old:
+                continue
+            print(f"  {endpoint:<7}{name:<18}{old:>10} -> {new:<10} ({(new - old) / old * 100:+.1f}%)")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Load test for the server.py chat endpoints")
+    arg_parser.add_argument('--users', type=int, default=10, help='concurrent simulated users')
+    arg_parser.add_argument('--requests', type=int, default=5, help='messages each user sends')
+    arg_parser.add_argument('--turns', type=int, default=3, help='tool loop rounds per message before main.stop')
+    arg_parser.add_argument('--latency', type=float, default=0.1, help='fake AI: seconds to first chunk')
+    arg_parser.add_argument('--chunk-latency', type=float, default=0.005, help='fake AI: seconds between chunks')
+    arg_parser.add_argument('--chunk-size', type=int, default=8, help='fake AI: characters per chunk')
+    arg_parser.add_argument('--endpoint', choices=['chat', 'stream', 'both'], default='both')
+    arg_parser.add_argument('--output', help='result file (default: benchmarks/results/load_test_<rev>_<time>.json)')
+    arg_parser.add_argument('--baseline', help='previous result file to compare against')
+    options = arg_parser.parse_args()
+    options.turns = max(1, options.turns)
+
+    os.chdir(ROOT)
+    sys.path.insert(0, str(ROOT))
+    config_path = write_config(options)
+    os.environ['ZEN_CONFIG'] = config_path
+    try:
+        httpd = start_server()
+    finally:
+        os.unlink(config_path)
+    # Per-request INFO logs would dominate the measurement
+    logging.getLogger().setLevel(logging.WARNING)
+    port = httpd.server_port
+
+    # Warm up (builds the instruction cache and imports the tools)
+    run_request(port, 'chat', 'load-warmup', 'warmup')
+
+    endpoints = ['chat', 'stream'] if options.endpoint == 'both' else [options.endpoint]
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'parameters': {key: getattr(options, key) for key in
+                       ('users', 'requests', 'turns', 'latency', 'chunk_latency', 'chunk_size')},
+        'endpoints': {}
+    }
+    for endpoint in endpoints:
+        print(f"Running {ENDPOINTS[endpoint]} with {options.users} users x {options.requests} requests...")
+        result = run_endpoint(port, endpoint, options)
+        results['endpoints'][endpoint] = result
+        line = (f"  {result['requests']} requests, {result['errors']} errors, "
+                f"{result['throughput_rps']} req/s, latency p50/p95/p99 "
+                f"{result['latency_ms']['p50']}/{result['latency_ms']['p95']}/{result['latency_ms']['p99']} ms")
+        if 'ttfe_ms' in result:
+            line += (f", first event p50/p95/p99 {result['ttfe_ms']['p50']}/"
+                     f"{result['ttfe_ms']['p95']}/{result['ttfe_ms']['p99']} ms")
+        print(line)
+    httpd.shutdown()
+
+    output = Path(options.output) if options.output else \
+        RESULTS_DIR / f"load_test_{results['revision'] or 'unknown'}_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {output}")
+
+    if options.baseline:
+        with open(options.baseline, 'r') as file:
+            compare(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,14 @@
+import os
 import yaml
 import logging
 from src.ai.gemini import Gemini
+from src.ai.backends import create_backend
+from src.ai.call_policy import CallPolicy
+from src.ai.history import HistoryPolicy
 from src.tool_parser import ToolSystem
 from src.tool_info import ToolInfoGenerator
+from src.instruction_cache import InstructionCache
+from src.sub_ai import SubAIOrchestrator, set_orchestrator
 
 # Configure logging
 logging.basicConfig(
@@ -11,8 +17,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 debug = False
-# Load configuration from YAML file
-with open('config/zen_config.yaml', 'r') as file:
+# Load configuration from YAML file (ZEN_CONFIG may point at another file, e.g. one selecting the fake backend)
+with open(os.environ.get('ZEN_CONFIG', 'config/zen_config.yaml'), 'r') as file:
     config = yaml.safe_load(file)
 
 # Initialize tool info generator
@@ -22,20 +28,34 @@ tool_info_gen = ToolInfoGenerator()
 base_instructions = config['ai']['instructions']
 dynamic_instructions = tool_info_gen.update_ai_instructions(base_instructions)
 
-# Initialize AI instances with dynamic instructions
+# Initialize AI instances with dynamic instructions (live API, recording, replay or scripted fake)
+backend = create_backend(config['ai'].get('backend'), config['ai']['api_key'])
+# Retries, rate limit and concurrency cap shared by the main and sub-AI (same API quota)
+call_policy = CallPolicy.from_config(config['ai'].get('limits'))
 ai = Gemini(
     api_key=config['ai']['api_key'],
     model="gemini-2.0-flash-lite",
-    system_instruction=dynamic_instructions
+    system_instruction=dynamic_instructions,
+    backend=backend,
+    call_policy=call_policy
 )
 sub_ai = Gemini(
     api_key=config['ai']['api_key'],
     model="gemini-2.0-flash-lite",
-    system_instruction=config['ai']['sub_ai_instructions']
+    system_instruction=config['ai']['sub_ai_instructions'],
+    backend=backend,
+    call_policy=call_policy
 )
 
+# Keep chat histories within a token budget (summaries may be written by the sub-AI)
+ai.set_history_policy(HistoryPolicy.from_config(config['ai'].get('history'), summarizer_ai=sub_ai))
+
 # Initialize tool system
-tool_system = ToolSystem()
+tool_system = ToolSystem(max_workers=config.get('tools', {}).get('max_parallel', 8))
+
+# Sub-AIs started by main.subai, with their own instructions and tool loops
+sub_instruction_cache = InstructionCache(sub_ai, tool_info_gen, config['ai']['sub_ai_instructions'])
+set_orchestrator(SubAIOrchestrator.from_config(config['ai'].get('sub_ai'), sub_ai, tool_system, sub_instruction_cache))
 
 # Show available tools at startup
 tool_summary = tool_info_gen.get_tool_summary()
@@ -60,12 +80,12 @@ while running:
         last_response = "What is the next step? If you are finished, use the main.stop tool."
         continue
 
-    # Execute tool commands
+    # Execute tool commands (independent ones run in parallel)
     execution_results = []
     for cmd in tool_commands:
         print(f"Executing command: {cmd.raw_command}")
-        result = tool_system.execute_command(cmd)
-        
+    results = tool_system.execute_batch(tool_commands)
+    for cmd, result in zip(tool_commands, results):
         if result['success']:
             print(f"✅ Tool executed successfully: {result['result']}")
             execution_results.append(f"Tool {cmd.name} executed successfully. Result: {result['result']}")
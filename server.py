@@ -1,11 +1,25 @@
 #!/usr/bin/env python
+import os
+import time
 import yaml
 import logging
-from flask import Flask, request, jsonify, send_from_directory, Response
-import json
+from flask import Flask, request, jsonify, send_from_directory, Response, g
 from src.ai.gemini import Gemini
+from src.ai.backends import create_backend
+from src.ai.history import HistoryPolicy
+from src.ai.call_policy import CallPolicy
 from src.tool_parser import ToolSystem
 from src.tool_info import ToolInfoGenerator
+from src.tool_watcher import ToolWatcher
+from src.tool_loader import get_tool_loader
+from src.tool_workers import ToolWorkerPool
+from src.session_manager import SessionManager
+from src.session_store import SessionStore
+from src.instruction_cache import InstructionCache
+from src.sub_ai import SubAIOrchestrator, set_orchestrator
+from src.chat_loop import ChatLoop, resolve_allowed_tools, format_sse
+from src.metrics import REGISTRY, TRACER, HTTP_REQUESTS, HTTP_SECONDS
+from src.profiling import RequestProfiler
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -13,41 +27,138 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load configuration
-with open('config/zen_config.yaml', 'r') as file:
+# Load configuration (ZEN_CONFIG may point at another file, e.g. one selecting the fake backend)
+with open(os.environ.get('ZEN_CONFIG', 'config/zen_config.yaml'), 'r') as file:
     config = yaml.safe_load(file)
 
 # Initialize tool info generator
 tool_info_gen = ToolInfoGenerator()
 dynamic_instructions = tool_info_gen.update_ai_instructions(config['ai']['instructions'])
 
-# Initialize AI instances
+# Initialize AI instances (live API, recording, replay or scripted fake)
+backend = create_backend(config['ai'].get('backend'), config['ai']['api_key'])
+# Retries, rate limit and concurrency cap shared by the main and sub-AI (same API quota)
+call_policy = CallPolicy.from_config(config['ai'].get('limits'))
 ai = Gemini(
     api_key=config['ai']['api_key'],
     model="gemini-2.0-flash-lite",
-    system_instruction=dynamic_instructions
+    system_instruction=dynamic_instructions,
+    backend=backend,
+    call_policy=call_policy
 )
 
-# Optionally initialize sub-AI (not used by default)
+# Sub-AI: works on tasks delegated with main.subai and writes history summaries
 sub_ai = Gemini(
     api_key=config['ai']['api_key'],
     model="gemini-2.0-flash-lite",
-    system_instruction=config['ai']['sub_ai_instructions']
+    system_instruction=config['ai']['sub_ai_instructions'],
+    backend=backend,
+    call_policy=call_policy
 )
 
-# Initialize tool system
-tool_system = ToolSystem()
+# Keep chat histories within a token budget (summaries may be written by the sub-AI)
+ai.set_history_policy(HistoryPolicy.from_config(config['ai'].get('history'), summarizer_ai=sub_ai))
+
+# Initialize tool system, optionally running tools in isolated worker processes
+tools_config = config.get('tools', {})
+worker_pool = None
+if tools_config.get('backend', 'inprocess') == 'process':
+    worker_pool = ToolWorkerPool(
+        get_tool_loader(),
+        workers=tools_config.get('workers', 4),
+        default_timeout=tools_config.get('timeout', 60),
+        memory_limit_mb=tools_config.get('memory_limit_mb')
+    )
+    worker_pool.start()
+tool_system = ToolSystem(max_workers=tools_config.get('max_parallel', 8), worker_pool=worker_pool)
 
 # Show available tools at startup
 tool_summary = tool_info_gen.get_tool_summary()
 logger.info(f"Loaded {tool_summary['count']} tools: {', '.join(tool_summary['tools'].keys())}")
 
-# Start main chat session
-ai.start_chat('main')
+# Reload changed tools without restarting the server
+if tools_config.get('hot_reload', True):
+    tool_watcher = ToolWatcher(tool_system.loader, poll_interval=tools_config.get('poll_interval', 1.0))
+    tool_watcher.start()
+
+# Per-client chat sessions, optionally persisted
+session_config = config.get('server', {}).get('sessions', {})
+session_store = None
+if session_config.get('persist', False):
+    session_store = SessionStore(session_config.get('store_path', 'data/sessions.db'))
+sessions = SessionManager(
+    ai,
+    max_sessions=session_config.get('max_sessions', 256),
+    idle_timeout=session_config.get('idle_timeout', 3600),
+    store=session_store
+)
+SESSION_COOKIE = 'zen_session'
+
+# Instructions and models per allowed tool set
+instruction_cache = InstructionCache(
+    ai,
+    tool_info_gen,
+    config['ai']['instructions'],
+    max_entries=config.get('server', {}).get('instruction_cache_size', 32)
+)
+
+# AI/tool loop shared by the chat endpoints
+chat_loop = ChatLoop(ai, tool_system, instruction_cache)
+
+# Sub-AIs started by main.subai, with their own instructions and tool loops
+sub_instruction_cache = InstructionCache(
+    sub_ai,
+    tool_info_gen,
+    config['ai']['sub_ai_instructions'],
+    max_entries=config.get('server', {}).get('instruction_cache_size', 32)
+)
+set_orchestrator(SubAIOrchestrator.from_config(config['ai'].get('sub_ai'), sub_ai, tool_system, sub_instruction_cache))
+
+# Metrics for /metrics and optional OpenTelemetry spans
+server_config = config.get('server', {})
+metrics_config = server_config.get('metrics', {})
+TRACER.configure(server_config.get('tracing'))
+REGISTRY.gauge('zen_sessions', 'Chat sessions held in memory', lambda: len(sessions.sessions))
+REGISTRY.gauge('zen_history_tokens_saved', 'Estimated tokens saved by history compaction', lambda: ai.tokens_saved)
+REGISTRY.gauge('zen_llm_calls_in_flight', 'LLM calls holding a concurrency slot', lambda: call_policy.in_flight)
+
+# cProfile/tracemalloc profiles of sampled chat requests
+profiler = RequestProfiler.from_config(server_config.get('profiling'))
 
 # Create Flask app
 app = Flask(__name__, static_folder='website', static_url_path='')
 
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    # Label by route pattern, not path, so the number of series stays bounded
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_SECONDS.observe(time.perf_counter() - g.get('request_start', time.perf_counter()), endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+if metrics_config.get('enabled', True):
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+if TRACER.enabled:
+    @app.route('/api/traces', methods=['GET'])
+    def traces():
+        return jsonify(TRACER.recent_traces())
+
+if profiler.enabled:
+    @app.route('/api/profiles', methods=['GET'])
+    def list_profiles():
+        return jsonify({'profiles': profiler.list_profiles(request.args.get('limit', 50, type=int))})
+
+    @app.route('/api/profiles/<path:filename>', methods=['GET'])
+    def get_profile(filename):
+        return send_from_directory(os.path.abspath(profiler.directory), filename, as_attachment=True)
+
 # Serve frontend
 @app.route('/')
 def index():
@@ -64,131 +175,88 @@ def list_tools():
 def static_proxy(path):
     return send_from_directory('website', path)
 
+def get_session_id(data: dict = None) -> str:
+    """Resolve the client's session id from body, header or cookie, issuing a new one if absent."""
+    data = data or {}
+    return (data.get('session_id')
+            or request.headers.get('X-Session-Id')
+            or request.cookies.get(SESSION_COOKIE)
+            or sessions.new_session_id())
+
+def attach_session(response: Response, session_id: str) -> Response:
+    """Make sure the client keeps using the same session id."""
+    if request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    response.headers['X-Session-Id'] = session_id
+    return response
+
 # Chat API endpoint
 @app.route('/api/chat', methods=['POST'])
 def chat():
     data = request.get_json()
     user_message = data.get('message', '')
-    selected_tools = data.get('selected_tools', None)
-
     # If selected_tools is provided, restrict available tools
-    always_on = {'main.speak', 'main.stop', 'main.memory'}
-    if selected_tools:
-        allowed_tools = set(selected_tools) | always_on
-    else:
-        allowed_tools = set(tool_system.list_available_tools().keys()) | always_on
+    allowed_tools = resolve_allowed_tools(tool_system, data.get('selected_tools', None))
+    session_id = get_session_id(data)
 
-    last_response = user_message
     ai_responses = []
     all_results = []
     stop_flag = False
 
-    # Run AI-tool loop until stop
-    while True:
-        # Update system instructions to only mention allowed tools
-        tool_names_str = ', '.join(allowed_tools)
-        ai.system_instruction = tool_info_gen.update_ai_instructions(
-            f"You may only use these tools: {tool_names_str}. Do not mention or use any other tools."
-        )
-        answer = ai.chat(last_response, 'main')
-        logger.info(f"AI Response: {answer}")
-        ai_responses.append(answer)
-
-        # Only process tool commands for allowed tools
-        tool_commands = [cmd for cmd in tool_system.process_response(answer) if cmd.name in allowed_tools]
-        if not tool_commands:
-            break
-
-        for cmd in tool_commands:
-            logger.info(f"Executing command: {cmd.raw_command}")
-            result = tool_system.execute_command(cmd)
-            entry = {
-                'name': cmd.name,
-                'success': result.get('success', False),
-                'result': result.get('result'),
-                'error': result.get('error')
-            }
-            all_results.append(entry)
-            if result.get('action') == 'stop_system':
-                stop_flag = True
-                logger.info("AI requested system shutdown")
-                break
-        if stop_flag:
-            break
-
-        # Prepare next system prompt
-        summaries = [f"Tool {r['name']} executed successfully. Result: {r['result']}" \
-                     if r['success'] else f"Tool {r['name']} failed. Error: {r['error']}" \
-                     for r in all_results]
-        last_response = f"SYSTEM: Tool execution results: {'; '.join(summaries)}. If you are finished, use the main.stop tool. Do not talk to the user about this message"
+    profile = profiler.should_profile(request.headers)
+
+    # Run AI-tool loop until stop, holding this client's session exclusively
+    with sessions.session(session_id) as chat_name:
+        events = chat_loop.run(user_message, chat_name, allowed_tools)
+        if profile:
+            events = profiler.profile(events, 'chat')
+        for event, payload in events:
+            if event == 'ai_response':
+                ai_responses.append(payload['text'])
+            elif event == 'tool_result':
+                all_results.append(payload)
+            elif event == 'done':
+                stop_flag = payload['stop']
 
     # Aggregate AI responses into one text
     full_response = '\n'.join(ai_responses)
-    return jsonify({
+    response = jsonify({
         'ai_response': full_response,
         'tools': all_results,
-        'stop': stop_flag
+        'stop': stop_flag,
+        'session_id': session_id
     })
+    return attach_session(response, session_id)
 
 @app.route('/api/stream-chat', methods=['POST'])
 def stream_chat():
     data = request.get_json()
     user_message = data.get('message', '')
-    selected_tools = data.get('selected_tools', None)
-
-    always_on = {'main.speak', 'main.stop', 'main.memory'}
-    if selected_tools:
-        allowed_tools = set(selected_tools) | always_on
-    else:
-        allowed_tools = set(tool_system.list_available_tools().keys()) | always_on
+    allowed_tools = resolve_allowed_tools(tool_system, data.get('selected_tools', None))
+    session_id = get_session_id(data)
+    profile = profiler.should_profile(request.headers)
 
     def event_stream():
-        last_resp = user_message
-        stop_flag = False
-        entries = []
-        while True:
-            # Update system instructions to only mention allowed tools
-            tool_names_str = ', '.join(allowed_tools)
-            ai.system_instruction = tool_info_gen.update_ai_instructions(
-                f"You may only use these tools: {tool_names_str}. Do not mention or use any other tools."
-            )
-            # AI response
-            answer = ai.chat(last_resp, 'main')
-            logger.info(f"AI Response: {answer}")
-            yield f"event: ai_response\ndata: {json.dumps({'text': answer})}\n\n"
-
-            # Only process tool commands for allowed tools
-            cmds = [cmd for cmd in tool_system.process_response(answer) if cmd.name in allowed_tools]
-            if not cmds:
-                break
-            for cmd in cmds:
-                result = tool_system.execute_command(cmd)
-                entry = {'name': cmd.name, 'success': result.get('success', False),
-                         'result': result.get('result'), 'error': result.get('error')}
-                entries.append(entry)
-                yield f"event: tool_result\ndata: {json.dumps(entry)}\n\n"
-                if result.get('action') == 'stop_system':
-                    stop_flag = True
-                    break
-            if stop_flag:
-                break
-            # prepare next prompt
-            summaries = [f"Tool {e['name']} executed. Success: {e['success']}" for e in entries]
-            last_resp = f"SYSTEM: {', '.join(summaries)}"
-
-        # Final end event
-        yield f"event: done\ndata: {json.dumps({'stop': stop_flag})}\n\n"
-
-    return Response(event_stream(), mimetype='text/event-stream')
+        # The session stays locked until the stream is finished or the client disconnects
+        with sessions.session(session_id) as chat_name:
+            events = chat_loop.run(user_message, chat_name, allowed_tools, stream=True)
+            if profile:
+                events = profiler.profile(events, 'stream')
+            for event, payload in events:
+                yield format_sse(event, payload)
+
+    response = Response(event_stream(), mimetype='text/event-stream')
+    return attach_session(response, session_id)
 
 # New chat endpoint resets AI context
 @app.route('/api/new-chat', methods=['POST'])
 def new_chat():
-    # Clear and restart the main chat session
-    #later add 
-    ai.clear_chat('main')
-    ai.start_chat('main')
-    return jsonify({'success': True})
+    # Clear and restart only this client's chat session
+    data = request.get_json(silent=True) or {}
+    session_id = get_session_id(data)
+    sessions.reset(session_id)
+    response = jsonify({'success': True, 'session_id': session_id})
+    return attach_session(response, session_id)
 
 if __name__ == '__main__':
     # Run Flask app
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Asyncio (ASGI) server for Zen AI.
+Serves the same endpoints and SSE events as server.py, but runs the AI/tool
+loop as a coroutine so one process can hold many concurrent conversations.
+
+Run with `python server_async.py` or any ASGI server, e.g.
+`hypercorn server_async:app`.
+"""
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from quart import Quart, request, jsonify, send_from_directory, Response, g
+from src.chat_loop import ChatLoop, resolve_allowed_tools, format_sse
+from src.metrics import REGISTRY, TRACER, HTTP_REQUESTS, HTTP_SECONDS
+# Reuse configuration, AI, tools and sessions from the Flask server (which also sets up metrics and tracing)
+from server import (config, ai, tool_system, tool_info_gen, instruction_cache, sessions, SESSION_COOKIE,
+                    metrics_config, profiler)
+from src.sub_ai import get_orchestrator
+
+# Blocking tools run on their own pool instead of the event loop
+async_config = config.get('server', {}).get('async', {})
+tool_executor = ThreadPoolExecutor(
+    max_workers=async_config.get('tool_threads', 32),
+    thread_name_prefix='zen-tool'
+)
+chat_loop = ChatLoop(ai, tool_system, instruction_cache, tool_executor=tool_executor)
+
+# Create Quart app
+app = Quart(__name__, static_folder='website', static_url_path='')
+
+@app.before_serving
+async def start_sub_ais():
+    # Sub-AI loops are coroutines too, so run them on this loop instead of a thread of their own
+    orchestrator = get_orchestrator()
+    if orchestrator is not None:
+        orchestrator.use_loop(asyncio.get_running_loop())
+
+@app.after_serving
+async def stop_sub_ais():
+    orchestrator = get_orchestrator()
+    if orchestrator is not None:
+        orchestrator.use_loop(None)
+
+@app.before_request
+async def start_timer():
+    g.request_start = time.perf_counter()
+
+@app.after_request
+async def record_request(response):
+    # Label by route pattern, not path, so the number of series stays bounded
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_SECONDS.observe(time.perf_counter() - g.get('request_start', time.perf_counter()), endpoint=endpoint)
+    HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
+
+if metrics_config.get('enabled', True):
+    @app.route('/metrics', methods=['GET'])
+    async def metrics():
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+if TRACER.enabled:
+    @app.route('/api/traces', methods=['GET'])
+    async def traces():
+        return jsonify(TRACER.recent_traces())
+
+if profiler.enabled:
+    @app.route('/api/profiles', methods=['GET'])
+    async def list_profiles():
+        return jsonify({'profiles': profiler.list_profiles(request.args.get('limit', 50, type=int))})
+
+    @app.route('/api/profiles/<path:filename>', methods=['GET'])
+    async def get_profile(filename):
+        return await send_from_directory(os.path.abspath(profiler.directory), filename, as_attachment=True)
+
+# Serve frontend
+@app.route('/')
+async def index():
+    return await send_from_directory('website', 'index.html')
+
+# Add tools listing endpoint
+@app.route('/tools', methods=['GET'])
+async def list_tools():
+    tool_summary = tool_info_gen.get_tool_summary()
+    tools = [{'name': name, 'description': info.get('description', '')} for name, info in tool_summary['tools'].items()]
+    return jsonify({'tools': tools})
+
+@app.route('/<path:path>')
+async def static_proxy(path):
+    return await send_from_directory('website', path)
+
+def get_session_id(data: dict = None) -> str:
+    """Resolve the client's session id from body, header or cookie, issuing a new one if absent."""
+    data = data or {}
+    return (data.get('session_id')
+            or request.headers.get('X-Session-Id')
+            or request.cookies.get(SESSION_COOKIE)
+            or sessions.new_session_id())
+
+def attach_session(response: Response, session_id: str) -> Response:
+    """Make sure the client keeps using the same session id."""
+    if request.cookies.get(SESSION_COOKIE) != session_id:
+        response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite='Lax')
+    response.headers['X-Session-Id'] = session_id
+    return response
+
+# Chat API endpoint
+@app.route('/api/chat', methods=['POST'])
+async def chat():
+    data = await request.get_json()
+    user_message = data.get('message', '')
+    allowed_tools = resolve_allowed_tools(tool_system, data.get('selected_tools', None))
+    session_id = get_session_id(data)
+    profile = profiler.should_profile(request.headers)
+
+    ai_responses = []
+    all_results = []
+    stop_flag = False
+
+    async with sessions.session_async(session_id) as chat_name:
+        events = chat_loop.run_async(user_message, chat_name, allowed_tools)
+        if profile:
+            events = profiler.profile_async(events, 'chat')
+        async for event, payload in events:
+            if event == 'ai_response':
+                ai_responses.append(payload['text'])
+            elif event == 'tool_result':
+                all_results.append(payload)
+            elif event == 'done':
+                stop_flag = payload['stop']
+
+    response = jsonify({
+        'ai_response': '\n'.join(ai_responses),
+        'tools': all_results,
+        'stop': stop_flag,
+        'session_id': session_id
+    })
+    return attach_session(response, session_id)
+
+@app.route('/api/stream-chat', methods=['POST'])
+async def stream_chat():
+    data = await request.get_json()
+    user_message = data.get('message', '')
+    allowed_tools = resolve_allowed_tools(tool_system, data.get('selected_tools', None))
+    session_id = get_session_id(data)
+    profile = profiler.should_profile(request.headers)
+
+    async def event_stream():
+        async with sessions.session_async(session_id) as chat_name:
+            events = chat_loop.run_async(user_message, chat_name, allowed_tools, stream=True)
+            if profile:
+                events = profiler.profile_async(events, 'stream')
+            async for event, payload in events:
+                yield format_sse(event, payload)
+
+    response = Response(event_stream(), mimetype='text/event-stream')
+    return attach_session(response, session_id)
+
+# New chat endpoint resets AI context
+@app.route('/api/new-chat', methods=['POST'])
+async def new_chat():
+    data = await request.get_json(silent=True) or {}
+    session_id = get_session_id(data)
+    await sessions.reset_async(session_id)
+    response = jsonify({'success': True, 'session_id': session_id})
+    return attach_session(response, session_id)
+
+if __name__ == '__main__':
+    # Run Quart app (uses hypercorn under the hood)
+    app.run(host='0.0.0.0', port=5000)
@@ -3,6 +3,6 @@ Zen AI Source Package
 Contains core functionality for the Zen AI system including tool parsing.
 """
 
-from .tool_parser import ToolSystem, ToolParser, ToolCommand
+from .tool_parser import ToolSystem, ToolParser, ToolCommand, IncrementalToolParser
 
-__all__ = ['ToolSystem', 'ToolParser', 'ToolCommand']
+__all__ = ['ToolSystem', 'ToolParser', 'ToolCommand', 'IncrementalToolParser']
@@ -0,0 +1,531 @@
+"""
+Model backends for the Gemini client.
+A backend builds the model objects Gemini talks to. Besides the live API there
+is a recording proxy, a replay backend that answers from those recordings and
+a scripted fake, so the tool loop can run offline and deterministically.
+"""
+
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import google.generativeai as genai
+
+DEFAULT_RECORDINGS = "data/llm_recordings.jsonl"
+
+# Replies of the scripted backend when no script is configured: speak once, then stop
+DEFAULT_SCRIPT = [
+    {'match': r'^SYSTEM:', 'reply': '{tool main.stop}'},
+    {'reply': '{tool main.speak text="Hello from the scripted backend"}'},
+]
+
+
+class ReplayMiss(LookupError):
+    """Raised by the replay backend when a request was never recorded."""
+
+
+def _content_text(content: Union[str, List[Any], Any]) -> str:
+    """Flatten a message (string, list of parts or SDK object) to text."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, (list, tuple)):
+        return ''.join(_content_text(part) for part in content)
+    if isinstance(content, dict):
+        return _content_text(content.get('parts', content.get('text', '')))
+    text = getattr(content, 'text', None)
+    if isinstance(text, str):
+        return text
+    return str(content)
+
+
+def history_entries(history: Sequence[Any]) -> List[Tuple[str, str]]:
+    """Normalize a chat history (SDK Content objects or dicts) to (role, text) pairs."""
+    entries = []
+    for content in history or []:
+        if isinstance(content, dict):
+            role = content.get('role', 'user')
+            parts = content.get('parts', [])
+        else:
+            role = getattr(content, 'role', 'user')
+            parts = getattr(content, 'parts', [])
+        entries.append((role, ''.join(_content_text(part) for part in parts)))
+    return entries
+
+
+def history_key(model_name: str, system_instruction: Optional[str], history: Sequence[Any],
+                message: Union[str, List[Any]]) -> str:
+    """
+    Hash a request so the same conversation state always maps to the same key.
+
+    Args:
+        model_name: Name of the model the request goes to
+        system_instruction: The model's system instruction
+        history: Chat history before the message
+        message: The message being sent
+
+    Returns:
+        Hex digest identifying the request
+    """
+    payload = json.dumps({
+        'model': model_name,
+        'system': system_instruction or '',
+        'history': history_entries(history),
+        'message': _content_text(message)
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ModelBackend:
+    """
+    Interface of a model backend.
+
+    ``build_model`` returns an object with the parts of
+    ``genai.GenerativeModel`` that Gemini uses: ``start_chat(history)``,
+    ``generate_content`` and ``generate_content_async``. Chat sessions
+    provide ``send_message``/``send_message_async`` (with ``stream``),
+    ``history`` and a writable ``model``. Sending and generating also take
+    ``request_options`` (e.g. ``{'timeout': seconds}``), which local
+    backends ignore.
+    """
+
+    name = 'base'
+
+    def build_model(self, model_name: str, system_instruction: Optional[str] = None) -> Any:
+        """
+        Build a model.
+
+        Args:
+            model_name: Name of the model
+            system_instruction: System instruction for the model
+
+        Returns:
+            A model object
+        """
+        raise NotImplementedError
+
+
+class GeminiBackend(ModelBackend):
+    """The live Gemini API."""
+
+    name = 'live'
+
+    def __init__(self, api_key: str):
+        """
+        Initialize the live backend.
+
+        Args:
+            api_key: Gemini API key
+        """
+        genai.configure(api_key=api_key)
+
+    def build_model(self, model_name: str, system_instruction: Optional[str] = None) -> Any:
+        return genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction
+        )
+
+
+# ---------------------------------------------------------------------------
+# Local backends (scripted fake and replay)
+# ---------------------------------------------------------------------------
+
+class _Chunk:
+    """A piece of a local response, shaped like an SDK response chunk."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = [text] if text else []
+
+
+class _LocalResponse:
+    """Response of a local backend; iterable like a streamed SDK response."""
+
+    def __init__(self, chunks: List[str], chunk_latency: float):
+        self._chunks = chunks
+        self._chunk_latency = chunk_latency
+        self.text = ''.join(chunks)
+        self.parts = [self.text] if self.text else []
+
+    def __iter__(self) -> Iterator[_Chunk]:
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_latency:
+                time.sleep(self._chunk_latency)
+            yield _Chunk(chunk)
+
+    def resolve(self) -> None:
+        pass
+
+
+class _LocalAsyncResponse(_LocalResponse):
+    """Async variant of _LocalResponse."""
+
+    async def __aiter__(self):
+        for i, chunk in enumerate(self._chunks):
+            if i and self._chunk_latency:
+                await asyncio.sleep(self._chunk_latency)
+            yield _Chunk(chunk)
+
+    async def resolve(self) -> None:
+        pass
+
+
+class _LocalChatSession:
+    """Chat session of a local backend; keeps the history as dicts."""
+
+    def __init__(self, model: "_LocalModel", history: Optional[Sequence[Any]] = None):
+        self.model = model
+        self.history = [{'role': role, 'parts': [text]} for role, text in history_entries(history or [])]
+
+    def _reply(self, content: Union[str, List[Any]]) -> List[str]:
+        """Get the reply for a message, add both to the history and split it into chunks."""
+        message = _content_text(content)
+        text = self.model.backend.reply(self.model, self.history, message)
+        self.history.append({'role': 'user', 'parts': [message]})
+        self.history.append({'role': 'model', 'parts': [text]})
+        return self.model.backend.split(text)
+
+    def send_message(self, content: Union[str, List[Any]], stream: bool = False,
+                     request_options: Optional[dict] = None) -> _LocalResponse:
+        backend = self.model.backend
+        chunks = self._reply(content)
+        delay = backend.latency if stream else backend.total_latency(chunks)
+        if delay:
+            time.sleep(delay)
+        return _LocalResponse(chunks, backend.chunk_latency)
+
+    async def send_message_async(self, content: Union[str, List[Any]], stream: bool = False,
+                                 request_options: Optional[dict] = None) -> _LocalAsyncResponse:
+        backend = self.model.backend
+        chunks = self._reply(content)
+        delay = backend.latency if stream else backend.total_latency(chunks)
+        if delay:
+            await asyncio.sleep(delay)
+        return _LocalAsyncResponse(chunks, backend.chunk_latency)
+
+
+class _LocalModel:
+    """Model of a local backend."""
+
+    def __init__(self, backend: "LocalBackend", model_name: str, system_instruction: Optional[str]):
+        self.backend = backend
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def start_chat(self, history: Optional[Sequence[Any]] = None) -> _LocalChatSession:
+        return _LocalChatSession(self, history)
+
+    def generate_content(self, prompt: Union[str, List[Any]],
+                         request_options: Optional[dict] = None) -> _LocalResponse:
+        return _LocalChatSession(self).send_message(prompt)
+
+    async def generate_content_async(self, prompt: Union[str, List[Any]],
+                                     request_options: Optional[dict] = None) -> _LocalAsyncResponse:
+        return await _LocalChatSession(self).send_message_async(prompt)
+
+
+class LocalBackend(ModelBackend):
+    """Base for backends that answer without the network, with simulated latency."""
+
+    def __init__(self, latency: float = 0.0, chunk_latency: float = 0.0, chunk_size: int = 20):
+        """
+        Initialize the local backend.
+
+        Args:
+            latency: Seconds until the first chunk of a response
+            chunk_latency: Seconds between streamed chunks
+            chunk_size: Characters per streamed chunk
+        """
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.chunk_size = max(1, chunk_size)
+        self.logger = logging.getLogger(__name__)
+
+    def build_model(self, model_name: str, system_instruction: Optional[str] = None) -> _LocalModel:
+        return _LocalModel(self, model_name, system_instruction)
+
+    def split(self, text: str) -> List[str]:
+        """Split a reply into streamed chunks."""
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or ['']
+
+    def total_latency(self, chunks: List[str]) -> float:
+        """Time a non-streamed response takes to arrive."""
+        return self.latency + self.chunk_latency * (len(chunks) - 1)
+
+    def reply(self, model: _LocalModel, history: List[Dict[str, Any]], message: str) -> str:
+        """
+        Produce the reply to a message.
+
+        Args:
+            model: The model the message was sent to
+            history: Chat history before the message
+            message: The message text
+
+        Returns:
+            Reply text
+        """
+        raise NotImplementedError
+
+
+class ScriptedBackend(LocalBackend):
+    """
+    Fake backend that answers from a script.
+
+    The script is a list of rules ``{'match': regex, 'reply': text}``; the
+    first rule whose regex is found in the message answers (a rule without
+    ``match`` always does). A callable ``(history, message) -> reply`` may
+    be given instead.
+    """
+
+    name = 'fake'
+
+    def __init__(self, script: Optional[Union[List[Dict[str, str]], Callable[[List[Dict[str, Any]], str], str]]] = None,
+                 latency: float = 0.0, chunk_latency: float = 0.0, chunk_size: int = 20):
+        """
+        Initialize the scripted backend.
+
+        Args:
+            script: Rules or a reply function (DEFAULT_SCRIPT if not specified)
+            latency: Seconds until the first chunk of a response
+            chunk_latency: Seconds between streamed chunks
+            chunk_size: Characters per streamed chunk
+        """
+        super().__init__(latency, chunk_latency, chunk_size)
+        if callable(script):
+            self._script = script
+            self._rules = []
+        else:
+            self._script = None
+            self._rules = [(re.compile(rule['match']) if rule.get('match') else None, rule.get('reply', ''))
+                           for rule in (script or DEFAULT_SCRIPT)]
+
+    def reply(self, model: _LocalModel, history: List[Dict[str, Any]], message: str) -> str:
+        if self._script is not None:
+            return self._script(history, message)
+        for pattern, reply in self._rules:
+            if pattern is None or pattern.search(message):
+                return reply
+        return ''
+
+
+class ReplayBackend(LocalBackend):
+    """Answers from responses saved by RecordingBackend; never touches the network."""
+
+    name = 'replay'
+
+    def __init__(self, path: str = DEFAULT_RECORDINGS, latency: float = 0.0,
+                 chunk_latency: float = 0.0, chunk_size: int = 20):
+        """
+        Initialize the replay backend.
+
+        Args:
+            path: Recordings file written by RecordingBackend
+            latency: Seconds until the first chunk of a response
+            chunk_latency: Seconds between streamed chunks
+            chunk_size: Characters per streamed chunk
+        """
+        super().__init__(latency, chunk_latency, chunk_size)
+        self.path = Path(path)
+        self.responses: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.responses[record['key']] = record['response']
+        self.logger.info(f"Loaded {len(self.responses)} recorded responses from {self.path}")
+
+    def reply(self, model: _LocalModel, history: List[Dict[str, Any]], message: str) -> str:
+        key = history_key(model.model_name, model.system_instruction, history, message)
+        response = self.responses.get(key)
+        if response is None:
+            raise ReplayMiss(f"No recorded response for this request (key {key[:12]}); "
+                             f"record it first with the 'record' backend")
+        return response
+
+
+# ---------------------------------------------------------------------------
+# Recording proxy
+# ---------------------------------------------------------------------------
+
+class _RecordingStream:
+    """Streamed response that is recorded once it has been resolved."""
+
+    def __init__(self, response: Any, on_done: Callable[[str], None]):
+        self._response = response
+        self._on_done = on_done
+
+    def __iter__(self):
+        return iter(self._response)
+
+    def resolve(self) -> None:
+        self._response.resolve()
+        self._on_done(self._response.text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+
+class _AsyncRecordingStream(_RecordingStream):
+    """Async variant of _RecordingStream."""
+
+    def __aiter__(self):
+        return self._response.__aiter__()
+
+    async def resolve(self) -> None:
+        await self._response.resolve()
+        self._on_done(self._response.text)
+
+
+class _RecordingChatSession:
+    """Chat session that forwards to the wrapped backend and records every exchange."""
+
+    def __init__(self, model: "_RecordingModel", inner: Any):
+        self._model = model
+        self.inner = inner
+
+    @property
+    def model(self) -> "_RecordingModel":
+        return self._model
+
+    @model.setter
+    def model(self, model: "_RecordingModel") -> None:
+        self._model = model
+        self.inner.model = model.inner
+
+    @property
+    def history(self) -> List[Any]:
+        return self.inner.history
+
+    @history.setter
+    def history(self, history: List[Any]) -> None:
+        # Gemini replaces the history when it compacts a chat
+        self.inner.history = history
+
+    def send_message(self, content: Union[str, List[Any]], stream: bool = False,
+                     request_options: Optional[dict] = None) -> Any:
+        record = self._model.recorder(self.inner.history, content)
+        response = self.inner.send_message(content, stream=stream, request_options=request_options)
+        if stream:
+            return _RecordingStream(response, record)
+        record(response.text)
+        return response
+
+    async def send_message_async(self, content: Union[str, List[Any]], stream: bool = False,
+                                 request_options: Optional[dict] = None) -> Any:
+        record = self._model.recorder(self.inner.history, content)
+        response = await self.inner.send_message_async(content, stream=stream, request_options=request_options)
+        if stream:
+            return _AsyncRecordingStream(response, record)
+        record(response.text)
+        return response
+
+
+class _RecordingModel:
+    """Model that wraps a model of another backend and records what it answers."""
+
+    def __init__(self, backend: "RecordingBackend", inner: Any, model_name: str,
+                 system_instruction: Optional[str]):
+        self.backend = backend
+        self.inner = inner
+        self.model_name = model_name
+        self.system_instruction = system_instruction
+
+    def recorder(self, history: Sequence[Any], content: Union[str, List[Any]]) -> Callable[[str], None]:
+        """Key a request now (before the history changes) and return a function that records its response."""
+        key = history_key(self.model_name, self.system_instruction, history, content)
+        message = _content_text(content)
+        return lambda response: self.backend.record(key, self.model_name, message, response)
+
+    def start_chat(self, history: Optional[Sequence[Any]] = None) -> _RecordingChatSession:
+        return _RecordingChatSession(self, self.inner.start_chat(history=history or []))
+
+    def generate_content(self, prompt: Union[str, List[Any]], request_options: Optional[dict] = None) -> Any:
+        record = self.recorder([], prompt)
+        response = self.inner.generate_content(prompt, request_options=request_options)
+        record(response.text)
+        return response
+
+    async def generate_content_async(self, prompt: Union[str, List[Any]],
+                                     request_options: Optional[dict] = None) -> Any:
+        record = self.recorder([], prompt)
+        response = await self.inner.generate_content_async(prompt, request_options=request_options)
+        record(response.text)
+        return response
+
+
+class RecordingBackend(ModelBackend):
+    """
+    Proxy that forwards to another backend and saves each request/response pair.
+
+    Pairs are appended to a JSON-lines file keyed by ``history_key``, which
+    ReplayBackend serves them from.
+    """
+
+    name = 'record'
+
+    def __init__(self, inner: ModelBackend, path: str = DEFAULT_RECORDINGS):
+        """
+        Initialize the recording proxy.
+
+        Args:
+            inner: Backend that produces the responses (usually GeminiBackend)
+            path: Recordings file to append to
+        """
+        self.inner = inner
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def build_model(self, model_name: str, system_instruction: Optional[str] = None) -> _RecordingModel:
+        inner = self.inner.build_model(model_name, system_instruction)
+        return _RecordingModel(self, inner, model_name, system_instruction)
+
+    def record(self, key: str, model_name: str, message: str, response: str) -> None:
+        """Append one request/response pair to the recordings file."""
+        line = json.dumps({
+            'key': key,
+            'model': model_name,
+            'message': message,
+            'response': response,
+            'recorded': time.time()
+        }, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+
+def create_backend(backend_config: Optional[Dict[str, Any]], api_key: str) -> ModelBackend:
+    """
+    Create the backend selected in zen_config.yaml (`ai.backend`).
+
+    Args:
+        backend_config: The `ai.backend` section (live backend if empty)
+        api_key: Gemini API key for the live and record backends
+
+    Returns:
+        The configured backend
+    """
+    config = backend_config or {}
+    kind = config.get('type', 'live')
+    recordings = config.get('recordings', DEFAULT_RECORDINGS)
+    timing = {
+        'latency': config.get('latency', 0.0),
+        'chunk_latency': config.get('chunk_latency', 0.0),
+        'chunk_size': config.get('chunk_size', 20)
+    }
+    if kind == 'live':
+        return GeminiBackend(api_key)
+    if kind == 'record':
+        return RecordingBackend(GeminiBackend(api_key), recordings)
+    if kind == 'replay':
+        return ReplayBackend(recordings, **timing)
+    if kind == 'fake':
+        return ScriptedBackend(config.get('script'), **timing)
+    raise ValueError(f"Unknown AI backend type '{kind}' (expected live, record, replay or fake)")
@@ -0,0 +1,331 @@
+"""
+Client-side policy for LLM calls in Zen AI.
+Retries transient failures with exponential backoff and jitter, limits the
+request rate with a token bucket and the number of calls in flight, and
+gives every call a deadline.
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, Sequence, TypeVar
+
+from ..metrics import LLM_RETRIES, LLM_WAIT_SECONDS, LLM_DEADLINES_EXCEEDED
+
+T = TypeVar('T')
+
+# HTTP statuses worth retrying: rate limited, server errors, gateway timeouts
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an LLM call cannot complete within its deadline."""
+
+
+class Deadline:
+    """Point in time by which a call has to be done (none if seconds is not set)."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.at = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        if self.at is None:
+            return None
+        return max(0.0, self.at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.at is not None and time.monotonic() >= self.at
+
+
+class TokenBucket:
+    """
+    Rate limiter: `rate` requests per second on average, bursts of up to `burst`.
+
+    A caller reserves a token and then waits until it is due, so waiting
+    callers are served in the order they arrived.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = max(1.0, burst if burst else rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: Optional[float] = None) -> Optional[float]:
+        """
+        Take a token.
+
+        Args:
+            max_wait: Longest acceptable wait (no limit if not specified)
+
+        Returns:
+            Seconds to wait before using the token, or None (and nothing is
+            taken) if that would be longer than max_wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+            if max_wait is not None and wait > max_wait:
+                return None
+            self.tokens -= 1
+            return wait
+
+
+class ConcurrencyLimit:
+    """Caps the number of calls in flight across threads and event loops."""
+
+    # Polling interval of async waiters (they cannot block on the condition)
+    POLL_MIN = 0.005
+    POLL_MAX = 0.05
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._condition = threading.Condition()
+
+    def _try_acquire(self) -> bool:
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a free slot; False if none became free within timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.active < self.limit, timeout):
+                return False
+            self.active += 1
+            return True
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> bool:
+        """Wait for a free slot without blocking the event loop."""
+        end = time.monotonic() + timeout if timeout is not None else None
+        interval = self.POLL_MIN
+        while not self._try_acquire():
+            if end is not None and time.monotonic() >= end:
+                return False
+            await asyncio.sleep(interval if end is None else min(interval, max(0.0, end - time.monotonic())))
+            interval = min(interval * 2, self.POLL_MAX)
+        return True
+
+    def release(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class CallPolicy:
+    """
+    Retry, rate limit, concurrency cap and deadline for LLM calls.
+
+    Share one policy between all Gemini clients that use the same quota; the
+    token bucket and the concurrency cap then apply to all of them together.
+    """
+
+    def __init__(self, max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 20.0,
+                 retry_statuses: Sequence[int] = RETRY_STATUSES, rate: Optional[float] = None,
+                 burst: Optional[float] = None, max_concurrent: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            max_retries: Retries after the first attempt of a call
+            backoff_base: Upper bound of the first retry's random delay in seconds;
+                doubles with every further retry
+            backoff_max: Upper bound of any retry delay in seconds
+            retry_statuses: HTTP statuses of errors that are retried
+            rate: Requests per second (no limit if not specified)
+            burst: Requests that may be sent at once after a quiet period (rate if not specified)
+            max_concurrent: Calls in flight at once (no limit if not specified)
+            deadline: Seconds a call may take including waits and retries (no limit if not specified)
+        """
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = set(retry_statuses)
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.slots = ConcurrencyLimit(max_concurrent) if max_concurrent else None
+        self.deadline_seconds = deadline
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "CallPolicy":
+        """Build a policy from the `ai.limits` section of zen_config.yaml."""
+        config = config or {}
+        return cls(
+            max_retries=config.get('max_retries', 3),
+            backoff_base=config.get('backoff_base', 0.5),
+            backoff_max=config.get('backoff_max', 20.0),
+            retry_statuses=config.get('retry_statuses', RETRY_STATUSES),
+            rate=config.get('requests_per_second') or None,
+            burst=config.get('burst'),
+            max_concurrent=config.get('max_concurrent') or None,
+            deadline=config.get('deadline') or None
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """Calls currently holding a concurrency slot."""
+        return self.slots.active if self.slots else 0
+
+    def new_deadline(self) -> Deadline:
+        return Deadline(self.deadline_seconds)
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """Whether an error is transient: a retryable HTTP status, a timeout or a connection error."""
+        if isinstance(error, DeadlineExceeded):
+            return False
+        if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+            return True
+        # google.api_core errors carry the HTTP status as `code`
+        code = getattr(error, 'code', None)
+        return isinstance(code, int) and code in self.retry_statuses
+
+    def backoff(self, retry: int) -> float:
+        """Delay before retry number retry + 1: full jitter, random up to base * 2^retry."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retry)))
+
+    def _expired(self, model: str, waiting_for: str) -> DeadlineExceeded:
+        LLM_DEADLINES_EXCEEDED.inc(model=model)
+        return DeadlineExceeded(f"Deadline of {self.deadline_seconds}s exceeded waiting for {waiting_for}")
+
+    def _retry_delay(self, error: Exception, retry: int, deadline: Deadline, model: str) -> Optional[float]:
+        """Delay before retrying a failed attempt, or None to give up."""
+        if retry >= self.max_retries or not self.is_retryable(error):
+            return None
+        delay = self.backoff(retry)
+        remaining = deadline.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+        reason = getattr(error, 'code', None)
+        LLM_RETRIES.inc(model=model, reason=reason if isinstance(reason, int) else type(error).__name__)
+        self.logger.warning(f"LLM call failed ({str(error)}), retry {retry + 1} of {self.max_retries} "
+                            f"in {delay:.2f}s")
+        return delay
+
+    def _rate_wait(self, deadline: Deadline, model: str) -> float:
+        """Reserve a request from the token bucket; return how long to wait for it."""
+        if self.bucket is None:
+            return 0.0
+        wait = self.bucket.reserve(deadline.remaining())
+        if wait is None:
+            raise self._expired(model, 'the rate limit')
+        LLM_WAIT_SECONDS.observe(wait, model=model, limiter='rate')
+        return wait
+
+    @contextmanager
+    def slot(self, deadline: Deadline, model: str) -> Iterator[None]:
+        """Hold a concurrency slot for a call (e.g. the whole of a stream)."""
+        if self.slots is None:
+            yield
+            return
+        start = time.perf_counter()
+        if not self.slots.acquire(deadline.remaining()):
+            raise self._expired(model, 'a free slot')
+        LLM_WAIT_SECONDS.observe(time.perf_counter() - start, model=model, limiter='concurrency')
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    @asynccontextmanager
+    async def slot_async(self, deadline: Deadline, model: str) -> AsyncIterator[None]:
+        """Async variant of slot."""
+        if self.slots is None:
+            yield
+            return
+        start = time.perf_counter()
+        if not await self.slots.acquire_async(deadline.remaining()):
+            raise self._expired(model, 'a free slot')
+        LLM_WAIT_SECONDS.observe(time.perf_counter() - start, model=model, limiter='concurrency')
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    def retry(self, attempt: Callable[[Optional[float]], T], deadline: Deadline, model: str) -> T:
+        """
+        Run attempts until one succeeds, the error is not transient or retries run out.
+
+        Args:
+            attempt: Makes the request; gets the seconds left until the deadline (or None)
+            deadline: Deadline of the call
+            model: Model name for metrics
+
+        Returns:
+            The result of the successful attempt
+        """
+        retry = 0
+        while True:
+            wait = self._rate_wait(deadline, model)
+            if wait:
+                time.sleep(wait)
+            if deadline.expired():
+                raise self._expired(model, 'the rate limit')
+            try:
+                return attempt(deadline.remaining())
+            except Exception as e:
+                if deadline.expired():
+                    LLM_DEADLINES_EXCEEDED.inc(model=model)
+                    raise
+                delay = self._retry_delay(e, retry, deadline, model)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            retry += 1
+
+    async def retry_async(self, attempt: Callable[[Optional[float]], Awaitable[T]],
+                          deadline: Deadline, model: str) -> T:
+        """Async variant of retry; an attempt is cancelled when the deadline passes."""
+        retry = 0
+        while True:
+            wait = self._rate_wait(deadline, model)
+            if wait:
+                await asyncio.sleep(wait)
+            if deadline.expired():
+                raise self._expired(model, 'the rate limit')
+            remaining = deadline.remaining()
+            try:
+                return await asyncio.wait_for(attempt(remaining), remaining)
+            except asyncio.TimeoutError as e:
+                if deadline.expired():
+                    raise self._expired(model, 'the response') from e
+                delay = self._retry_delay(e, retry, deadline, model)
+                if delay is None:
+                    raise
+            except Exception as e:
+                delay = self._retry_delay(e, retry, deadline, model)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            retry += 1
+
+    def call(self, attempt: Callable[[Optional[float]], T], model: str) -> T:
+        """Make a call under the policy (slot, rate limit, retries and deadline)."""
+        deadline = self.new_deadline()
+        with self.slot(deadline, model):
+            return self.retry(attempt, deadline, model)
+
+    async def call_async(self, attempt: Callable[[Optional[float]], Awaitable[T]], model: str) -> T:
+        """Async variant of call."""
+        deadline = self.new_deadline()
+        async with self.slot_async(deadline, model):
+            return await self.retry_async(attempt, deadline, model)
+
+
+# Used by Gemini clients that are not given a policy, so they share its limits
+DEFAULT_POLICY = CallPolicy()
+
+
+def request_options(timeout: Optional[float]) -> dict:
+    """Keyword arguments that pass a timeout to the SDK (none without a deadline)."""
+    return {'request_options': {'timeout': timeout}} if timeout is not None else {}
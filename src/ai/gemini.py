@@ -1,12 +1,21 @@
-import google.generativeai as genai
+import time
 import asyncio
-from typing import Any, List, Optional, Union, AsyncGenerator
+import logging
+from contextlib import contextmanager
+from typing import Any, List, Optional, Union, AsyncGenerator, Iterator
+
+from .backends import ModelBackend, GeminiBackend
+from .history import HistoryPolicy, CompactionReport
+from .call_policy import CallPolicy, DEFAULT_POLICY, request_options
+from ..metrics import TRACER, LLM_SECONDS, LLM_FIRST_CHUNK_SECONDS, LLM_ERRORS, in_current_context
 
 
 class Gemini:
     """Simple Gemini AI client with just the basics."""
     
-    def __init__(self, api_key: str, model: str, system_instruction: str = None):
+    def __init__(self, api_key: str, model: str, system_instruction: str = None,
+                 backend: Optional[ModelBackend] = None, history_policy: Optional[HistoryPolicy] = None,
+                 call_policy: Optional[CallPolicy] = None):
         """
         Initialize the Gemini client.
         
@@ -14,22 +23,56 @@ class Gemini:
             api_key: Gemini API key
             model: Model name to use
             system_instruction: System instruction for the model
+            backend: Backend that builds the models (the live API if not specified)
+            history_policy: Compaction applied to every chat's history before
+                each message (histories grow without bound if not specified)
+            call_policy: Retries, rate limit, concurrency cap and deadline of API calls
+                (DEFAULT_POLICY, shared by all clients, if not specified)
         """
         self.api_key = api_key
         self.model_name = model
         self.system_instruction = system_instruction
-        
-        # Configure the API
-        genai.configure(api_key=api_key)
+        self.backend = backend or GeminiBackend(api_key)
+        self.call_policy = call_policy or DEFAULT_POLICY
         
         # Initialize the model
-        self.model = genai.GenerativeModel(
-            model_name=model,
-            system_instruction=system_instruction
-        )
+        self.model = self.backend.build_model(model, system_instruction)
         
         self.chat_sessions = {}  # Store multiple chat sessions by name
         self.current_chat = None  # Current active chat session name
+        
+        self.history_policy = history_policy
+        self.history_policies = {}  # Per-chat policies overriding history_policy
+        self.compactions = {}  # Chat name -> last CompactionReport that changed the history
+        self.tokens_saved = 0  # Estimated tokens saved by compaction, all chats
+        self.logger = logging.getLogger(__name__)
+    
+    @contextmanager
+    def _measure(self, call: str) -> Iterator[Any]:
+        """
+        Time an LLM call into the metrics and a span.
+
+        Yields:
+            Function to call on each streamed chunk (only the first one counts)
+        """
+        start = time.perf_counter()
+        span = TRACER.start_span(f'llm.{call}', {'zen.model': self.model_name})
+        seen = []
+
+        def first_chunk() -> None:
+            if not seen:
+                seen.append(True)
+                LLM_FIRST_CHUNK_SECONDS.observe(time.perf_counter() - start, model=self.model_name)
+
+        try:
+            yield first_chunk
+        except Exception as e:
+            LLM_ERRORS.inc(model=self.model_name, call=call)
+            span.record_error(e)
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - start, model=self.model_name, call=call)
+            span.end()
     
     def generate(self, prompt: Union[str, List[Any]]) -> str:
         """
@@ -42,8 +85,12 @@ class Gemini:
             Generated response text
         """
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            with self._measure('generate'):
+                response = self.call_policy.call(
+                    lambda timeout: self.model.generate_content(prompt, **request_options(timeout)),
+                    self.model_name
+                )
+                return response.text
         except Exception as e:
             raise Exception(f"Error generating response: {e}")
     
@@ -58,8 +105,12 @@ class Gemini:
             Generated response text
         """
         try:
-            response = await self.model.generate_content_async(prompt)
-            return response.text
+            with self._measure('generate'):
+                response = await self.call_policy.call_async(
+                    lambda timeout: self.model.generate_content_async(prompt, **request_options(timeout)),
+                    self.model_name
+                )
+                return response.text
         except Exception as e:
             raise Exception(f"Error generating response: {e}")
     
@@ -74,6 +125,84 @@ class Gemini:
         self.chat_sessions[name] = self.model.start_chat(history=history or [])
         self.current_chat = name
     
+    def _open_session(self, chat_name: str = None, model: Optional[Any] = None):
+        """Get a chat session and its name, starting it if needed, and point it at the given model."""
+        chat_name = chat_name or self.current_chat
+        
+        if not chat_name or chat_name not in self.chat_sessions:
+            self.start_chat(chat_name or "default")
+            chat_name = chat_name or "default"
+        
+        session = self.chat_sessions[chat_name]
+        session.model = model or self.model
+        return chat_name, session
+    
+    def _get_session(self, chat_name: str = None, model: Optional[Any] = None):
+        """Get a chat session with its history compacted (see _open_session)."""
+        chat_name, session = self._open_session(chat_name, model)
+        self._compact(chat_name, session)
+        return session
+    
+    async def _get_session_async(self, chat_name: str = None, model: Optional[Any] = None):
+        """
+        Async variant of _get_session.
+        
+        Compaction runs on an executor thread: a model summarizer makes a
+        blocking API call (with retries and rate limit waits) that would
+        otherwise stall every other coroutine on the event loop.
+        """
+        chat_name, session = self._open_session(chat_name, model)
+        await asyncio.get_running_loop().run_in_executor(None, in_current_context(self._compact, chat_name, session))
+        return session
+    
+    def set_history_policy(self, policy: Optional[HistoryPolicy], chat_name: str = None) -> None:
+        """
+        Set the history policy of one chat, or the default for all chats.
+        
+        Args:
+            policy: The policy (None disables compaction)
+            chat_name: Chat to set it for (the default policy if not specified)
+        """
+        if chat_name is None:
+            self.history_policy = policy
+        else:
+            self.history_policies[chat_name] = policy
+    
+    def _compact(self, chat_name: str, session: Any) -> Optional[CompactionReport]:
+        """Apply the chat's history policy before a message is sent."""
+        policy = self.history_policies.get(chat_name, self.history_policy)
+        if policy is None:
+            return None
+        try:
+            history, report = policy.compact(session.history)
+            if not report.changed:
+                return report
+            session.history = history
+        except Exception as e:
+            # A broken history is reported by send_message itself
+            self.logger.warning(f"Could not compact history of chat {chat_name}: {str(e)}")
+            return None
+        self.compactions[chat_name] = report
+        self.tokens_saved += report.tokens_saved
+        self.logger.info(
+            f"Compacted history of chat {chat_name}: {report.tokens_before} -> {report.tokens_after} "
+            f"tokens ({report.tokens_saved} saved, {report.turns_dropped} turns dropped, "
+            f"{report.results_elided} tool results elided)"
+        )
+        return report
+    
+    def build_model(self, system_instruction: str = None):
+        """
+        Build a model with the same settings as this client but a different system instruction.
+        
+        Args:
+            system_instruction: System instruction for the new model
+            
+        Returns:
+            Model usable with the ``model`` argument of the chat methods
+        """
+        return self.backend.build_model(self.model_name, system_instruction)
+    
     def switch_chat(self, name: str) -> None:
         """Switch to a different chat session."""
         if name in self.chat_sessions:
@@ -85,49 +214,142 @@ class Gemini:
         """List all available chat sessions."""
         return list(self.chat_sessions.keys())
     
-    def chat(self, message: Union[str, List[Any]], chat_name: str = None) -> str:
+    def chat(self, message: Union[str, List[Any]], chat_name: str = None,
+             model: Optional[Any] = None) -> str:
         """
         Send a message in chat session.
         
         Args:
             message: Message to send
             chat_name: Name of chat session (uses current if not specified)
+            model: Model to answer with instead of the default one (see build_model);
+                the session's history is kept
             
         Returns:
             Response text
         """
-        chat_name = chat_name or self.current_chat
-        
-        if not chat_name or chat_name not in self.chat_sessions:
-            self.start_chat(chat_name or "default")
-            chat_name = chat_name or "default"
+        session = self._get_session(chat_name, model)
         
         try:
-            response = self.chat_sessions[chat_name].send_message(message)
-            return response.text
+            with self._measure('chat'):
+                response = self.call_policy.call(
+                    lambda timeout: session.send_message(message, **request_options(timeout)),
+                    self.model_name
+                )
+                return response.text
         except Exception as e:
             raise Exception(f"Error in chat: {e}")
     
-    async def chat_async(self, message: Union[str, List[Any]], chat_name: str = None) -> str:
+    async def chat_async(self, message: Union[str, List[Any]], chat_name: str = None,
+                         model: Optional[Any] = None) -> str:
         """
         Send a message in chat session asynchronously.
         
         Args:
             message: Message to send
             chat_name: Name of chat session (uses current if not specified)
+            model: Model to answer with instead of the default one (see build_model);
+                the session's history is kept
             
         Returns:
             Response text
         """
-        chat_name = chat_name or self.current_chat
+        session = await self._get_session_async(chat_name, model)
         
-        if not chat_name or chat_name not in self.chat_sessions:
-            self.start_chat(chat_name or "default")
-            chat_name = chat_name or "default"
+        try:
+            with self._measure('chat'):
+                response = await self.call_policy.call_async(
+                    lambda timeout: session.send_message_async(message, **request_options(timeout)),
+                    self.model_name
+                )
+                return response.text
+        except Exception as e:
+            raise Exception(f"Error in chat: {e}")
+    
+    def chat_stream(self, message: Union[str, List[Any]], chat_name: str = None,
+                    model: Optional[Any] = None) -> Iterator[str]:
+        """
+        Send a message in chat session and yield the response as it is generated.
+        
+        The chat history is updated once the stream has been fully consumed.
+        Only opening the stream is retried (see CallPolicy); an error after
+        the first chunk is raised as is, since text already yielded cannot be
+        taken back.
+        
+        Args:
+            message: Message to send
+            chat_name: Name of chat session (uses current if not specified)
+            model: Model to answer with instead of the default one (see build_model)
+            
+        Yields:
+            Partial response text chunks
+        """
+        session = self._get_session(chat_name, model)
+        
+        try:
+            deadline = self.call_policy.new_deadline()
+            with self._measure('chat_stream') as first_chunk, self.call_policy.slot(deadline, self.model_name):
+                # Only opening the stream is retried; text already yielded cannot be taken back
+                response = self.call_policy.retry(
+                    lambda timeout: session.send_message(message, stream=True, **request_options(timeout)),
+                    deadline, self.model_name
+                )
+                try:
+                    for chunk in response:
+                        # The final chunk may only carry a finish reason and no text
+                        if chunk.parts:
+                            first_chunk()
+                            yield chunk.text
+                except BaseException:
+                    # Drain the stream if the caller stopped early, otherwise the
+                    # chat history stays locked on an incomplete response; a
+                    # failure to do so must not hide the error already raised
+                    try:
+                        response.resolve()
+                    except Exception as e:
+                        self.logger.warning(f"Could not resolve interrupted stream: {str(e)}")
+                    raise
+                response.resolve()
+        except Exception as e:
+            raise Exception(f"Error in chat: {e}")
+    
+    async def chat_stream_async(self, message: Union[str, List[Any]], chat_name: str = None,
+                                model: Optional[Any] = None) -> AsyncGenerator[str, None]:
+        """
+        Send a message in chat session asynchronously and yield the response as it is generated.
+        
+        As with chat_stream, only opening the stream is retried, not a failure mid-stream.
+        
+        Args:
+            message: Message to send
+            chat_name: Name of chat session (uses current if not specified)
+            model: Model to answer with instead of the default one (see build_model)
+            
+        Yields:
+            Partial response text chunks
+        """
+        session = await self._get_session_async(chat_name, model)
         
         try:
-            response = await self.chat_sessions[chat_name].send_message_async(message)
-            return response.text
+            deadline = self.call_policy.new_deadline()
+            with self._measure('chat_stream') as first_chunk:
+                async with self.call_policy.slot_async(deadline, self.model_name):
+                    response = await self.call_policy.retry_async(
+                        lambda timeout: session.send_message_async(message, stream=True, **request_options(timeout)),
+                        deadline, self.model_name
+                    )
+                    try:
+                        async for chunk in response:
+                            if chunk.parts:
+                                first_chunk()
+                                yield chunk.text
+                    except BaseException:
+                        try:
+                            await response.resolve()
+                        except Exception as e:
+                            self.logger.warning(f"Could not resolve interrupted stream: {str(e)}")
+                        raise
+                    await response.resolve()
         except Exception as e:
             raise Exception(f"Error in chat: {e}")
     
@@ -158,10 +380,12 @@ class Gemini:
         
         if chat_name and chat_name in self.chat_sessions:
             del self.chat_sessions[chat_name]
+            self.compactions.pop(chat_name, None)
             if self.current_chat == chat_name:
                 self.current_chat = None
     
     def clear_all_chats(self) -> None:
         """Clear all chat sessions."""
         self.chat_sessions.clear()
+        self.compactions.clear()
         self.current_chat = None
\ No newline at end of file
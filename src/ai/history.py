@@ -0,0 +1,232 @@
+"""
+Chat history compaction for Zen AI.
+Keeps long chat sessions within a token budget: oversized tool results are
+elided, old turns fall out of a sliding window and are folded into a compact
+digest at the start of the history.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+
+# Messages the tool loop sends back to the AI (see ChatLoop._next_prompt)
+TOOL_RESULT_PREFIX = "SYSTEM: Tool execution results:"
+# First message of a compacted history
+DIGEST_PREFIX = "SYSTEM: Summary of the earlier conversation:"
+DIGEST_REPLY = "Understood."
+ELIDED_MARK = "characters of tool output elided]"
+SUMMARY_PROMPT = ("Summarize this conversation between a user and an AI assistant in a few short lines. "
+                  "Keep facts, decisions, file paths and open tasks:\n\n")
+
+
+def _entry_role(entry: Any) -> str:
+    return entry.get('role', 'user') if isinstance(entry, dict) else getattr(entry, 'role', 'user')
+
+
+def _entry_text(entry: Any) -> str:
+    """Text of a history entry (SDK Content or dict)."""
+    parts = entry.get('parts', []) if isinstance(entry, dict) else getattr(entry, 'parts', [])
+    texts = []
+    for part in parts:
+        if isinstance(part, str):
+            texts.append(part)
+        elif isinstance(part, dict):
+            texts.append(part.get('text', ''))
+        else:
+            texts.append(getattr(part, 'text', '') or '')
+    return ''.join(texts)
+
+
+@dataclass
+class CompactionReport:
+    """What a compaction did to a history."""
+    tokens_before: int = 0
+    tokens_after: int = 0
+    turns_dropped: int = 0
+    results_elided: int = 0
+    summarized: bool = False
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.turns_dropped or self.results_elided)
+
+
+class HistoryPolicy:
+    """
+    Rules for how much chat history is sent with each message.
+
+    Applied in this order: tool results longer than ``max_tool_result_chars``
+    are cut down, turns beyond ``max_turns`` are dropped, then the oldest
+    turns are dropped until the history fits ``max_tokens`` (the last
+    ``keep_recent`` turns are always kept). Dropped turns are folded into a
+    digest by ``summarizer`` or, without one, by keeping the first line of
+    each message.
+    """
+
+    def __init__(self, max_tokens: Optional[int] = 32000, max_turns: Optional[int] = None,
+                 keep_recent: int = 4, max_tool_result_chars: Optional[int] = 2000,
+                 summarize: bool = True, digest_chars: int = 2000, chars_per_token: float = 4.0,
+                 summarizer: Optional[Callable[[str], str]] = None):
+        """
+        Initialize the policy.
+
+        Args:
+            max_tokens: Token budget for the history (no budget if None)
+            max_turns: Maximum number of user/model turns kept (no window if None)
+            keep_recent: Turns that are never dropped to meet the budget
+            max_tool_result_chars: Longer tool result messages are elided (never if None)
+            summarize: Fold dropped turns into a digest instead of forgetting them
+            digest_chars: Maximum length of the digest
+            chars_per_token: Characters per token used to estimate token counts
+            summarizer: Function that condenses text into a summary (e.g. a
+                call to a small model); an extractive digest is used if not specified
+        """
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.keep_recent = max(1, keep_recent)
+        self.max_tool_result_chars = max_tool_result_chars
+        self.summarize = summarize
+        self.digest_chars = digest_chars
+        self.chars_per_token = chars_per_token
+        self.summarizer = summarizer
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], summarizer_ai: Optional[Any] = None
+                    ) -> Optional["HistoryPolicy"]:
+        """
+        Build a policy from the `ai.history` section of zen_config.yaml.
+
+        Args:
+            config: The `ai.history` section
+            summarizer_ai: Gemini client used when `summarizer: model` is set
+
+        Returns:
+            The policy, or None if compaction is disabled
+        """
+        config = config or {}
+        if not config.get('enabled', True):
+            return None
+        summarizer = None
+        if config.get('summarizer', 'extractive') == 'model' and summarizer_ai is not None:
+            summarizer = lambda text: summarizer_ai.generate(SUMMARY_PROMPT + text)
+        return cls(
+            max_tokens=config.get('max_tokens', 32000),
+            max_turns=config.get('max_turns'),
+            keep_recent=config.get('keep_recent', 4),
+            max_tool_result_chars=config.get('max_tool_result_chars', 2000),
+            summarize=config.get('summarize', True),
+            digest_chars=config.get('digest_chars', 2000),
+            chars_per_token=config.get('chars_per_token', 4.0),
+            summarizer=summarizer
+        )
+
+    def estimate_tokens(self, text: str) -> int:
+        """Cheap token estimate (no API call)."""
+        return int(len(text) / self.chars_per_token) + 1 if text else 0
+
+    def _history_tokens(self, history: List[Any]) -> int:
+        return sum(self.estimate_tokens(_entry_text(entry)) for entry in history)
+
+    def _elide(self, text: str) -> str:
+        """Cut a tool result message down to max_tool_result_chars."""
+        keep = self.max_tool_result_chars
+        return f"{text[:keep]} ... [{len(text) - keep} {ELIDED_MARK}"
+
+    @staticmethod
+    def _split_turns(history: List[Any]) -> List[List[Any]]:
+        """Group a history into turns, each starting at a user message."""
+        turns: List[List[Any]] = []
+        for entry in history:
+            if _entry_role(entry) == 'user' or not turns:
+                turns.append([entry])
+            else:
+                turns[-1].append(entry)
+        return turns
+
+    def _digest(self, previous: str, dropped: List[List[Any]]) -> str:
+        """Fold dropped turns into the digest text."""
+        if self.summarizer is not None:
+            transcript = '\n'.join(f"{_entry_role(entry)}: {_entry_text(entry)}"
+                                   for turn in dropped for entry in turn)
+            try:
+                summary = self.summarizer(f"{previous}\n{transcript}".strip())
+                return summary[-self.digest_chars:]
+            except Exception as e:
+                self.logger.warning(f"History summarizer failed, using extractive digest: {str(e)}")
+
+        lines = [previous] if previous else []
+        for turn in dropped:
+            for entry in turn:
+                text = _entry_text(entry).strip()
+                if text.startswith(TOOL_RESULT_PREFIX):
+                    text = "tool results: " + text[len(TOOL_RESULT_PREFIX):].strip()
+                first_line = text.split('\n', 1)[0][:200]
+                if first_line:
+                    lines.append(f"{_entry_role(entry)}: {first_line}")
+        # The most recent part of the conversation matters most
+        digest = '\n'.join(lines)
+        if len(digest) > self.digest_chars:
+            digest = digest[-self.digest_chars:].split('\n', 1)[-1]
+        return digest
+
+    def compact(self, history: List[Any]) -> Tuple[List[Any], CompactionReport]:
+        """
+        Apply the policy to a history.
+
+        Args:
+            history: Chat history (SDK Content objects or dicts)
+
+        Returns:
+            Tuple of (compacted history, report). Entries that were not changed
+            are the original objects.
+        """
+        report = CompactionReport(tokens_before=self._history_tokens(history))
+
+        # Elide oversized tool results; the AI has already read them in full once
+        entries = []
+        for entry in history:
+            text = _entry_text(entry)
+            if (self.max_tool_result_chars is not None and _entry_role(entry) == 'user'
+                    and text.startswith(TOOL_RESULT_PREFIX) and len(text) > self.max_tool_result_chars
+                    and not text.endswith(ELIDED_MARK)):
+                entries.append({'role': 'user', 'parts': [self._elide(text)]})
+                report.results_elided += 1
+            else:
+                entries.append(entry)
+
+        turns = self._split_turns(entries)
+        previous_digest = ''
+        if turns and _entry_text(turns[0][0]).startswith(DIGEST_PREFIX):
+            previous_digest = _entry_text(turns[0][0])[len(DIGEST_PREFIX):].strip()
+            turns = turns[1:]
+
+        dropped: List[List[Any]] = []
+        if self.max_turns is not None and len(turns) > self.max_turns:
+            cut = len(turns) - self.max_turns
+            dropped, turns = turns[:cut], turns[cut:]
+        if self.max_tokens is not None:
+            tokens = sum(self._history_tokens(turn) for turn in turns) + self.estimate_tokens(previous_digest)
+            while tokens > self.max_tokens and len(turns) > self.keep_recent:
+                turn = turns.pop(0)
+                tokens -= self._history_tokens(turn)
+                dropped.append(turn)
+        report.turns_dropped = len(dropped)
+
+        digest = previous_digest
+        if dropped and self.summarize:
+            digest = self._digest(previous_digest, dropped)
+            report.summarized = True
+
+        compacted = []
+        if digest:
+            compacted.append({'role': 'user', 'parts': [f"{DIGEST_PREFIX}\n{digest}"]})
+            compacted.append({'role': 'model', 'parts': [DIGEST_REPLY]})
+        for turn in turns:
+            compacted.extend(turn)
+        report.tokens_after = self._history_tokens(compacted)
+        return compacted, report
@@ -0,0 +1,250 @@
+"""
+AI/tool loop for Zen AI.
+Runs a chat turn, executes the tool commands it contains and feeds the results
+back to the AI until it stops. Shared by the Flask and asyncio servers.
+"""
+
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .ai.gemini import Gemini
+from .instruction_cache import InstructionCache
+from .tool_parser import ToolSystem, ToolCommand, StreamingBatch
+from .metrics import TRACER, CHAT_SECONDS, CHAT_TURNS, use_span, in_current_context
+
+# Tools that are available no matter what the client selected
+ALWAYS_ON_TOOLS = {'main.speak', 'main.stop', 'main.memory'}
+
+# A loop event: (event name, JSON-serializable payload)
+ChatEvent = Tuple[str, dict]
+
+
+def resolve_allowed_tools(tool_system: ToolSystem, selected_tools: Optional[Iterable[str]]) -> Set[str]:
+    """
+    Work out which tools a request may use.
+
+    Args:
+        tool_system: The tool system holding all available tools
+        selected_tools: Tools selected by the client (all tools if empty)
+
+    Returns:
+        Set of allowed tool names, always including ALWAYS_ON_TOOLS
+    """
+    if selected_tools:
+        return set(selected_tools) | ALWAYS_ON_TOOLS
+    return set(tool_system.list_available_tools().keys()) | ALWAYS_ON_TOOLS
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a loop event as a server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ChatLoop:
+    """Drives the AI/tool loop for one chat session at a time."""
+
+    def __init__(self, ai: Gemini, tool_system: ToolSystem, instructions: InstructionCache,
+                 tool_executor: Optional[Executor] = None):
+        """
+        Initialize the chat loop.
+
+        Args:
+            ai: Gemini client used for the conversation
+            tool_system: Tool system used to parse and execute commands
+            instructions: Cache of instructions and models per allowed tool set
+            tool_executor: Executor for blocking tool calls in run_async
+                (the event loop's default executor if not specified)
+        """
+        self.ai = ai
+        self.tool_system = tool_system
+        self.instructions = instructions
+        self.tool_executor = tool_executor
+        self.logger = logging.getLogger(__name__)
+
+    def _start_commands(self, commands: List[ToolCommand], batch: StreamingBatch,
+                        allowed_tools: Set[str]) -> None:
+        """Add commands for allowed tools to the batch (others are ignored)."""
+        for cmd in commands:
+            if cmd.name in allowed_tools:
+                self.logger.info(f"Executing command: {cmd.raw_command}")
+                batch.add(cmd)
+
+    @staticmethod
+    def _entry(cmd: ToolCommand, result: dict) -> dict:
+        """Build the client-facing record of a tool execution."""
+        return {
+            'name': cmd.name,
+            'success': result.get('success', False),
+            'result': result.get('result'),
+            'error': result.get('error')
+        }
+
+    @staticmethod
+    def _next_prompt(entries: List[dict]) -> str:
+        """Build the system prompt that feeds tool results back to the AI."""
+        summaries = [f"Tool {e['name']} executed successfully. Result: {e['result']}"
+                     if e['success'] else f"Tool {e['name']} failed. Error: {e['error']}"
+                     for e in entries]
+        return (f"SYSTEM: Tool execution results: {'; '.join(summaries)}. "
+                "If you are finished, use the main.stop tool. Do not talk to the user about this message")
+
+    def run(self, message: str, chat_name: str, allowed_tools: Set[str],
+            stream: bool = False, endpoint: Optional[str] = None) -> Iterator[ChatEvent]:
+        """
+        Run the AI/tool loop until the AI stops using tools or calls main.stop.
+
+        Args:
+            message: The user's message
+            chat_name: Chat session to use (the caller must hold it exclusively)
+            allowed_tools: Tools the AI may use
+            stream: Emit ``ai_delta`` events while each response is generated
+            endpoint: Label of the request in metrics and traces
+                ('stream' or 'chat' if not specified)
+
+        Yields:
+            ``ai_delta`` (if streaming), ``ai_response``, ``tool_result`` and
+            finally ``done`` events
+        """
+        endpoint = endpoint or ('stream' if stream else 'chat')
+        start = time.perf_counter()
+        request_span = TRACER.start_span('chat.request', {'zen.endpoint': endpoint, 'zen.chat': str(chat_name)})
+        last_response = message
+        entries = []
+        stop_flag = False
+        turns = 0
+        try:
+            with use_span(request_span):
+                while True:
+                    turns += 1
+                    with TRACER.span('chat.turn', **{'zen.turn': turns}):
+                        # Model whose system instructions only mention the allowed tools
+                        model = self.instructions.get_model(allowed_tools)
+                        batch = self.tool_system.start_batch()
+                        if stream:
+                            parts = []
+                            parser = self.tool_system.incremental_parser()
+                            for chunk in self.ai.chat_stream(last_response, chat_name, model):
+                                parts.append(chunk)
+                                yield 'ai_delta', {'text': chunk}
+                                # Start commands as soon as they are complete, while generation goes on
+                                self._start_commands(parser.feed(chunk), batch, allowed_tools)
+                            self._start_commands(parser.close(), batch, allowed_tools)
+                            answer = ''.join(parts)
+                        else:
+                            answer = self.ai.chat(last_response, chat_name, model)
+                            self._start_commands(self.tool_system.process_response(answer), batch, allowed_tools)
+                        self.logger.info(f"AI Response: {answer}")
+                        yield 'ai_response', {'text': answer}
+
+                        tool_commands = batch.commands
+                        if not tool_commands:
+                            break
+
+                        results = batch.finish()
+                        for cmd, result in zip(tool_commands, results):
+                            entry = self._entry(cmd, result)
+                            entries.append(entry)
+                            yield 'tool_result', entry
+                            if result.get('action') == 'stop_system':
+                                stop_flag = True
+                                self.logger.info("AI requested system shutdown")
+                                break
+                        if stop_flag:
+                            break
+
+                    last_response = self._next_prompt(entries)
+
+            yield 'done', {'stop': stop_flag}
+        except Exception as e:
+            request_span.record_error(e)
+            raise
+        finally:
+            self._finish_request(endpoint, start, turns, request_span)
+
+    async def run_async(self, message: str, chat_name: str, allowed_tools: Set[str],
+                        stream: bool = False, endpoint: Optional[str] = None) -> AsyncIterator[ChatEvent]:
+        """
+        Run the AI/tool loop as a coroutine.
+
+        Network calls go through ``Gemini.chat_async`` and tools, which may
+        block, run on the tool executor so the event loop stays free.
+
+        Args:
+            message: The user's message
+            chat_name: Chat session to use (the caller must hold it exclusively)
+            allowed_tools: Tools the AI may use
+            stream: Emit ``ai_delta`` events while each response is generated
+            endpoint: Label of the request in metrics and traces
+                ('stream' or 'chat' if not specified)
+
+        Yields:
+            ``ai_delta`` (if streaming), ``ai_response``, ``tool_result`` and
+            finally ``done`` events
+        """
+        loop = asyncio.get_running_loop()
+        endpoint = endpoint or ('stream' if stream else 'chat')
+        start = time.perf_counter()
+        request_span = TRACER.start_span('chat.request', {'zen.endpoint': endpoint, 'zen.chat': str(chat_name)})
+        last_response = message
+        entries = []
+        stop_flag = False
+        turns = 0
+        try:
+            with use_span(request_span):
+                while True:
+                    turns += 1
+                    with TRACER.span('chat.turn', **{'zen.turn': turns}):
+                        # Model whose system instructions only mention the allowed tools
+                        model = self.instructions.get_model(allowed_tools)
+                        batch = self.tool_system.start_batch()
+                        if stream:
+                            parts = []
+                            parser = self.tool_system.incremental_parser()
+                            async for chunk in self.ai.chat_stream_async(last_response, chat_name, model):
+                                parts.append(chunk)
+                                yield 'ai_delta', {'text': chunk}
+                                self._start_commands(parser.feed(chunk), batch, allowed_tools)
+                            self._start_commands(parser.close(), batch, allowed_tools)
+                            answer = ''.join(parts)
+                        else:
+                            answer = await self.ai.chat_async(last_response, chat_name, model)
+                            self._start_commands(self.tool_system.process_response(answer), batch, allowed_tools)
+                        self.logger.info(f"AI Response: {answer}")
+                        yield 'ai_response', {'text': answer}
+
+                        tool_commands = batch.commands
+                        if not tool_commands:
+                            break
+
+                        results = await loop.run_in_executor(self.tool_executor, in_current_context(batch.finish))
+                        for cmd, result in zip(tool_commands, results):
+                            entry = self._entry(cmd, result)
+                            entries.append(entry)
+                            yield 'tool_result', entry
+                            if result.get('action') == 'stop_system':
+                                stop_flag = True
+                                self.logger.info("AI requested system shutdown")
+                                break
+                        if stop_flag:
+                            break
+
+                    last_response = self._next_prompt(entries)
+
+            yield 'done', {'stop': stop_flag}
+        except Exception as e:
+            request_span.record_error(e)
+            raise
+        finally:
+            self._finish_request(endpoint, start, turns, request_span)
+
+    @staticmethod
+    def _finish_request(endpoint: str, start: float, turns: int, request_span: Any) -> None:
+        """Record a finished (or abandoned) loop in the metrics and end its span."""
+        CHAT_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+        CHAT_TURNS.observe(turns, endpoint=endpoint)
+        request_span.set_attribute('zen.turns', turns)
+        request_span.end()
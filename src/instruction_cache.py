@@ -0,0 +1,79 @@
+"""
+Instruction cache for Zen AI.
+Memoizes the rendered system instructions and the model built from them for
+each set of allowed tools, so restricting tools per request costs nothing
+after the first turn.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, FrozenSet, Iterable, Tuple
+
+from .ai.gemini import Gemini
+from .tool_info import ToolInfoGenerator
+
+
+class InstructionCache:
+    """LRU cache of (instructions, model) keyed by allowed tools and tool registry version."""
+
+    def __init__(self, ai: Gemini, tool_info_gen: ToolInfoGenerator, base_instructions: str,
+                 max_entries: int = 32):
+        """
+        Initialize the instruction cache.
+
+        Args:
+            ai: Gemini client used to build models
+            tool_info_gen: Generator for tool instructions
+            base_instructions: Base system instructions (from zen_config.yaml)
+            max_entries: Maximum number of cached tool sets
+        """
+        self.ai = ai
+        self.tool_info_gen = tool_info_gen
+        self.base_instructions = base_instructions
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[FrozenSet[str], int], Tuple[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def get(self, allowed_tools: Iterable[str]) -> Tuple[str, Any]:
+        """
+        Get the instructions and model for a set of allowed tools.
+
+        Args:
+            allowed_tools: Tools the AI may use
+
+        Returns:
+            Tuple of (rendered instructions, model built with them)
+        """
+        key = (frozenset(allowed_tools), self.tool_info_gen.version)
+        with self._lock:
+            cached = self.entries.get(key)
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        # Render and build outside the lock; a concurrent miss just builds twice
+        instructions = self.tool_info_gen.update_ai_instructions(self.base_instructions, key[0])
+        model = self.ai.build_model(instructions)
+        self.logger.info(f"Built instructions for {len(key[0])} tools (registry v{key[1]})")
+
+        with self._lock:
+            self.entries[key] = (instructions, model)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return instructions, model
+
+    def get_model(self, allowed_tools: Iterable[str]) -> Any:
+        """Get only the model for a set of allowed tools."""
+        return self.get(allowed_tools)[1]
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self.entries.clear()
@@ -0,0 +1,450 @@
+"""
+Metrics and tracing for Zen AI.
+Counters and histograms for the AI/tool loop, rendered in the Prometheus text
+format, and optional spans exported as OpenTelemetry (OTLP) JSON.
+"""
+
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Seconds; covers fast tools up to slow LLM calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """Base of a metric with a fixed set of label names and one child per label combination."""
+
+    type_name = ''
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, **labels: Any) -> Any:
+        """Child metric for one combination of label values."""
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. requests or errors."""
+
+    type_name = 'counter'
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(child.value)}"
+                for key, child in sorted(self._children.items())]
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g. latencies) in cumulative buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).observe(value)
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(**labels).observe(time.perf_counter() - start)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, child in sorted(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Current value read from a callback when metrics are rendered (e.g. open sessions)."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, help_text: str, callback: Callable[[], float]):
+        super().__init__(name, help_text)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        try:
+            return [f"{self.name} {_format_value(self.callback())}"]
+        except Exception:
+            return []
+
+
+class MetricsRegistry:
+    """Named metrics of the process, rendered together for /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None and not isinstance(metric, Gauge):
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labels: Sequence[str] = ()) -> Counter:
+        """Get or create a counter."""
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name: str, help_text: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram."""
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def gauge(self, name: str, help_text: str, callback: Callable[[], float]) -> Gauge:
+        """Create (or replace) a gauge whose value comes from callback."""
+        return self._register(Gauge(name, help_text, callback))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Metrics of the AI/tool loop
+LLM_SECONDS = REGISTRY.histogram(
+    'zen_llm_request_seconds', 'Duration of LLM calls (whole response for streams)', ['model', 'call'])
+LLM_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    'zen_llm_first_chunk_seconds', 'Time to the first chunk of streamed LLM responses', ['model'])
+LLM_ERRORS = REGISTRY.counter('zen_llm_errors_total', 'Failed LLM calls', ['model', 'call'])
+LLM_RETRIES = REGISTRY.counter(
+    'zen_llm_retries_total', 'Retried LLM requests by reason (HTTP status or error type)', ['model', 'reason'])
+LLM_WAIT_SECONDS = REGISTRY.histogram(
+    'zen_llm_wait_seconds', 'Time LLM calls waited for the rate limiter or a concurrency slot', ['model', 'limiter'],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+LLM_DEADLINES_EXCEEDED = REGISTRY.counter(
+    'zen_llm_deadlines_exceeded_total', 'LLM calls that ran out of time', ['model'])
+PARSE_SECONDS = REGISTRY.histogram(
+    'zen_tool_parse_seconds', 'Time to parse tool commands out of AI responses', ['mode'],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05, 0.1))
+TOOL_SECONDS = REGISTRY.histogram('zen_tool_execution_seconds', 'Duration of tool executions', ['tool'])
+TOOL_CALLS = REGISTRY.counter(
+    'zen_tool_calls_total', 'Tool executions by outcome (ok, error, invalid_args)', ['tool', 'outcome'])
+CHAT_SECONDS = REGISTRY.histogram('zen_chat_request_seconds', 'Duration of whole AI/tool loops', ['endpoint'])
+CHAT_TURNS = REGISTRY.histogram(
+    'zen_chat_turns', 'AI responses per chat request', ['endpoint'], buckets=(1, 2, 3, 5, 8, 13, 20, 50))
+HTTP_REQUESTS = REGISTRY.counter('zen_http_requests_total', 'HTTP requests', ['endpoint', 'method', 'status'])
+HTTP_SECONDS = REGISTRY.histogram(
+    'zen_http_request_seconds', 'Time to the HTTP response (to the first byte for streams)', ['endpoint'])
+
+
+# Span of the current thread or task; nested spans become its children
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar('zen_current_span', default=None)
+
+_STATUS_UNSET, _STATUS_OK, _STATUS_ERROR = 0, 1, 2
+
+
+def _attribute(key: str, value: Any) -> dict:
+    """OTLP attribute (key/value pair with a typed value)."""
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+
+class Span:
+    """One timed operation of a trace."""
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns',
+                 'attributes', 'status', 'status_message')
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.status = _STATUS_UNSET
+        self.status_message = ''
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        """Mark the span failed."""
+        self.status = _STATUS_ERROR
+        self.status_message = str(error)
+        self.attributes['exception.type'] = type(error).__name__
+
+    def end(self) -> None:
+        """Finish the span (only the first call counts)."""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._finish(self)
+
+    def to_otlp(self) -> dict:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1 if self.parent_id else 2,  # INTERNAL, or SERVER for request roots
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_attribute(key, value) for key, value in self.attributes.items()],
+            'status': {'code': self.status}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        if self.status_message:
+            span['status']['message'] = self.status_message
+        return span
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is disabled."""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Records spans and exports each finished trace as one OTLP JSON document.
+
+    A trace is exported when its root span ends, as a line of a JSONL file
+    and into a ring buffer of recent traces. Spans that end after their
+    root (e.g. a tool that outlived its request) are exported on their own.
+    """
+
+    def __init__(self, service_name: str = 'zen'):
+        self.service_name = service_name
+        self.enabled = False
+        self.path: Optional[Path] = None
+        self.recent: deque = deque(maxlen=100)
+        self._open: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def configure(self, config: Optional[dict]) -> None:
+        """
+        Apply the `server.tracing` section of zen_config.yaml.
+
+        Args:
+            config: Dictionary with 'enabled', 'path' (JSONL file, optional) and 'keep' (recent traces)
+        """
+        config = config or {}
+        self.enabled = bool(config.get('enabled', False))
+        path = config.get('path')
+        self.path = Path(path) if path else None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.recent = deque(self.recent, maxlen=config.get('keep', 100))
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                   parent: Any = Ellipsis) -> Any:
+        """
+        Start a span; end it with span.end().
+
+        Args:
+            name: Operation name
+            attributes: Span attributes
+            parent: Parent span (the current span if not specified, None for a new trace)
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        if parent is Ellipsis:
+            parent = _current_span.get()
+        if isinstance(parent, _NoopSpan):
+            parent = None
+        span = Span(self, name, parent, attributes or {})
+        if parent is None:
+            with self._lock:
+                self._open[span.trace_id] = []
+        return span
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Any]:
+        """Run a block in a new child span of the current one; exceptions mark it failed."""
+        span = self.start_span(name, attributes)
+        with use_span(span):
+            try:
+                yield span
+            except Exception as e:
+                span.record_error(e)
+                raise
+            finally:
+                span.end()
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            if span.parent_id is None:
+                spans = self._open.pop(span.trace_id, []) + [span]
+            elif span.trace_id in self._open:
+                self._open[span.trace_id].append(span)
+                return
+            else:
+                spans = [span]
+        self._export(spans)
+
+    def _export(self, spans: List[Span]) -> None:
+        document = {
+            'resourceSpans': [{
+                'resource': {'attributes': [_attribute('service.name', self.service_name)]},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in spans]}]
+            }]
+        }
+        self.recent.append(document)
+        if self.path is not None:
+            try:
+                line = json.dumps(document)
+                with self._lock:
+                    with open(self.path, 'a', encoding='utf-8') as file:
+                        file.write(line + '\n')
+            except OSError as e:
+                self.logger.warning(f"Could not write trace to {self.path}: {str(e)}")
+
+    def recent_traces(self) -> dict:
+        """Recently finished traces merged into one OTLP JSON document."""
+        documents = list(self.recent)
+        return {'resourceSpans': [resource for document in documents for resource in document['resourceSpans']]}
+
+
+TRACER = Tracer()
+
+
+@contextmanager
+def use_span(span: Any) -> Iterator[Any]:
+    """
+    Make a span the current one for a block.
+
+    The previous span is set back afterwards rather than reset with a
+    token, so the block may contain yields of a generator.
+    """
+    previous = _current_span.get()
+    _current_span.set(span if isinstance(span, Span) else previous)
+    try:
+        yield span
+    finally:
+        _current_span.set(previous)
+
+
+def in_current_context(fn: Callable, *args: Any) -> Callable[[], Any]:
+    """Bind fn to the current context (and span) for running on another thread."""
+    context = contextvars.copy_context()
+    return lambda: context.run(fn, *args)
@@ -0,0 +1,262 @@
+"""
+Request profiling for Zen AI.
+Runs sampled chat requests under cProfile and tracemalloc and keeps the
+.pstats files and top-allocation reports in a rotating directory.
+"""
+
+import json
+import time
+import random
+import pstats
+import logging
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Header values that ask for a profile
+_TRUTHY = {'1', 'true', 'yes', 'on'}
+
+
+class _Capture:
+    """Profiler state of one profiled request."""
+
+    def __init__(self, started_tracemalloc: bool):
+        self.profile = cProfile.Profile()
+        self.started_tracemalloc = started_tracemalloc
+        self.snapshot = tracemalloc.take_snapshot()
+        self.start = time.perf_counter()
+
+
+class RequestProfiler:
+    """
+    Samples chat requests and profiles their AI/tool loop.
+
+    cProfile records the thread that iterates the loop (all threads on
+    Python 3.12 and later; before that, tools on executor threads show up as
+    the wait for their results), and only while the loop itself runs, not
+    while the client is being written to. tracemalloc is process-wide, so
+    allocations of concurrent requests are included. At most one request is
+    profiled at a time.
+    """
+
+    def __init__(self, directory: str = 'data/profiles', enabled: bool = False, sample_rate: float = 0.0,
+                 header: Optional[str] = 'X-Zen-Profile', keep: int = 50, top_allocations: int = 25):
+        """
+        Initialize the profiler.
+
+        Args:
+            directory: Where profiles are written
+            enabled: Profile requests at all
+            sample_rate: Fraction of requests to profile
+            header: Request header that asks for a profile (None to ignore headers)
+            keep: Number of most recent profiles kept on disk
+            top_allocations: Number of allocation sites in each report
+        """
+        self.directory = Path(directory)
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.header = header
+        self.keep = keep
+        self.top_allocations = top_allocations
+        self._busy = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "RequestProfiler":
+        """Create a profiler from the `server.profiling` section of zen_config.yaml."""
+        config = config or {}
+        return cls(
+            directory=config.get('directory', 'data/profiles'),
+            enabled=config.get('enabled', False),
+            sample_rate=config.get('sample_rate', 0.0),
+            header=config.get('header', 'X-Zen-Profile') or None,
+            keep=config.get('keep', 50),
+            top_allocations=config.get('top_allocations', 25)
+        )
+
+    def should_profile(self, headers: Optional[dict] = None) -> bool:
+        """
+        Decide whether to profile a request.
+
+        Args:
+            headers: The request's headers
+
+        Returns:
+            True if the request asked for a profile or was sampled
+        """
+        if not self.enabled:
+            return False
+        if self.header and headers is not None:
+            if str(headers.get(self.header, '')).strip().lower() in _TRUTHY:
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def _start(self) -> Optional[_Capture]:
+        """Start capturing, or return None if another request is being profiled."""
+        if not self._busy.acquire(blocking=False):
+            self.logger.info("Skipping profile, another request is being profiled")
+            return None
+        started_tracemalloc = not tracemalloc.is_tracing()
+        if started_tracemalloc:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        return _Capture(started_tracemalloc)
+
+    def profile(self, events: Iterator[T], endpoint: str) -> Iterator[T]:
+        """
+        Profile the iteration of a chat loop.
+
+        Args:
+            events: Events of ChatLoop.run
+            endpoint: Name of the endpoint, recorded with the profile
+
+        Yields:
+            The same events
+        """
+        capture = self._start()
+        if capture is None:
+            yield from events
+            return
+        error = None
+        try:
+            while True:
+                capture.profile.enable()
+                try:
+                    event = next(events)
+                except StopIteration:
+                    break
+                finally:
+                    capture.profile.disable()
+                yield event
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            close = getattr(events, 'close', None)
+            if close is not None:
+                close()
+            self._finish(capture, endpoint, error)
+
+    async def profile_async(self, events: AsyncIterator[T], endpoint: str) -> AsyncIterator[T]:
+        """
+        Profile the iteration of an asynchronous chat loop.
+
+        Other tasks that run on the event loop while the chat loop awaits
+        also show up in the profile.
+
+        Args:
+            events: Events of ChatLoop.run_async
+            endpoint: Name of the endpoint, recorded with the profile
+
+        Yields:
+            The same events
+        """
+        capture = self._start()
+        if capture is None:
+            async for event in events:
+                yield event
+            return
+        error = None
+        try:
+            while True:
+                capture.profile.enable()
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    break
+                finally:
+                    capture.profile.disable()
+                yield event
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            aclose = getattr(events, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+            self._finish(capture, endpoint, error)
+
+    def _finish(self, capture: _Capture, endpoint: str, error: Optional[str]) -> None:
+        """Stop capturing and write the profile."""
+        try:
+            duration = time.perf_counter() - capture.start
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            if capture.started_tracemalloc:
+                tracemalloc.stop()
+            self._write(capture, snapshot, peak, endpoint, duration, error)
+        except OSError as e:
+            self.logger.warning(f"Could not write profile: {str(e)}")
+        finally:
+            self._busy.release()
+
+    def _write(self, capture: _Capture, snapshot: tracemalloc.Snapshot, peak: int,
+               endpoint: str, duration: float, error: Optional[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{endpoint}"
+        pstats_path = self.directory / f"{name}.pstats"
+        allocations_path = self.directory / f"{name}.allocations.txt"
+
+        capture.profile.dump_stats(str(pstats_path))
+
+        # Growth per line, leaving out tracemalloc's and the import system's own allocations
+        ignore = (tracemalloc.Filter(False, tracemalloc.__file__),
+                  tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                  tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'))
+        growth = snapshot.filter_traces(ignore).compare_to(capture.snapshot.filter_traces(ignore), 'lineno')
+        lines = [f"Peak traced memory: {peak / 1024:.1f} KiB",
+                 f"Top {self.top_allocations} allocation sites by growth during the request:"]
+        lines.extend(str(stat) for stat in growth[:self.top_allocations])
+        allocations_path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+        # Functions with the most own time, for the listing
+        stats = pstats.Stats(capture.profile).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:5]
+        record = {
+            'name': name,
+            'endpoint': endpoint,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'duration_ms': round(duration * 1000, 1),
+            'peak_memory_kib': round(peak / 1024, 1),
+            'error': error,
+            'hottest': [{'function': func if file == '~' else f"{func} ({Path(file).name}:{line})",
+                         'own_ms': round(own * 1000, 2)}
+                        for (file, line, func), (_, _, own, _, _) in hottest],
+            'files': [pstats_path.name, allocations_path.name]
+        }
+        with open(self.directory / f"{name}.json", 'w', encoding='utf-8') as file:
+            json.dump(record, file, indent=2)
+        self.logger.info(f"Wrote profile {name} ({record['duration_ms']} ms)")
+        self._rotate()
+
+    def _rotate(self) -> None:
+        """Delete all but the `keep` most recent profiles."""
+        records = sorted(self.directory.glob('*.json'), reverse=True)
+        for record in records[self.keep:]:
+            name = record.name[:-len('.json')]
+            for path in self.directory.glob(f"{name}.*"):
+                path.unlink(missing_ok=True)
+
+    def list_profiles(self, limit: int = 50) -> List[dict]:
+        """
+        List recent profiles.
+
+        Args:
+            limit: Maximum number of profiles
+
+        Returns:
+            Profile records, newest first
+        """
+        profiles = []
+        for path in sorted(self.directory.glob('*.json'), reverse=True)[:max(limit, 0)]:
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    profiles.append(json.load(file))
+            except (OSError, ValueError):
+                continue  # Rotated away or still being written
+        return profiles
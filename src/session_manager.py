@@ -0,0 +1,231 @@
+"""
+Chat session manager for Zen AI.
+Keeps one chat session per client so concurrent users don't share history.
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterator, List, Optional
+
+from .ai.gemini import Gemini
+from .session_store import SessionStore
+
+
+@dataclass
+class SessionEntry:
+    """Bookkeeping for a single live chat session."""
+    session_id: str
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    async_lock: Optional[asyncio.Lock] = None
+    active: int = 0  # Number of requests currently inside the session
+    loaded: bool = False  # Whether the chat session has been started (or rehydrated) in memory
+    created: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+
+
+class SessionManager:
+    """
+    Bounded LRU of live chat sessions keyed by session id.
+
+    The chat sessions themselves live in ``Gemini.chat_sessions`` under the
+    session id; this class decides which ones stay alive and serializes
+    access to each one so a history is never written by two requests at once.
+    With a store, a session is rehydrated from it when first used and saved
+    after every request, so evicting it only frees memory.
+    """
+
+    def __init__(self, ai: Gemini, max_sessions: int = 256, idle_timeout: float = 3600,
+                 store: Optional[SessionStore] = None):
+        """
+        Initialize the session manager.
+
+        Args:
+            ai: Gemini client whose chat sessions are managed
+            max_sessions: Maximum number of live sessions kept in memory
+            idle_timeout: Seconds of inactivity after which a session is evicted
+            store: Persistent store for chat histories (memory only if not specified)
+        """
+        self.ai = ai
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.store = store
+        self.sessions: "OrderedDict[str, SessionEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def new_session_id() -> str:
+        """Create a fresh, unguessable session id."""
+        return uuid.uuid4().hex
+
+    def _get_entry(self, session_id: str) -> SessionEntry:
+        """Return the entry for a session, creating it if needed (caller holds _lock)."""
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            # The chat itself is started by _load once the session lock is held
+            entry = SessionEntry(session_id=session_id)
+            self.sessions[session_id] = entry
+        else:
+            self.sessions.move_to_end(session_id)
+        entry.last_used = time.time()
+        return entry
+
+    def _evict(self) -> None:
+        """Evict idle sessions and trim the LRU to max_sessions (caller holds _lock)."""
+        now = time.time()
+        for session_id, entry in list(self.sessions.items()):
+            over_capacity = len(self.sessions) > self.max_sessions
+            idle = now - entry.last_used > self.idle_timeout
+            if not (over_capacity or idle):
+                # Entries are in LRU order, so everything after this is newer
+                break
+            # Never evict a session that a request is currently using
+            if entry.active:
+                continue
+            del self.sessions[session_id]
+            self.ai.clear_chat(session_id)
+            if self.store is not None:
+                self.store.forget(session_id)
+            self.logger.info(f"Evicted chat session {session_id}")
+
+    def _enter(self, session_id: str) -> SessionEntry:
+        """Pin a session so it cannot be evicted while a request uses it."""
+        with self._lock:
+            entry = self._get_entry(session_id)
+            entry.active += 1
+            self._evict()
+            return entry
+
+    def _leave(self, entry: SessionEntry) -> None:
+        """Unpin a session once the request using it is done."""
+        with self._lock:
+            entry.active -= 1
+            entry.last_used = time.time()
+
+    def _load(self, entry: SessionEntry) -> None:
+        """Start the chat in memory, from the store if it has it (caller holds the session lock)."""
+        if self.store is None:
+            if not entry.loaded:
+                self.ai.start_chat(entry.session_id)
+                entry.loaded = True
+                self.logger.info(f"Started chat session {entry.session_id}")
+            return
+        # Also reload if another process has written the session since
+        if entry.loaded and self.store.is_current(entry.session_id):
+            return
+        try:
+            history = self.store.load(entry.session_id)
+        except Exception as e:
+            self.logger.error(f"Could not load session {entry.session_id}: {str(e)}")
+            history = []
+        self.ai.clear_chat(entry.session_id)
+        self.ai.start_chat(entry.session_id, history=history)
+        entry.loaded = True
+        self.logger.info(f"Started chat session {entry.session_id} ({len(history)} stored messages)")
+
+    def _save(self, entry: SessionEntry) -> None:
+        """Write new history to the store (caller holds the session lock)."""
+        if self.store is None or not entry.loaded:
+            return
+        try:
+            self.store.save(entry.session_id, self.ai.get_chat_history(entry.session_id))
+        except Exception as e:
+            self.logger.error(f"Could not save session {entry.session_id}: {str(e)}")
+
+    @contextmanager
+    def session(self, session_id: str) -> Iterator[str]:
+        """
+        Hold a chat session exclusively for the duration of the block.
+
+        Args:
+            session_id: Id of the session to use (created if unknown)
+
+        Yields:
+            The chat name to pass to ``Gemini.chat``
+        """
+        entry = self._enter(session_id)
+        try:
+            with entry.lock:
+                self._load(entry)
+                try:
+                    yield session_id
+                finally:
+                    self._save(entry)
+        finally:
+            self._leave(entry)
+
+    @asynccontextmanager
+    async def session_async(self, session_id: str) -> AsyncIterator[str]:
+        """
+        Hold a chat session exclusively from a coroutine.
+
+        Uses an ``asyncio.Lock`` so waiting for a busy session never blocks
+        the event loop, and loads and saves the history on the default
+        executor so store I/O doesn't either.
+
+        Args:
+            session_id: Id of the session to use (created if unknown)
+
+        Yields:
+            The chat name to pass to ``Gemini.chat_async``
+        """
+        loop = asyncio.get_running_loop()
+        entry = self._enter(session_id)
+        if entry.async_lock is None:
+            entry.async_lock = asyncio.Lock()
+        try:
+            async with entry.async_lock:
+                await loop.run_in_executor(None, self._load, entry)
+                try:
+                    yield session_id
+                finally:
+                    await loop.run_in_executor(None, self._save, entry)
+        finally:
+            self._leave(entry)
+
+    def reset(self, session_id: str) -> None:
+        """
+        Clear the history of a session and start it over.
+
+        Args:
+            session_id: Id of the session to reset
+        """
+        with self.session(session_id):
+            self._clear(session_id)
+
+    async def reset_async(self, session_id: str) -> None:
+        """Clear the history of a session from a coroutine."""
+        async with self.session_async(session_id):
+            await asyncio.get_running_loop().run_in_executor(None, self._clear, session_id)
+
+    def _clear(self, session_id: str) -> None:
+        """Start a session over, in memory and in the store."""
+        self.ai.clear_chat(session_id)
+        self.ai.start_chat(session_id)
+        if self.store is not None:
+            self.store.delete(session_id)
+
+    def remove(self, session_id: str) -> None:
+        """Drop a session entirely, including its stored history."""
+        with self._lock:
+            entry = self.sessions.pop(session_id, None)
+            if entry is not None:
+                self.ai.clear_chat(session_id)
+        if self.store is not None:
+            self.store.delete(session_id)
+
+    def list_sessions(self) -> List[str]:
+        """List ids of all live sessions, least recently used first."""
+        with self._lock:
+            return list(self.sessions.keys())
+
+    def get_entry(self, session_id: str) -> Optional[SessionEntry]:
+        """Get the bookkeeping entry for a live session, if any."""
+        with self._lock:
+            return self.sessions.get(session_id)
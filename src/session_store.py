@@ -0,0 +1,188 @@
+"""
+Persistent chat session store for Zen AI.
+Keeps chat histories in SQLite (WAL mode) so conversations survive restarts
+and can be shared by several server processes.
+"""
+
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .ai.backends import history_entries
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _fingerprint(entries: Sequence[Tuple[str, str]]) -> str:
+    """Hash of a list of (role, text) entries."""
+    digest = hashlib.sha1()
+    for role, text in entries:
+        digest.update(role.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\1')
+    return digest.hexdigest()
+
+
+class SessionStore:
+    """
+    SQLite-backed chat histories.
+
+    save() only appends the entries added since the last save, unless the
+    history was rewritten in memory (e.g. compacted), in which case the
+    stored copy is replaced. Every write bumps the session's version so a
+    process can tell when another one changed a session it holds in memory.
+    """
+
+    def __init__(self, path: str = "data/sessions.db"):
+        """
+        Initialize the session store.
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+        self._local = threading.local()
+        # Session id -> (entries stored, fingerprint of them, version) as written by this process
+        self._synced: Dict[str, Tuple[int, str, int]] = {}
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Per-thread connection (sqlite3 connections must not be shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def version(self, session_id: str) -> Optional[int]:
+        """Current stored version of a session, or None if it is not stored."""
+        row = self._connect().execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def is_current(self, session_id: str) -> bool:
+        """Check whether this process's last save or load of a session is still the stored one."""
+        with self._lock:
+            synced = self._synced.get(session_id)
+        return self.version(session_id) == (synced[2] if synced else None)
+
+    def load(self, session_id: str) -> List[Dict[str, Any]]:
+        """
+        Load a session's history.
+
+        Args:
+            session_id: Id of the session
+
+        Returns:
+            History as dicts usable with ``start_chat(history=...)`` (empty if unknown)
+        """
+        conn = self._connect()
+        with conn:
+            # One read transaction, so the version matches the turns read
+            conn.execute("BEGIN")
+            row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+            rows = conn.execute(
+                "SELECT role, text FROM turns WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        with self._lock:
+            if row is None:
+                self._synced.pop(session_id, None)
+            else:
+                self._synced[session_id] = (len(rows), _fingerprint(rows), row[0])
+        return [{'role': role, 'parts': [text]} for role, text in rows]
+
+    def save(self, session_id: str, history: Sequence[Any]) -> None:
+        """
+        Persist a session's history.
+
+        Args:
+            session_id: Id of the session
+            history: The session's current history (SDK Content objects or dicts)
+        """
+        entries = history_entries(history)
+        with self._lock:
+            synced = self._synced.get(session_id)
+        count, fingerprint, version = synced or (0, _fingerprint([]), None)
+        if len(entries) == count and _fingerprint(entries) == fingerprint:
+            # Nothing new (or an empty session that was never stored)
+            return
+
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            appended = (len(entries) >= count and _fingerprint(entries[:count]) == fingerprint)
+            cursor = conn.execute(
+                "UPDATE sessions SET version = version + 1, updated = ? WHERE session_id = ? AND version = ?",
+                (now, session_id, version)
+            )
+            if cursor.rowcount == 0:
+                # New session, or another process wrote it since we last did: store it whole
+                if version is not None:
+                    self.logger.warning(f"Session {session_id} was changed by another process; overwriting")
+                conn.execute(
+                    "INSERT INTO sessions (session_id, version, created, updated) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET version = version + 1, updated = excluded.updated",
+                    (session_id, now, now)
+                )
+                appended = False
+            if appended:
+                new_entries = entries[count:]
+                start = count
+            else:
+                conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+                new_entries = entries
+                start = 0
+            conn.executemany(
+                "INSERT INTO turns (session_id, seq, role, text, created) VALUES (?, ?, ?, ?, ?)",
+                [(session_id, start + i, role, text, now) for i, (role, text) in enumerate(new_entries)]
+            )
+            new_version = conn.execute(
+                "SELECT version FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()[0]
+        with self._lock:
+            self._synced[session_id] = (len(entries), _fingerprint(entries), new_version)
+
+    def delete(self, session_id: str) -> None:
+        """Delete a session and its history."""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.forget(session_id)
+
+    def forget(self, session_id: str) -> None:
+        """Drop this process's bookkeeping for a session (it stays stored)."""
+        with self._lock:
+            self._synced.pop(session_id, None)
+
+    def list_sessions(self) -> List[str]:
+        """List ids of all stored sessions, most recently updated first."""
+        rows = self._connect().execute("SELECT session_id FROM sessions ORDER BY updated DESC").fetchall()
+        return [row[0] for row in rows]
@@ -0,0 +1,324 @@
+"""
+Sub-AI orchestration for Zen AI.
+Runs tasks the main AI delegates (main.subai) on sub-AI chat sessions, each
+with its own AI/tool loop, concurrently and within per-task and total time
+limits, and collects their reports.
+"""
+
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional, Set
+
+from .ai.gemini import Gemini
+from .chat_loop import ChatLoop
+from .instruction_cache import InstructionCache
+from .tool_parser import ToolSystem
+
+# First message of every sub-AI session
+TASK_PROMPT = ("SYSTEM: You are a sub-AI started by the main AI for this task: {task}\n"
+               "Work on it with your tools. Report your result with main.speak, then finish with main.stop.")
+
+# The tool that starts sub-AIs; sub-AIs may not use it themselves
+SPAWN_TOOL = 'main.subai'
+
+_orchestrator: Optional["SubAIOrchestrator"] = None
+
+
+def set_orchestrator(orchestrator: Optional["SubAIOrchestrator"]) -> None:
+    """Make an orchestrator available to the main.subai tool."""
+    global _orchestrator
+    _orchestrator = orchestrator
+
+
+def get_orchestrator() -> Optional["SubAIOrchestrator"]:
+    """The orchestrator of this process, if the server set one up."""
+    return _orchestrator
+
+
+@dataclass
+class SubTask:
+    """One task of a job and what its sub-AI reported."""
+    index: int
+    task: str
+    status: str = 'pending'  # pending, running, done, timeout, error
+    report: str = ''
+    tools: List[str] = field(default_factory=list)
+    turns: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        result = {
+            'task': self.task,
+            'status': self.status,
+            'report': self.report,
+            'tools': self.tools,
+            'turns': self.turns,
+            'seconds': round(self.seconds, 2)
+        }
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+@dataclass
+class SubAIJob:
+    """Tasks started by one main.subai call."""
+    id: str
+    tasks: List[SubTask]
+    task_timeout: float
+    deadline: float  # time.monotonic() by which all tasks are stopped
+    future: Optional[Future] = None
+
+    @property
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def to_dict(self) -> dict:
+        return {
+            'job': self.id,
+            'done': self.done,
+            'reports': [task.to_dict() for task in self.tasks]
+        }
+
+
+class SubAIOrchestrator:
+    """
+    Starts sub-AIs and waits for their reports.
+
+    The sub-AI loops run as coroutines (Gemini.chat_async) on an event loop
+    of their own, or on the async server's loop (see use_loop), so the main
+    AI's tool call just blocks on the result. At
+    most max_concurrent sub-AIs work at once across all jobs. Sub-AI tools
+    run on a separate ToolSystem pool, so waiting main.subai calls cannot
+    starve them.
+    """
+
+    def __init__(self, sub_ai: Gemini, tool_system: ToolSystem, instructions: InstructionCache,
+                 allowed_tools: Optional[Iterable[str]] = None, max_concurrent: int = 4, max_tasks: int = 8,
+                 task_timeout: float = 120.0, total_budget: float = 300.0, max_jobs: int = 32):
+        """
+        Initialize the orchestrator.
+
+        Args:
+            sub_ai: Gemini client for the sub-AI sessions
+            tool_system: Tool system of the main AI (its loader and worker pool are shared)
+            instructions: Cache of sub-AI instructions and models per allowed tool set
+            allowed_tools: Tools sub-AIs may use (all but main.subai if not specified)
+            max_concurrent: Sub-AIs working at once
+            max_tasks: Tasks one job may have
+            task_timeout: Longest time one sub-AI may work, in seconds
+            total_budget: Longest time a job may take in total, in seconds
+            max_jobs: Finished jobs kept until their reports are collected
+        """
+        self.sub_ai = sub_ai
+        self.tool_system = ToolSystem(loader=tool_system.loader, max_workers=tool_system.max_workers,
+                                      worker_pool=tool_system.worker_pool)
+        self.chat_loop = ChatLoop(sub_ai, self.tool_system, instructions)
+        self._allowed_tools = set(allowed_tools) if allowed_tools else None
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_tasks = max_tasks
+        self.task_timeout = task_timeout
+        self.total_budget = total_budget
+        self.max_jobs = max_jobs
+        self.jobs: "OrderedDict[str, SubAIJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.logger = logging.getLogger(__name__)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict], sub_ai: Gemini, tool_system: ToolSystem,
+                    instructions: InstructionCache) -> Optional["SubAIOrchestrator"]:
+        """
+        Build an orchestrator from the `ai.sub_ai` section of zen_config.yaml.
+
+        Returns:
+            The orchestrator, or None if sub-AIs are disabled
+        """
+        config = config or {}
+        if not config.get('enabled', True):
+            return None
+        return cls(
+            sub_ai,
+            tool_system,
+            instructions,
+            allowed_tools=config.get('tools') or None,
+            max_concurrent=config.get('max_concurrent', 4),
+            max_tasks=config.get('max_tasks', 8),
+            task_timeout=config.get('task_timeout', 120),
+            total_budget=config.get('total_budget', 300),
+            max_jobs=config.get('max_jobs', 32)
+        )
+
+    @property
+    def allowed_tools(self) -> Set[str]:
+        """Tools sub-AIs may use; re-read so hot-reloaded tools are included."""
+        tools = self._allowed_tools or set(self.tool_system.list_available_tools().keys())
+        return set(tools) - {SPAWN_TOOL}
+
+    def use_loop(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """
+        Run sub-AIs on an event loop that is already running instead of a thread of their own.
+
+        Call it on that loop (e.g. when the async server starts) before any
+        job is spawned. Jobs are still spawned and waited for from tool
+        threads, never from the loop itself.
+
+        Args:
+            loop: The running loop, or None to go back to a loop thread of
+                their own on the next spawn (e.g. when the server stops)
+
+        Raises:
+            RuntimeError: If sub-AIs already run on another loop
+        """
+        with self._lock:
+            if loop is not None and self._loop is not None and self._loop is not loop:
+                raise RuntimeError("Sub-AIs already run on another event loop")
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrent) if loop is not None else None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the event loop thread on first use (unless use_loop gave one)."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='zen-subai', daemon=True).start()
+                self._semaphore = asyncio.run_coroutine_threadsafe(self._new_semaphore(), loop).result()
+                self._loop = loop
+            return self._loop
+
+    async def _new_semaphore(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.max_concurrent)
+
+    def spawn(self, tasks: List[str], timeout: Optional[float] = None) -> SubAIJob:
+        """
+        Start a sub-AI for each task.
+
+        Args:
+            tasks: Task descriptions
+            timeout: Seconds each sub-AI may work (at most task_timeout)
+
+        Returns:
+            The started job
+
+        Raises:
+            ValueError: If there are no tasks or too many
+        """
+        tasks = [str(task).strip() for task in tasks if task is not None and str(task).strip()]
+        if not tasks:
+            raise ValueError("No task given")
+        if len(tasks) > self.max_tasks:
+            raise ValueError(f"At most {self.max_tasks} tasks per call, got {len(tasks)}")
+        task_timeout = min(timeout, self.task_timeout) if timeout and timeout > 0 else self.task_timeout
+        job = SubAIJob(
+            id=uuid.uuid4().hex[:12],
+            tasks=[SubTask(index, task) for index, task in enumerate(tasks)],
+            task_timeout=task_timeout,
+            deadline=time.monotonic() + self.total_budget
+        )
+        loop = self._ensure_loop()
+        with self._lock:
+            self.jobs[job.id] = job
+            # Forget the oldest finished jobs whose reports were never collected
+            finished = [old_id for old_id, old in self.jobs.items() if old.done]
+            for old_id in finished[:max(0, len(self.jobs) - self.max_jobs)]:
+                del self.jobs[old_id]
+        # Scheduled from this thread, so the job's spans nest under the calling tool's span
+        job.future = asyncio.run_coroutine_threadsafe(self._run_job(job), loop)
+        self.logger.info(f"Started sub-AI job {job.id} with {len(tasks)} tasks")
+        return job
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> dict:
+        """
+        Wait for a job's reports.
+
+        Args:
+            job_id: Id returned by spawn
+            timeout: Seconds to wait at most (until the job's budget runs out if not specified)
+
+        Returns:
+            The job's reports; 'done' is False if it is still running
+
+        Raises:
+            KeyError: If the job is unknown (or its reports were already collected)
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            raise KeyError(f"Unknown sub-AI job: {job_id}")
+        limit = max(0.0, job.deadline - time.monotonic()) + 1.0
+        try:
+            job.future.result(timeout=min(timeout, limit) if timeout is not None else limit)
+        except FutureTimeout:
+            pass
+        result = job.to_dict()
+        if job.done:
+            with self._lock:
+                self.jobs.pop(job_id, None)
+        return result
+
+    def run(self, tasks: List[str], timeout: Optional[float] = None) -> dict:
+        """Start sub-AIs for the tasks and wait for their reports."""
+        job = self.spawn(tasks, timeout)
+        return self.wait(job.id)
+
+    async def _run_job(self, job: SubAIJob) -> None:
+        """Run all tasks of a job; stop those still working when the budget runs out."""
+        runs = [asyncio.ensure_future(self._run_task(job, task)) for task in job.tasks]
+        _, pending = await asyncio.wait(runs, timeout=max(0.0, job.deadline - time.monotonic()))
+        for run in pending:
+            run.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            self.logger.warning(f"Sub-AI job {job.id} ran out of its {self.total_budget}s budget")
+
+    async def _run_task(self, job: SubAIJob, task: SubTask) -> None:
+        """Run one sub-AI until it stops, times out or fails."""
+        start = time.monotonic()
+        try:
+            async with self._semaphore:
+                task.status = 'running'
+                start = time.monotonic()
+                timeout = min(job.task_timeout, max(0.0, job.deadline - start))
+                await asyncio.wait_for(self._work(job, task), timeout)
+            task.status = 'done'
+        except asyncio.TimeoutError:
+            task.status = 'timeout'
+            task.error = f"Stopped after {time.monotonic() - start:.0f}s"
+        except asyncio.CancelledError:
+            task.status = 'timeout'
+            task.error = f"Stopped when the {self.total_budget:.0f}s budget of all tasks ran out"
+        except Exception as e:
+            task.status = 'error'
+            task.error = str(e)
+            self.logger.error(f"Sub-AI task failed: {str(e)}")
+        finally:
+            task.seconds = time.monotonic() - start
+
+    async def _work(self, job: SubAIJob, task: SubTask) -> None:
+        """The sub-AI's AI/tool loop; fills in the task's report as it goes."""
+        chat_name = f"subai-{job.id}-{task.index}"
+        spoken = []
+        last_response = ''
+        try:
+            events = self.chat_loop.run_async(TASK_PROMPT.format(task=task.task), chat_name,
+                                              self.allowed_tools, endpoint='subai')
+            async for event, payload in events:
+                if event == 'ai_response':
+                    task.turns += 1
+                    last_response = payload['text']
+                elif event == 'tool_result':
+                    task.tools.append(payload['name'])
+                    if payload['name'] == 'main.speak' and payload['success']:
+                        spoken.append(str(payload['result']))
+                # Partial report in case the task is stopped
+                task.report = '\n'.join(spoken) or self.tool_system.parser.extract_non_tool_text(last_response)
+        finally:
+            self.sub_ai.clear_chat(chat_name)
@@ -0,0 +1,204 @@
+"""
+Tool argument parsing for Zen AI.
+Turns a command's `key="value"` args into a typed dict using the `parameters`
+schema from the tool's config.yaml, so tools never parse strings themselves.
+"""
+
+import re
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# A quote that ends a value even after a backslash: the next key= or the end
+# follows (the same rule as the tool parser, so "C:\Users\" is a whole value)
+_CLOSES = r'\s*(?:\}|[A-Za-z_][\w.-]*\s*=|\Z)'
+# One key=value pair: a triple-quoted, double-quoted or single-quoted value, or a
+# bare value that runs until the next key= (so text=Hello World still works)
+_PAIR = re.compile(
+    r'\s*([A-Za-z_][\w.-]*)\s*=\s*'
+    r'(?:"""([\s\S]*?)"""'
+    r'|"((?:[^"\\]|\\"(?!' + _CLOSES + r')|\\(?!"(?!' + _CLOSES + r')))*)"'
+    r"|'((?:[^'\\]|\\'(?!" + _CLOSES + r")|\\(?!'(?!" + _CLOSES + r")))*)'"
+    r'|([\s\S]*?)(?=\s+[A-Za-z_][\w.-]*\s*=|\s*\Z))'
+)
+
+_TRUE = {'true', 'yes', 'on', '1'}
+_FALSE = {'false', 'no', 'off', '0'}
+
+
+class ArgumentError(ValueError):
+    """Raised when a command's args are malformed or don't match the tool's schema."""
+
+
+def parse_args(args: str) -> Dict[str, str]:
+    """
+    Split an args string into raw string values.
+
+    Args:
+        args: The args of a tool command, e.g. `path="a.txt" lines="3-6"`
+
+    Returns:
+        Dictionary of key to unquoted value
+
+    Raises:
+        ArgumentError: If the args are not a sequence of key=value pairs
+    """
+    result = {}
+    pos = 0
+    while True:
+        while pos < len(args) and args[pos].isspace():
+            pos += 1
+        if pos == len(args):
+            return result
+        match = _PAIR.match(args, pos)
+        if match is None:
+            raise ArgumentError(f"expected key=value at '{args[pos:pos + 30]}'")
+        key, triple, double, single, bare = match.groups()
+        if triple is not None:
+            value = triple
+        elif double is not None:
+            # Only escaped quotes are unescaped; other backslashes stay as written
+            value = double.replace('\\"', '"')
+        elif single is not None:
+            value = single.replace("\\'", "'")
+        else:
+            value = bare.strip()
+            if value[:1] in ('"', "'"):
+                raise ArgumentError(f"unterminated quote in value of '{key}'")
+        if key in result:
+            raise ArgumentError(f"'{key}' given more than once")
+        result[key] = value
+        pos = match.end()
+
+
+def _to_bool(value: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in _TRUE:
+        return True
+    if lowered in _FALSE:
+        return False
+    raise ValueError(f"expected true or false, got '{value}'")
+
+
+def _to_json(expected: type) -> Callable[[str], Any]:
+    """Converter for JSON values of the given type (e.g. ops='[{"op": "write"}]')."""
+    def convert(value: str) -> Any:
+        parsed = json.loads(value)
+        if not isinstance(parsed, expected):
+            raise ValueError(f"expected a JSON {expected.__name__}")
+        return parsed
+    return convert
+
+
+# Schema type name -> converter from the raw string
+_CONVERTERS: Dict[str, Callable[[str], Any]] = {
+    'string': str,
+    'str': str,
+    'integer': int,
+    'int': int,
+    'number': float,
+    'float': float,
+    'boolean': _to_bool,
+    'bool': _to_bool,
+    'array': _to_json(list),
+    'object': _to_json(dict),
+}
+
+
+@dataclass
+class Parameter:
+    """A single compiled parameter of a tool's schema."""
+    name: str
+    type: str
+    convert: Callable[[str], Any]
+    required: bool = False
+    default: Any = None
+    choices: Optional[List[Any]] = None
+
+
+class ArgumentSchema:
+    """
+    Validator compiled from the `parameters` list of a tool's config.yaml.
+
+    Each parameter may set `type` (string, integer, number, boolean, or
+    array/object for JSON values),
+    `required`, `default` and `enum`. A tool that declares no parameters
+    gets its args parsed but not validated.
+    """
+
+    def __init__(self, parameters: Optional[List[Dict[str, Any]]] = None, tool_name: str = ''):
+        """
+        Compile a schema.
+
+        Args:
+            parameters: The `parameters` list from config.yaml
+            tool_name: Tool name used in log messages
+        """
+        self.logger = logging.getLogger(__name__)
+        self.parameters: Dict[str, Parameter] = {}
+        for spec in parameters or []:
+            if not isinstance(spec, dict) or not spec.get('name'):
+                self.logger.warning(f"Tool {tool_name} has a parameter without a name; ignoring it")
+                continue
+            type_name = str(spec.get('type', 'string')).lower()
+            convert = _CONVERTERS.get(type_name)
+            if convert is None:
+                self.logger.warning(f"Tool {tool_name} parameter '{spec['name']}' has unknown type "
+                                    f"'{type_name}'; treating it as string")
+                convert = str
+            self.parameters[spec['name']] = Parameter(
+                name=spec['name'],
+                type=type_name,
+                convert=convert,
+                required=bool(spec.get('required', False)),
+                default=spec.get('default'),
+                choices=spec.get('enum')
+            )
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], tool_name: str = '') -> "ArgumentSchema":
+        """Compile the schema of a tool config."""
+        return cls(config.get('parameters'), tool_name)
+
+    def parse(self, args: str) -> Dict[str, Any]:
+        """
+        Parse and validate a command's args.
+
+        Args:
+            args: The args string of a tool command
+
+        Returns:
+            Dictionary of parameter name to converted value, with defaults filled in
+
+        Raises:
+            ArgumentError: If the args are malformed, unknown, missing or of the wrong type
+        """
+        raw = parse_args(args)
+        if not self.parameters:
+            return raw
+
+        unknown = [key for key in raw if key not in self.parameters]
+        if unknown:
+            raise ArgumentError(f"unknown parameter(s) {', '.join(unknown)}; "
+                                f"expected {', '.join(self.parameters)}")
+
+        values = {}
+        for name, param in self.parameters.items():
+            if name not in raw:
+                if param.required:
+                    raise ArgumentError(f"missing required parameter '{name}'")
+                if param.default is not None:
+                    values[name] = param.default
+                continue
+            try:
+                value = param.convert(raw[name])
+            except ValueError as e:
+                shown = raw[name] if len(raw[name]) <= 100 else raw[name][:100] + '...'
+                # Point at the mistake in JSON values, which can be long
+                detail = f" ({e})" if param.type in ('array', 'object') else ''
+                raise ArgumentError(f"'{name}' must be {param.type}, got '{shown}'{detail}") from None
+            if param.choices is not None and value not in param.choices:
+                raise ArgumentError(f"'{name}' must be one of {', '.join(map(str, param.choices))}")
+            values[name] = value
+        return values
@@ -5,22 +5,30 @@ Automatically discovers available tools and generates instructions for the AI.
 
 import yaml
 import logging
-from typing import Dict, List
+from typing import Dict, List, Iterable, Optional
 from pathlib import Path
-from .tool_loader import ToolLoader
+from .tool_loader import ToolLoader, get_tool_loader
 
 
 class ToolInfoGenerator:
     """Generates dynamic tool information for AI instructions."""
     
-    def __init__(self, tools_dir: str = "tools"):
+    def __init__(self, tools_dir: str = "tools", loader: Optional[ToolLoader] = None):
         self.tools_dir = Path(tools_dir)
-        self.loader = ToolLoader(tools_dir)
+        self.loader = loader or get_tool_loader(tools_dir)
         self.logger = logging.getLogger(__name__)
     
-    def generate_tool_list(self) -> str:
+    @property
+    def version(self) -> int:
+        """Version of the underlying tool registry; changes whenever tools are reloaded."""
+        return self.loader.version
+    
+    def generate_tool_list(self, allowed_tools: Optional[Iterable[str]] = None) -> str:
         """Generate a formatted list of available tools for AI instructions."""
         tools = self.loader.list_tools()
+        if allowed_tools is not None:
+            allowed = set(allowed_tools)
+            tools = {name: info for name, info in tools.items() if name in allowed}
         
         if not tools:
             return "No tools currently available."
@@ -44,9 +52,9 @@ class ToolInfoGenerator:
         
         return "\n".join(tool_list)
     
-    def generate_tool_instructions(self) -> str:
+    def generate_tool_instructions(self, allowed_tools: Optional[Iterable[str]] = None) -> str:
         """Generate complete tool instructions for AI."""
-        tool_list = self.generate_tool_list()
+        tool_list = self.generate_tool_list(allowed_tools)
         
         instructions = f"""## Tool System
 You can use tools by entering commands with this syntax: `{{tool {{name}} {{args}}}}`
@@ -61,12 +69,17 @@ You can use tools by entering commands with this syntax: `{{tool {{name}} {{args
 - Each tool call should be properly formatted
 - You can only use one tool per response unless specifically instructed otherwise"""
         
+        if allowed_tools is not None:
+            tool_names_str = ', '.join(sorted(allowed_tools))
+            instructions += f"\n- You may only use these tools: {tool_names_str}. Do not mention or use any other tools."
+        
         return instructions
     
-    def update_ai_instructions(self, base_instructions: str) -> str:
-        """Update AI instructions with current tool information."""
+    def update_ai_instructions(self, base_instructions: str,
+                               allowed_tools: Optional[Iterable[str]] = None) -> str:
+        """Update AI instructions with current tool information, optionally restricted to allowed tools."""
         # Generate current tool instructions
-        tool_instructions = self.generate_tool_instructions()
+        tool_instructions = self.generate_tool_instructions(allowed_tools)
         
         # Replace the tool system section in base instructions
         lines = base_instructions.split('\n')
@@ -4,36 +4,174 @@ Handles loading and managing tools from the /tools directory.
 """
 
 import os
+import json
 import yaml
+import hashlib
 import importlib.util
 import logging
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, List, Optional, Callable
 from pathlib import Path
 
+from .tool_args import ArgumentSchema
+
+# Process-wide registry: one loader per tools directory
+_registry: Dict[Path, "ToolLoader"] = {}
+_registry_lock = threading.Lock()
+
+
+def get_tool_loader(tools_dir: str = "tools") -> "ToolLoader":
+    """
+    Get the shared ToolLoader for a tools directory, creating it on first use.
+    
+    Args:
+        tools_dir: Path to the tools directory
+        
+    Returns:
+        The process-wide ToolLoader for that directory
+    """
+    key = Path(tools_dir).resolve()
+    with _registry_lock:
+        loader = _registry.get(key)
+        if loader is None:
+            loader = ToolLoader(tools_dir)
+            _registry[key] = loader
+        return loader
+
 
 class ToolLoader:
-    """Loads and manages tools from the tools directory."""
+    """
+    Loads and manages tools from the tools directory.
+    
+    Only each tool's config.yaml is read up front; its main.py is imported
+    the first time the tool is executed.
+    """
+    
+    MANIFEST_NAME = ".tool_manifest.json"
     
     def __init__(self, tools_dir: str = "tools"):
         self.tools_dir = Path(tools_dir)
+        self.manifest_file = self.tools_dir / self.MANIFEST_NAME
         self.tools = {}
+        self.version = 0  # Bumped on every (re)load so caches can invalidate
         self.logger = logging.getLogger(__name__)
+        self._import_lock = threading.Lock()
+        self._reload_lock = threading.RLock()
+        self._fingerprints = {}  # Folder name -> stat fingerprint, incl. invalid folders
+        self._manifest = {}  # Folder name -> fingerprint, config hash and parsed config
         self.load_tools()
     
     def load_tools(self):
         """Load all tools from the tools directory."""
-        if not self.tools_dir.exists():
-            self.logger.warning(f"Tools directory {self.tools_dir} does not exist")
-            return
+        with self._reload_lock:
+            self.version += 1
+            if not self.tools_dir.exists():
+                self.logger.warning(f"Tools directory {self.tools_dir} does not exist")
+                return
+            
+            self._manifest = self._read_manifest()
+            self.tools = {}
+            self._fingerprints = {}
+            for tool_folder in self.tools_dir.iterdir():
+                if tool_folder.is_dir():
+                    self._load_tool(tool_folder)
+            self._write_manifest()
+    
+    def refresh(self) -> List[str]:
+        """
+        Reload only the tool folders that were added, changed or removed.
+        
+        Returns:
+            Names of the tools that changed (empty if nothing did)
+        """
+        with self._reload_lock:
+            if not self.tools_dir.exists():
+                return []
+            
+            folders = {f.name: f for f in self.tools_dir.iterdir() if f.is_dir()}
+            changed = []
+            for name in set(self._fingerprints) - set(folders):
+                self._fingerprints.pop(name, None)
+                self._manifest.pop(name, None)
+                if self.tools.pop(name, None) is not None:
+                    self.logger.info(f"Removed tool: {name}")
+                changed.append(name)
+            for name, folder in folders.items():
+                if self._fingerprints.get(name) != self._fingerprint(folder):
+                    # A changed main.py alone keeps the parsed config from the manifest
+                    self.tools.pop(name, None)
+                    self._load_tool(folder)
+                    changed.append(name)
+            
+            if changed:
+                self.version += 1
+                self._write_manifest()
+                self.logger.info(f"Reloaded tools {', '.join(sorted(changed))} (registry v{self.version})")
+            return changed
+    
+    @staticmethod
+    def _fingerprint(tool_folder: Path) -> Dict[str, Optional[int]]:
+        """Stat-based fingerprint of a tool folder's config.yaml and main.py."""
+        fingerprint = {}
+        for key, filename in (('config', 'config.yaml'), ('main', 'main.py')):
+            try:
+                st = (tool_folder / filename).stat()
+                fingerprint[f'{key}_mtime'] = st.st_mtime_ns
+                fingerprint[f'{key}_size'] = st.st_size
+            except OSError:
+                fingerprint[f'{key}_mtime'] = None
+                fingerprint[f'{key}_size'] = None
+        return fingerprint
+    
+    def _read_manifest(self) -> Dict[str, Any]:
+        """Read the cached manifest, or return an empty one if missing or corrupt."""
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            return manifest if isinstance(manifest, dict) else {}
+        except (OSError, ValueError):
+            return {}
+    
+    def _write_manifest(self):
+        """Persist the manifest atomically so a crash never leaves a torn file."""
+        # Per-process temp file: tool worker processes may write the manifest too
+        tmp_file = self.manifest_file.with_name(f"{self.MANIFEST_NAME}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self._manifest, f, default=str)
+            os.replace(tmp_file, self.manifest_file)
+        except OSError as e:
+            self.logger.warning(f"Could not write tool manifest: {str(e)}")
+    
+    def _read_config(self, tool_folder: Path, fingerprint: Dict[str, Optional[int]]) -> Dict[str, Any]:
+        """Read a tool's config, reusing the manifest copy when the file is unchanged."""
+        cached = self._manifest.get(tool_folder.name)
+        if (cached and cached.get('config_mtime') == fingerprint['config_mtime']
+                and cached.get('config_size') == fingerprint['config_size']):
+            return cached['config']
         
-        for tool_folder in self.tools_dir.iterdir():
-            if tool_folder.is_dir():
-                self._load_tool(tool_folder)
+        data = (tool_folder / "config.yaml").read_bytes()
+        config_hash = hashlib.sha256(data).hexdigest()
+        if cached and cached.get('config_hash') == config_hash:
+            # Touched but not edited
+            config = cached['config']
+        else:
+            config = yaml.safe_load(data) or {}
+        
+        self._manifest[tool_folder.name] = {
+            'config_mtime': fingerprint['config_mtime'],
+            'config_size': fingerprint['config_size'],
+            'config_hash': config_hash,
+            'config': config
+        }
+        return config
     
     def _load_tool(self, tool_folder: Path):
         """Load a single tool from its folder."""
         config_file = tool_folder / "config.yaml"
         main_file = tool_folder / "main.py"
+        fingerprint = self._fingerprint(tool_folder)
+        self._fingerprints[tool_folder.name] = fingerprint
         
         if not config_file.exists():
             self.logger.warning(f"Tool {tool_folder.name} missing config.yaml")
@@ -45,26 +183,15 @@ class ToolLoader:
         
         try:
             # Load config
-            with open(config_file, 'r') as f:
-                config = yaml.safe_load(f)
-            
-            # Load Python module
-            spec = importlib.util.spec_from_file_location(
-                f"tool_{tool_folder.name}", main_file
-            )
-            module = importlib.util.module_from_spec(spec)
-            spec.loader.exec_module(module)
-            
-            # Verify execute function exists
-            if not hasattr(module, 'execute'):
-                self.logger.error(f"Tool {tool_folder.name} missing execute function")
-                return
+            config = self._read_config(tool_folder, fingerprint)
             
             # Store tool - use folder name as tool name (e.g., main.speak)
+            # The module is imported lazily by _import_tool
             tool_name = tool_folder.name  # Use folder name instead of config name
             self.tools[tool_name] = {
                 'config': config,
-                'execute': module.execute,
+                'schema': None if config.get('raw_args') else ArgumentSchema.from_config(config, tool_name),
+                'execute': None,
                 'folder': tool_folder
             }
             
@@ -73,6 +200,35 @@ class ToolLoader:
         except Exception as e:
             self.logger.error(f"Failed to load tool {tool_folder.name}: {str(e)}")
     
+    def _import_tool(self, tool_name: str, tool: Dict[str, Any]) -> Callable:
+        """Import a tool's main.py on first use and return its execute function."""
+        with self._import_lock:
+            if tool['execute'] is not None:
+                return tool['execute']
+            
+            main_file = tool['folder'] / "main.py"
+            spec = importlib.util.spec_from_file_location(
+                f"tool_{tool_name}", main_file
+            )
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            
+            # Verify execute function exists
+            if not hasattr(module, 'execute'):
+                raise ImportError(f"Tool {tool_name} missing execute function")
+            
+            tool['execute'] = module.execute
+            self.logger.info(f"Imported tool module: {tool_name}")
+            return tool['execute']
+    
+    def import_tools(self):
+        """Import every tool module now instead of on first use (e.g. to warm worker processes)."""
+        for tool_name, tool in list(self.tools.items()):
+            try:
+                self._import_tool(tool_name, tool)
+            except Exception as e:
+                self.logger.error(f"Failed to import tool {tool_name}: {str(e)}")
+    
     def get_tool(self, tool_name: str) -> Optional[Dict[str, Any]]:
         """Get a tool by name."""
         return self.tools.get(tool_name)
@@ -81,8 +237,8 @@ class ToolLoader:
         """List all loaded tools."""
         return self.tools.copy()
     
-    def execute_tool(self, tool_name: str, args: str) -> Dict[str, Any]:
-        """Execute a tool with the given arguments."""
+    def execute_tool(self, tool_name: str, args: Any) -> Dict[str, Any]:
+        """Execute a tool with the given arguments (a parsed dict, or the raw string for `raw_args` tools)."""
         tool = self.get_tool(tool_name)
         
         if not tool:
@@ -92,11 +248,14 @@ class ToolLoader:
             }
         
         try:
-            result = tool['execute'](args)
+            execute = tool['execute'] or self._import_tool(tool_name, tool)
+            result = execute(args)
             return result
         except Exception as e:
-            self.logger.error(f"Error executing tool {tool_name}: {str(e)}")
+            # Some errors (e.g. MemoryError) have no message
+            message = str(e) or type(e).__name__
+            self.logger.error(f"Error executing tool {tool_name}: {message}")
             return {
                 'success': False,
-                'error': f"Tool execution failed: {str(e)}"
+                'error': f"Tool execution failed: {message}"
             }
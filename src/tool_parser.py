@@ -4,10 +4,16 @@ Handles parsing of tool commands in the format: {tool {name} {args}}
 """
 
 import re
+import time
 import logging
-from typing import List
+import threading
+from typing import Any, List, Optional
 from dataclasses import dataclass
-from .tool_loader import ToolLoader
+from concurrent.futures import ThreadPoolExecutor
+from .tool_args import ArgumentError, parse_args
+from .tool_loader import ToolLoader, get_tool_loader
+from .tool_workers import ToolWorkerPool
+from .metrics import TRACER, PARSE_SECONDS, TOOL_SECONDS, TOOL_CALLS, in_current_context
 
 
 @dataclass
@@ -16,50 +22,260 @@ class ToolCommand:
     name: str
     args: str
     raw_command: str
+    start: int = -1  # Offset of the opening brace in the response
+    end: int = -1  # Offset just past the closing brace
+
+
+# Characters that matter inside a command's args
+_ARGS_SPECIAL = re.compile(r'[{}"\']')
+# Whitespace then the tool name
+_TOOL_NAME = re.compile(r'\s*([^\s}]+)')
+_WHITESPACE = re.compile(r'\s*')
+# After a backslash-quote: the value ends there if the command or the next
+# key=value follows (so a Windows path like "C:\Users\" can end a value); else
+# it is an escaped quote
+_CLOSES_VALUE = re.compile(r'\s*(?:\}|[A-Za-z_][\w.-]*\s*=)')
+# ... and while only this much has arrived, it can't be told yet
+_MAY_CLOSE_VALUE = re.compile(r'\s*(?:[A-Za-z_][\w.-]*\s*)?\Z')
+# Fast path for a complete command whose args have no braces, backslash-quotes
+# or triple quotes; anything it accepts, the state machine would parse the same
+# way. Runs of plain characters are matched in one step (unrolled loops).
+_PLAIN_RUN = r'[^{}"\'=]*'
+_SIMPLE_COMMAND = re.compile(
+    r'\{tool\s+([^\s{}]+)(?=[\s}])\s*'
+    r'(' + _PLAIN_RUN + r'(?:(?:'
+    r'=\s*"[^"\\{}]*(?:\\(?!")[^"\\{}]*)*"'
+    r'|=\s*\'[^\'\\{}]*(?:\\(?!\')[^\'\\{}]*)*\''
+    r'|=(?!\s*["\']))' + _PLAIN_RUN + r')*)\}'
+)
+# Lenient fallback for a command whose quotes or braces never balance: ends at the first brace
+_FALLBACK_PATTERN = re.compile(r'\{tool\s+([^\s}]+)(?:\s+([\s\S]+?))?\}')
+
+
+class _ToolScanner:
+    """
+    Single-pass, resumable tokenizer for tool commands.
+    
+    Finds `{tool name args}` in text fed in any number of pieces. Inside args,
+    values opened with a quote right after `=` ("...", '...' with backslash
+    escapes, or triple quotes) may contain braces, and unquoted braces nest,
+    so code or JSON in a value does not end the command early. Every character is looked at
+    once; jumps between interesting characters use str.find/regex search.
+    """
+    
+    TEXT, NAME, ARGS, STRING = range(4)
+    
+    def __init__(self):
+        self._buf = ''  # Unconsumed text
+        self._base = 0  # Offset of _buf[0] in the whole response
+        self._pos = 0  # Scan position in _buf
+        self._state = self.TEXT
+        self._start = 0  # Start of the pending command in _buf
+        self._name = ''
+        self._args_start = 0
+        self._depth = 0
+        self._quote = ''
+    
+    def feed(self, text: str) -> List[ToolCommand]:
+        """Scan more text and return the commands it completed."""
+        self._buf += text
+        found = self._scan()
+        self._trim()
+        return found
+    
+    def close(self) -> List[ToolCommand]:
+        """
+        Finish scanning at the end of the response.
+        
+        A command still open here has unbalanced quotes or braces; it is
+        parsed leniently, ending at its first closing brace.
+        """
+        found = []
+        while self._state != self.TEXT:
+            match = _FALLBACK_PATTERN.match(self._buf, self._start)
+            if match:
+                found.append(self._emit(match.group(1), match.group(2) or '', match.end()))
+            else:
+                self._state = self.TEXT
+                self._pos = self._start + 1
+            found.extend(self._scan())
+        self._trim()
+        return found
+    
+    def _trim(self) -> None:
+        """Drop buffered text that can no longer be part of a command."""
+        cut = self._pos if self._state == self.TEXT else self._start
+        if cut:
+            self._buf = self._buf[cut:]
+            self._base += cut
+            self._pos -= cut
+            self._start -= cut
+            self._args_start -= cut
+    
+    def _emit(self, name: str, raw_args: str, end: int) -> ToolCommand:
+        """Build the command ending at `end` and resume scanning after it."""
+        tool_args = raw_args.strip()
+        # Build raw_command with or without args
+        if tool_args:
+            raw_command = f"{{tool {name} {tool_args}}}"
+        else:
+            raw_command = f"{{tool {name}}}"
+        command = ToolCommand(
+            name=name,
+            args=tool_args,
+            raw_command=raw_command,
+            start=self._base + self._start,
+            end=self._base + end
+        )
+        self._pos = end
+        self._state = self.TEXT
+        return command
+    
+    def _scan(self) -> List[ToolCommand]:
+        """Advance the state machine as far as the buffered text allows."""
+        found = []
+        buf = self._buf
+        while True:
+            if self._state == self.TEXT:
+                i = buf.find('{tool', self._pos)
+                if i == -1:
+                    # Keep just enough to recognize a '{tool' split across chunks
+                    self._pos = max(len(buf) - 4, self._pos)
+                    return found
+                if i + 5 >= len(buf):
+                    self._pos = i
+                    return found
+                if not buf[i + 5].isspace():
+                    self._pos = i + 1
+                    continue
+                self._start = i
+                match = _SIMPLE_COMMAND.match(buf, i)
+                if match:
+                    found.append(self._emit(match.group(1), match.group(2), match.end()))
+                    continue
+                self._pos = i + 5
+                self._state = self.NAME
+            
+            elif self._state == self.NAME:
+                match = _TOOL_NAME.match(buf, self._pos)
+                if match is None:
+                    if _WHITESPACE.match(buf, self._pos).end() == len(buf):
+                        # Only whitespace so far; the name may still come
+                        return found
+                    # '{tool }' has no name; not a command
+                    self._state = self.TEXT
+                    self._pos = self._start + 1
+                    continue
+                if match.end() == len(buf):
+                    # The name (or the whitespace before it) may go on
+                    return found
+                self._name = match.group(1)
+                # Args start after the whitespace, so strip() in _emit need not copy them
+                self._pos = self._args_start = _WHITESPACE.match(buf, match.end()).end()
+                self._depth = 0
+                self._state = self.ARGS
+            
+            elif self._state == self.ARGS:
+                match = _ARGS_SPECIAL.search(buf, self._pos)
+                if match is None:
+                    self._pos = len(buf)
+                    return found
+                j = match.start()
+                char = buf[j]
+                if char == '{':
+                    self._depth += 1
+                    self._pos = j + 1
+                elif char == '}':
+                    if self._depth == 0:
+                        found.append(self._emit(self._name, buf[self._args_start:j], j + 1))
+                    else:
+                        self._depth -= 1
+                        self._pos = j + 1
+                elif self._opens_value(buf, j):
+                    if char == '"' and len(buf) - j < 3:
+                        # Can't tell '"' from '"""' yet
+                        self._pos = j
+                        return found
+                    self._quote = '"""' if buf.startswith('"""', j) else char
+                    self._pos = j + len(self._quote)
+                    self._state = self.STRING
+                else:
+                    # A quote inside an unquoted value, e.g. text=don't
+                    self._pos = j + 1
+            
+            else:  # STRING
+                k = buf.find(self._quote, self._pos)
+                if k == -1:
+                    self._pos = max(self._pos, len(buf) - len(self._quote) + 1)
+                    return found
+                if len(self._quote) == 1 and buf[k - 1] == '\\':
+                    if _MAY_CLOSE_VALUE.match(buf, k + 1):
+                        # Wait for what follows the quote
+                        self._pos = k
+                        return found
+                    if not _CLOSES_VALUE.match(buf, k + 1):
+                        # \" or \' inside a single-line value
+                        self._pos = k + 1
+                        continue
+                self._pos = k + len(self._quote)
+                self._state = self.ARGS
+    
+    def _opens_value(self, buf: str, j: int) -> bool:
+        """Check whether the quote at j directly follows `=` (ignoring whitespace)."""
+        k = j - 1
+        while k >= self._args_start and buf[k].isspace():
+            k -= 1
+        return k >= self._args_start and buf[k] == '='
 
 
 class ToolParser:
     """Parses and extracts tool commands from AI responses."""
     
     def __init__(self):
-        # Regex to match {tool name [args]} across multiple lines, with optional args
-        # Use DOTALL so args can include newlines
-        self.tool_pattern = re.compile(
-            r'\{tool\s+([^\s\}]+)(?:\s+([\s\S]+?))?\}',
-            re.DOTALL
-        )
         self.logger = logging.getLogger(__name__)
     
     def parse_commands(self, text: str) -> List[ToolCommand]:
         """
-        Parse tool commands from text.
+        Parse tool commands from text in a single pass.
+        
+        Responses whose commands all have simple args (no braces, backslash-quotes
+        or triple quotes) are parsed with one regex; others go through the
+        tokenizer, which finds the same commands either way.
         
         Args:
             text: The text to parse for tool commands
             
         Returns:
-            List of ToolCommand objects found in the text
+            List of ToolCommand objects found in the text, with their offsets
         """
+        first = text.find('{tool')
+        if first == -1:
+            return []
+        if _SIMPLE_COMMAND.match(text, first) is None:
+            # Likely code or JSON in the args; don't scan the text twice
+            return self._scan(text)
         commands = []
-        matches = self.tool_pattern.findall(text)
-        
-        for match in matches:
-            tool_name = match[0]
-            raw_args = match[1] or ''
-            tool_args = raw_args.strip()
-            # Build raw_command with or without args
-            if tool_args:
-                raw_command = f"{{tool {tool_name} {tool_args}}}"
-            else:
-                raw_command = f"{{tool {tool_name}}}"
-            
+        for match in _SIMPLE_COMMAND.finditer(text):
+            name, tool_args = match.groups()
+            tool_args = tool_args.rstrip()
+            start, end = match.span()
             commands.append(ToolCommand(
-                name=tool_name,
+                name=name,
                 args=tool_args,
-                raw_command=raw_command
+                raw_command=f"{{tool {name} {tool_args}}}" if tool_args else f"{{tool {name}}}",
+                start=start,
+                end=end
             ))
-            
-        return commands
+        # Every '{tool' started a simple command (a match never contains another '{')
+        if len(commands) == text.count('{tool'):
+            return commands
+        return self._scan(text)
+    
+    @staticmethod
+    def _scan(text: str) -> List[ToolCommand]:
+        """Parse complete text with the tokenizer."""
+        scanner = _ToolScanner()
+        return scanner.feed(text) + scanner.close()
     
     def has_tool_commands(self, text: str) -> bool:
         """
@@ -71,7 +287,7 @@ class ToolParser:
         Returns:
             True if tool commands are found, False otherwise
         """
-        return bool(self.tool_pattern.search(text))
+        return '{tool' in text and bool(self.parse_commands(text))
     
     def extract_non_tool_text(self, text: str) -> str:
         """
@@ -83,21 +299,122 @@ class ToolParser:
         Returns:
             Text with tool commands removed
         """
-        return self.tool_pattern.sub('', text).strip()
+        pieces = []
+        pos = 0
+        for command in self.parse_commands(text):
+            pieces.append(text[pos:command.start])
+            pos = command.end
+        pieces.append(text[pos:])
+        return ''.join(pieces).strip()
+
+
+class IncrementalToolParser:
+    """
+    Parses tool commands out of a response while it is still being streamed.
+    
+    Feed it text chunks as they arrive; each command is returned as soon as
+    its closing brace has been seen. Together with close(), the commands
+    found are the same as ToolParser.parse_commands finds on the complete text.
+    """
+    
+    def __init__(self, parser: Optional[ToolParser] = None):
+        self.parser = parser or ToolParser()
+        self.commands: List[ToolCommand] = []
+        self._scanner = _ToolScanner()
+    
+    def feed(self, chunk: str) -> List[ToolCommand]:
+        """
+        Add a chunk of response text.
+        
+        Args:
+            chunk: The next piece of the response
+            
+        Returns:
+            Tool commands completed by this chunk
+        """
+        start = time.perf_counter()
+        found = self._scanner.feed(chunk)
+        PARSE_SECONDS.observe(time.perf_counter() - start, mode='stream')
+        self.commands.extend(found)
+        return found
+    
+    def close(self) -> List[ToolCommand]:
+        """
+        Signal the end of the response.
+        
+        Returns:
+            Commands that only complete leniently (unbalanced quotes or braces)
+        """
+        found = self._scanner.close()
+        self.commands.extend(found)
+        return found
+
+
+class StreamingBatch:
+    """
+    Starts tool commands while the response that contains them is still streaming.
+    
+    Non-serial commands start on the ToolSystem's thread pool as soon as
+    they are added. The first serial command is a barrier: it and everything
+    after it wait for finish(), which then applies the same rules as
+    ToolSystem.execute_batch.
+    """
+    
+    def __init__(self, tool_system: "ToolSystem"):
+        self.tool_system = tool_system
+        self.commands: List[ToolCommand] = []
+        self._futures = []
+        self._blocked = False
+    
+    def add(self, command: ToolCommand) -> None:
+        """Add a command, starting it right away if nothing has to run before it."""
+        self.commands.append(command)
+        if self._blocked or self.tool_system.is_serial(command):
+            self._blocked = True
+            return
+        executor = self.tool_system._get_executor()
+        self._futures.append(executor.submit(in_current_context(self.tool_system.execute_command, command)))
+    
+    def finish(self) -> List[dict]:
+        """
+        Wait for started commands and run the remaining ones.
+        
+        Returns:
+            Execution results in command order; shorter than the commands if
+            execution stopped early
+        """
+        results = []
+        for future in self._futures:
+            result = future.result()
+            results.append(result)
+            if result.get('action') == 'stop_system':
+                return results
+        pending = self.commands[len(self._futures):]
+        if pending:
+            results.extend(self.tool_system.execute_batch(pending))
+        return results
 
 
 class ToolSystem:
     """Main tool system for parsing and executing tool commands."""
     
-    def __init__(self, tools_dir: str = "tools"):
+    def __init__(self, tools_dir: str = "tools", loader: Optional[ToolLoader] = None,
+                 max_workers: int = 8, worker_pool: Optional[ToolWorkerPool] = None):
         """
         Initialize the ToolSystem with a specific tools directory.
         Args:
             tools_dir: Path to the tools directory.
+            loader: Tool loader to use (the shared one for tools_dir if not specified).
+            max_workers: Maximum number of commands execute_batch runs at once.
+            worker_pool: Run tools in these worker processes instead of in-process.
         """
         self.parser = ToolParser()
-        self.loader = ToolLoader(tools_dir)
+        self.loader = loader or get_tool_loader(tools_dir)
+        self.max_workers = max_workers
+        self.worker_pool = worker_pool
         self.logger = logging.getLogger(__name__)
+        self._executor = None
+        self._executor_lock = threading.Lock()
     
     def process_response(self, response: str) -> List[ToolCommand]:
         """
@@ -109,11 +426,10 @@ class ToolSystem:
         Returns:
             List of ToolCommand objects found in the response
         """
-        if not self.parser.has_tool_commands(response):
-            return []
-        
-        commands = self.parser.parse_commands(response)
-        self.logger.info(f"Found {len(commands)} tool commands in response")
+        with PARSE_SECONDS.time(mode='full'):
+            commands = self.parser.parse_commands(response)
+        if commands:
+            self.logger.info(f"Found {len(commands)} tool commands in response")
         
         return commands
     
@@ -127,7 +443,143 @@ class ToolSystem:
         Returns:
             Dictionary with execution result
         """
-        return self.loader.execute_tool(command.name, command.args)
+        spec = self.loader.get_tool(command.name)
+        # Unknown names come from the AI; keep them out of the metric labels
+        tool = command.name if spec is not None else 'unknown'
+        # Tools that need this process's state (e.g. main.subai) set `inprocess: true`
+        in_process = spec is not None and spec['config'].get('inprocess', False)
+        start = time.perf_counter()
+        with TRACER.span('tool.execute', **{'zen.tool': command.name}) as span:
+            try:
+                args = self.parse_args(command)
+            except ArgumentError as e:
+                self.logger.warning(f"Rejected {command.raw_command}: {str(e)}")
+                TOOL_CALLS.inc(tool=tool, outcome='invalid_args')
+                span.set_attribute('zen.outcome', 'invalid_args')
+                return {
+                    'success': False,
+                    'error': f"Invalid arguments for {command.name}: {str(e)}"
+                }
+            try:
+                if self.worker_pool is not None and not in_process:
+                    result = self.worker_pool.execute(command.name, args)
+                else:
+                    result = self.loader.execute_tool(command.name, args)
+            finally:
+                TOOL_SECONDS.observe(time.perf_counter() - start, tool=tool)
+            outcome = 'ok' if result.get('success') else 'error'
+            TOOL_CALLS.inc(tool=tool, outcome=outcome)
+            span.set_attribute('zen.outcome', outcome)
+            return result
+    
+    def parse_args(self, command: ToolCommand) -> Any:
+        """
+        Parse a command's args with its tool's schema.
+        
+        Args:
+            command: The ToolCommand whose args to parse
+            
+        Returns:
+            Dictionary of typed arguments, or the raw args string for tools
+            that set `raw_args: true` (and for unknown tools)
+            
+        Raises:
+            ArgumentError: If the args are malformed or don't match the schema
+        """
+        tool = self.loader.get_tool(command.name)
+        if tool is None or tool['schema'] is None:
+            return command.args
+        return tool['schema'].parse(command.args)
+    
+    def is_serial(self, command: ToolCommand) -> bool:
+        """
+        Check whether a command must run on its own, in response order.
+        
+        A tool sets `serial: true` in its config.yaml if all of its commands
+        must, or `serial` to a list of parameters if only commands that use
+        one of them must (e.g. the writes of main.files, so that a write and
+        appends to the same file keep their order while reads still run in
+        parallel).
+        """
+        tool = self.loader.get_tool(command.name)
+        if tool is None:
+            return False
+        serial = tool['config'].get('serial', False)
+        if not isinstance(serial, (list, tuple)):
+            return bool(serial)
+        try:
+            keys = parse_args(command.args)
+        except ArgumentError:
+            # Rejected before it runs, so it cannot interfere with anything
+            return False
+        return any(name in keys for name in serial)
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the batch thread pool on first use."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='zen-batch'
+                )
+            return self._executor
+    
+    def incremental_parser(self) -> IncrementalToolParser:
+        """Create a parser for a streamed response."""
+        return IncrementalToolParser(self.parser)
+    
+    def start_batch(self) -> StreamingBatch:
+        """Create a batch that starts commands while a response is streaming."""
+        return StreamingBatch(self)
+    
+    def execute_batch(self, commands: List[ToolCommand]) -> List[dict]:
+        """
+        Execute several tool commands, running independent ones in parallel.
+        
+        Consecutive non-serial commands run concurrently on a bounded thread
+        pool. A serial command (e.g. main.stop, or a main.files write) is a
+        barrier: everything before it finishes first and nothing after it
+        starts until it is done. Once a result asks to stop the system, later commands are
+        not executed.
+        
+        Args:
+            commands: The ToolCommands to execute, in response order
+            
+        Returns:
+            Execution results in the same order as the commands; shorter than
+            the commands if execution stopped early
+        """
+        results = []
+        group = []
+        
+        def run_group() -> bool:
+            """Run the pending parallel group; return True if it requested a stop."""
+            if len(group) == 1:
+                group_results = [self.execute_command(group[0])]
+            else:
+                executor = self._get_executor()
+                futures = [executor.submit(in_current_context(self.execute_command, cmd)) for cmd in group]
+                group_results = [future.result() for future in futures]
+            group.clear()
+            for result in group_results:
+                results.append(result)
+                if result.get('action') == 'stop_system':
+                    return True
+            return False
+        
+        for cmd in commands:
+            if not self.is_serial(cmd):
+                group.append(cmd)
+                continue
+            if group and run_group():
+                return results
+            result = self.execute_command(cmd)
+            results.append(result)
+            if result.get('action') == 'stop_system':
+                return results
+        if group:
+            run_group()
+        return results
     
     def list_available_tools(self) -> dict:
         """List all available tools."""
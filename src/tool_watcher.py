@@ -0,0 +1,103 @@
+"""
+Tool hot reload for Zen AI.
+Watches the tools directory and reloads only the tool folders that changed,
+so tools can be added or edited without restarting the server.
+"""
+
+import time
+import logging
+import threading
+from typing import Optional
+
+from .tool_loader import ToolLoader
+
+try:
+    # Optional: native change notifications (inotify on Linux)
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """Flags the watcher whenever anything under the tools directory changes."""
+
+    def __init__(self, watcher: "ToolWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        # Our own manifest writes would otherwise trigger endless reloads
+        if not str(event.src_path).endswith((ToolLoader.MANIFEST_NAME, '.tmp')):
+            self.watcher._changed.set()
+
+
+class ToolWatcher:
+    """
+    Background thread that keeps a ToolLoader in sync with the tools directory.
+
+    Uses watchdog (inotify where available) when it is installed and falls
+    back to polling file mtimes otherwise. Either way the actual work is done
+    by ``ToolLoader.refresh``, which only reloads folders whose files changed.
+    """
+
+    def __init__(self, loader: ToolLoader, poll_interval: float = 1.0, use_native: bool = True):
+        """
+        Initialize the watcher.
+
+        Args:
+            loader: The tool loader to keep up to date
+            poll_interval: Seconds between checks (also the debounce delay for native events)
+            use_native: Use native change notifications if watchdog is installed
+        """
+        self.loader = loader
+        self.poll_interval = poll_interval
+        self.use_native = use_native and Observer is not None
+        self.logger = logging.getLogger(__name__)
+        self._changed = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+
+    def start(self) -> None:
+        """Start watching in a daemon thread."""
+        if self._thread is not None:
+            return
+        if self.use_native:
+            self._observer = Observer()
+            self._observer.schedule(_ChangeHandler(self), str(self.loader.tools_dir), recursive=True)
+            self._observer.daemon = True
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name='zen-tool-watcher', daemon=True)
+        self._thread.start()
+        mode = 'native events' if self.use_native else f'polling every {self.poll_interval}s'
+        self.logger.info(f"Watching {self.loader.tools_dir} for tool changes ({mode})")
+
+    def stop(self) -> None:
+        """Stop watching."""
+        self._stop.set()
+        self._changed.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        """Watcher loop: wait for a change (or the poll interval) and refresh."""
+        while not self._stop.is_set():
+            if self.use_native:
+                self._changed.wait()
+                # Let a burst of events (e.g. an editor save) settle first
+                time.sleep(self.poll_interval)
+                self._changed.clear()
+            else:
+                self._stop.wait(self.poll_interval)
+            if self._stop.is_set():
+                break
+            try:
+                self.loader.refresh()
+            except Exception as e:
+                self.logger.error(f"Tool reload failed: {str(e)}")
@@ -0,0 +1,269 @@
+"""
+Process worker pool for Zen AI tools.
+Runs tools in warm, pre-started worker processes so a slow or hung tool can be
+timed out and killed, and a crashing tool cannot take down the server.
+"""
+
+import queue
+import atexit
+import logging
+import threading
+import multiprocessing
+from typing import Any, Dict, List, Optional
+
+from .tool_loader import ToolLoader
+
+try:
+    import resource  # Unix only; used for per-worker memory caps
+except ImportError:
+    resource = None
+
+
+def _worker_main(tools_dir: str, conn, memory_limit_mb: Optional[int]) -> None:
+    """Entry point of a worker process: import all tools, then serve calls until told to stop."""
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    loader = ToolLoader(tools_dir)
+    loader.import_tools()
+    server_version = None
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if request is None:
+            break
+        tool_name, args, version = request
+        # Pick up tools that were hot-reloaded in the server since the last call
+        if version != server_version:
+            if server_version is not None:
+                loader.refresh()
+            server_version = version
+        result = loader.execute_tool(tool_name, args)
+        try:
+            conn.send(result)
+        except Exception as e:
+            # e.g. a result that cannot be pickled
+            conn.send({
+                'success': False,
+                'error': f"Tool execution failed: {str(e)}"
+            })
+
+
+class _Worker:
+    """A single worker process and the pipe used to talk to it."""
+
+    def __init__(self, context, tools_dir: str, memory_limit_mb: Optional[int]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(tools_dir, child_conn, memory_limit_mb),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        """Terminate the worker without waiting for it to finish."""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ToolWorkerPool:
+    """
+    Pool of pre-started worker processes that execute tools.
+
+    Each worker imports every tool module once at startup. Calls have a
+    wall-clock timeout (per tool via `timeout` in config.yaml, else the pool
+    default); a worker that times out or dies is killed and replaced.
+    """
+
+    # Seconds between checks of a caller waiting for an idle worker
+    IDLE_POLL = 0.5
+
+    def __init__(self, loader: ToolLoader, workers: int = 4, default_timeout: float = 60,
+                 memory_limit_mb: Optional[int] = None):
+        """
+        Initialize the worker pool (workers are started by start() or on first use).
+
+        Args:
+            loader: The server's tool loader (used for per-tool config)
+            workers: Number of worker processes
+            default_timeout: Seconds a tool may run unless its config sets `timeout`
+            memory_limit_mb: Address space cap per worker in MB (Unix only)
+        """
+        self.loader = loader
+        self.tools_dir = str(loader.tools_dir.resolve())
+        self.size = workers
+        self.default_timeout = default_timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.logger = logging.getLogger(__name__)
+        self._context = self._start_context()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._workers: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._started = False
+        self._stop_at_exit = False
+
+    @staticmethod
+    def _start_context():
+        """
+        Multiprocessing context for starting workers.
+
+        Workers are also started while the server runs (to replace one that
+        timed out), when its threads may hold locks; a forked copy of such a
+        process can deadlock. The fork server is a clean process that only
+        imports this module, so workers are forked from it instead (or
+        spawned where there is no fork server).
+        """
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('forkserver')
+            # Without __main__, so the fork server does not run the server's startup code
+            context.set_forkserver_preload([__name__])
+            return context
+        return multiprocessing.get_context('spawn')
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        with self._lock:
+            if self._started:
+                return
+            # A spawned child re-imports the server module; it must not start its own pool
+            if multiprocessing.parent_process() is not None:
+                return
+            self._started = True
+            for _ in range(self.size):
+                self._idle.put(self._spawn())
+            if not self._stop_at_exit:
+                atexit.register(self.stop)
+                self._stop_at_exit = True
+        self.logger.info(f"Started {self.size} tool worker processes")
+
+    def stop(self) -> None:
+        """Stop all worker processes."""
+        with self._lock:
+            workers, self._workers = self._workers, []
+            self._started = False
+            # Forget idle workers too, so a restarted pool never hands out a stopped one
+            while True:
+                try:
+                    self._idle.get_nowait()
+                except queue.Empty:
+                    break
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+                worker.process.join(timeout=1)
+            except OSError:
+                pass
+            worker.kill()
+
+    def _spawn(self) -> _Worker:
+        """Start one worker process."""
+        worker = _Worker(self._context, self.tools_dir, self.memory_limit_mb)
+        self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker) -> None:
+        """Kill a misbehaving worker and put a fresh one in its place."""
+        worker.kill()
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            self._refill()
+
+    def _refill(self) -> None:
+        """Start workers until the pool is full again (call with the lock held)."""
+        while self._started and len(self._workers) < self.size:
+            try:
+                self._idle.put(self._spawn())
+            except Exception as e:
+                # Retried by the next caller that has to wait for a worker
+                self.logger.error(f"Could not start tool worker: {str(e)}")
+                return
+
+    def _acquire(self) -> Optional[_Worker]:
+        """
+        Wait for an idle worker.
+
+        Returns:
+            The worker, or None if the pool was stopped while waiting
+        """
+        while True:
+            try:
+                return self._idle.get(timeout=self.IDLE_POLL)
+            except queue.Empty:
+                pass
+            with self._lock:
+                if not self._started:
+                    return None
+                # Workers that could not be started before are retried here
+                self._refill()
+                if not self._workers:
+                    raise OSError("No tool worker could be started")
+
+    def timeout_for(self, tool_name: str) -> float:
+        """Wall-clock timeout for a tool, from its config.yaml or the pool default."""
+        tool = self.loader.get_tool(tool_name)
+        if tool and tool['config'].get('timeout') is not None:
+            return float(tool['config']['timeout'])
+        return self.default_timeout
+
+    def execute(self, tool_name: str, args: Any) -> Dict[str, Any]:
+        """
+        Execute a tool in a worker process.
+
+        Args:
+            tool_name: Name of the tool to run
+            args: Arguments for the tool
+
+        Returns:
+            The tool's result, or an error result on timeout or worker crash
+        """
+        if self.loader.get_tool(tool_name) is None:
+            return {
+                'success': False,
+                'error': f"Tool '{tool_name}' not found"
+            }
+        self.start()
+        if not self._started:
+            # Inside a spawned child or after shutdown: run in-process
+            return self.loader.execute_tool(tool_name, args)
+
+        timeout = self.timeout_for(tool_name)
+        try:
+            worker = self._acquire()
+        except OSError as e:
+            return {
+                'success': False,
+                'error': f"Tool execution failed: {str(e)}"
+            }
+        if worker is None:
+            # Stopped while waiting for a worker
+            return self.loader.execute_tool(tool_name, args)
+        try:
+            worker.conn.send((tool_name, args, self.loader.version))
+            if not worker.conn.poll(timeout):
+                self.logger.error(f"Tool {tool_name} timed out after {timeout}s, restarting worker {worker.process.pid}")
+                self._replace(worker)
+                return {
+                    'success': False,
+                    'error': f"Tool execution timed out after {timeout}s"
+                }
+            result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            self.logger.error(f"Tool worker {worker.process.pid} died running {tool_name}: {str(e)}")
+            self._replace(worker)
+            return {
+                'success': False,
+                'error': f"Tool execution failed: worker process exited (code {worker.process.exitcode})"
+            }
+        with self._lock:
+            # Unless the pool was stopped meanwhile
+            if worker in self._workers:
+                self._idle.put(worker)
+        return result
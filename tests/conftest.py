@@ -0,0 +1,137 @@
+"""
+Shared fixtures for the Zen AI tests.
+Everything runs offline: AI clients use the scripted fake backend and the
+servers are imported with a test copy of zen_config.yaml.
+"""
+
+import os
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from src.ai.gemini import Gemini  # noqa: E402
+from src.ai.backends import ScriptedBackend  # noqa: E402
+from src.ai.call_policy import CallPolicy  # noqa: E402
+from src.tool_loader import get_tool_loader  # noqa: E402
+
+
+def make_ai(script=None, system_instruction: str = None, **backend_options) -> Gemini:
+    """A Gemini client on the scripted backend (see ScriptedBackend for `script`)."""
+    return Gemini(
+        api_key='test',
+        model='test-model',
+        system_instruction=system_instruction,
+        backend=ScriptedBackend(script, **backend_options),
+        call_policy=CallPolicy(max_retries=0)
+    )
+
+
+@pytest.fixture
+def fake_ai():
+    """Factory for scripted Gemini clients."""
+    return make_ai
+
+
+@pytest.fixture(scope='session')
+def server_module(tmp_path_factory):
+    """
+    server.py imported with the fake backend, in-memory sessions and no tool watcher.
+
+    Tests change the replies through `server.backend._script` (see the `script` fixture).
+    """
+    with open(ROOT / 'config' / 'zen_config.yaml', 'r') as file:
+        config = yaml.safe_load(file)
+    config['ai']['backend'] = {'type': 'fake'}
+    config['server']['sessions']['persist'] = False
+    config['tools']['hot_reload'] = False
+    config_path = tmp_path_factory.mktemp('config') / 'zen_config.yaml'
+    with open(config_path, 'w') as file:
+        yaml.safe_dump(config, file)
+
+    previous_config = os.environ.get('ZEN_CONFIG')
+    os.environ['ZEN_CONFIG'] = str(config_path)
+    # server.py serves website/ and loads tools/ relative to the working directory
+    os.chdir(ROOT)
+    try:
+        import server
+    finally:
+        if previous_config is None:
+            os.environ.pop('ZEN_CONFIG', None)
+        else:
+            os.environ['ZEN_CONFIG'] = previous_config
+    return server
+
+
+@pytest.fixture
+def script(server_module):
+    """Set the reply function `(history, message) -> reply` of the server's fake backend."""
+    backend = server_module.backend
+    saved = backend._script
+
+    def set_script(reply):
+        backend._script = reply
+
+    yield set_script
+    backend._script = saved
+
+# Tool that leaves a marker file when its module is imported
+MARKER_TOOL = (
+    "from pathlib import Path\n"
+    "Path(__file__).with_name('imported').write_text('yes')\n"
+    "def execute(args):\n"
+    "    return {'success': True, 'result': 'v1'}\n"
+)
+
+
+def write_tool(tools_dir: Path, name: str, config: dict, code: str = None) -> Path:
+    """Create (or overwrite) a tool folder; the default main.py echoes its args."""
+    folder = Path(tools_dir) / name
+    folder.mkdir(parents=True, exist_ok=True)
+    with open(folder / 'config.yaml', 'w') as file:
+        yaml.safe_dump({'name': name, 'description': f"{name} test tool", **config}, file)
+    (folder / 'main.py').write_text(code or (
+        "def execute(args):\n"
+        "    return {'success': True, 'result': args}\n"
+    ))
+    return folder
+
+
+@pytest.fixture
+def tools_dir(tmp_path):
+    """A tools directory with two echo tools, test.alpha and test.beta."""
+    directory = tmp_path / 'tools'
+    write_tool(directory, 'test.alpha', {'parameters': [{'name': 'text', 'type': 'string'}]})
+    write_tool(directory, 'test.beta', {'parameters': [{'name': 'n', 'type': 'integer'}]})
+    return directory
+
+
+@pytest.fixture
+def files_tool(tmp_path, monkeypatch):
+    """The main.files module of the repository's tools, keeping its backups under tmp_path."""
+    loader = get_tool_loader(str(ROOT / 'tools'))
+    tool = loader.get_tool('main.files')
+    execute = tool['execute'] or loader._import_tool('main.files', tool)
+    module = execute.__globals__
+    backups = tmp_path / 'backups'
+    backups.mkdir()
+    monkeypatch.setitem(module, 'BACKUP_ROOT', backups)
+    monkeypatch.setitem(module, 'OBJECTS_DIR', backups / 'objects')
+    monkeypatch.setitem(module, 'MANIFESTS_DIR', backups / 'manifests')
+    return SimpleNamespace(**module)
+
+
+@pytest.fixture
+def memory_tool(tmp_path, monkeypatch):
+    """The main.memory module of the repository's tools, on a database under tmp_path."""
+    loader = get_tool_loader(str(ROOT / 'tools'))
+    tool = loader.get_tool('main.memory')
+    execute = tool['execute'] or loader._import_tool('main.memory', tool)
+    module = execute.__globals__
+    monkeypatch.setitem(module, 'DB_PATH', tmp_path / 'memory.db')
+    return SimpleNamespace(**module)
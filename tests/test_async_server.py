@@ -0,0 +1,64 @@
+"""Asyncio server mode (server_async.py and Gemini.chat_async)."""
+
+import time
+import asyncio
+
+import pytest
+
+
+@pytest.fixture(scope='module')
+def async_server(server_module):
+    import server_async
+    return server_async
+
+
+def test_chat_async_keeps_history(fake_ai):
+    ai = fake_ai(lambda history, message: f"{len(history)} before {message}")
+
+    async def talk():
+        first = await ai.chat_async('a', 'chat')
+        second = await ai.chat_async('b', 'chat')
+        return first, second
+
+    assert asyncio.run(talk()) == ('0 before a', '2 before b')
+
+
+def test_chat_async_calls_overlap(fake_ai):
+    ai = fake_ai(lambda history, message: 'ok', latency=0.2)
+
+    async def talk():
+        start = time.perf_counter()
+        await asyncio.gather(*(ai.chat_async('hi', f"chat-{i}") for i in range(5)))
+        return time.perf_counter() - start
+
+    # Five 0.2s calls finish together instead of one after another
+    assert asyncio.run(talk()) < 0.6
+
+
+def test_async_chat_endpoint_runs_tools(async_server, script):
+    script(lambda history, message: '{tool main.stop}' if message.startswith('SYSTEM')
+           else '{tool main.speak text="hello"}')
+
+    async def request():
+        client = async_server.app.test_client()
+        response = await client.post('/api/chat', json={'message': 'hi'})
+        return response.status_code, await response.get_json()
+
+    status, body = asyncio.run(request())
+    assert status == 200
+    assert [tool['name'] for tool in body['tools']] == ['main.speak', 'main.stop']
+    assert body['stop'] is True
+    assert body['session_id']
+
+
+def test_sub_ais_run_on_the_server_loop(async_server):
+    from src.sub_ai import get_orchestrator
+    orchestrator = get_orchestrator()
+
+    async def serve():
+        async with async_server.app.test_app():
+            serving_loop = orchestrator._loop
+        return serving_loop, asyncio.get_running_loop()
+
+    serving_loop, loop = asyncio.run(serve())
+    assert serving_loop is loop and orchestrator._loop is None
@@ -0,0 +1,62 @@
+"""Model backends: record, replay and the scripted fake."""
+
+import pytest
+
+from src.ai.gemini import Gemini
+from src.ai.history import HistoryPolicy
+from src.ai.call_policy import CallPolicy
+from src.ai.backends import (RecordingBackend, ReplayBackend, ReplayMiss, ScriptedBackend,
+                             create_backend)
+
+
+def _client(backend, **options):
+    return Gemini(api_key='test', model='test-model', system_instruction='be brief',
+                  backend=backend, call_policy=CallPolicy(max_retries=0), **options)
+
+
+def _conversation(ai):
+    return [ai.chat(message, 'chat') for message in ('hello', 'and again', 'bye')]
+
+
+@pytest.fixture
+def recordings(tmp_path):
+    return str(tmp_path / 'recordings.jsonl')
+
+
+def test_replay_answers_what_was_recorded(recordings):
+    inner = ScriptedBackend(lambda history, message: f"{message} after {len(history)}")
+    recorded = _conversation(_client(RecordingBackend(inner, recordings)))
+    assert recorded == ['hello after 0', 'and again after 2', 'bye after 4']
+    assert _conversation(_client(ReplayBackend(recordings))) == recorded
+
+
+def test_replay_miss_is_an_error(recordings):
+    ai = _client(ReplayBackend(recordings))
+    with pytest.raises(Exception, match='No recorded response'):
+        ai.chat('never recorded', 'chat')
+    with pytest.raises(ReplayMiss):
+        ReplayBackend(recordings).reply(ai.model, [], 'never recorded')
+
+
+def test_recording_keeps_working_when_history_is_compacted(recordings):
+    inner = ScriptedBackend(lambda history, message: f"{len(history)} before")
+    policy = HistoryPolicy(max_tokens=None, max_turns=1, keep_recent=1, summarize=False)
+    ai = _client(RecordingBackend(inner, recordings), history_policy=policy)
+    assert _conversation(ai) == ['0 before', '2 before', '2 before']
+    assert ai.compactions['chat'].turns_dropped == 1
+    # The compacted history is what gets recorded and replayed
+    replayed = _client(ReplayBackend(recordings), history_policy=policy)
+    assert _conversation(replayed) == ['0 before', '2 before', '2 before']
+
+
+def test_scripted_rules():
+    ai = _client(ScriptedBackend([{'match': '^SYSTEM:', 'reply': 'system'}, {'reply': 'default'}]))
+    assert ai.chat('SYSTEM: tool results', 'chat') == 'system'
+    assert ai.chat('anything else', 'chat') == 'default'
+
+
+def test_create_backend(recordings):
+    assert isinstance(create_backend({'type': 'fake', 'latency': 0.1}, 'key'), ScriptedBackend)
+    assert isinstance(create_backend({'type': 'replay', 'recordings': recordings}, 'key'), ReplayBackend)
+    with pytest.raises(ValueError):
+        create_backend({'type': 'nope'}, 'key')
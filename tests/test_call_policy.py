@@ -0,0 +1,176 @@
+"""Retries, rate limit, concurrency cap and deadlines of LLM calls (src.ai.call_policy)."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.ai.call_policy import CallPolicy, DeadlineExceeded, TokenBucket
+
+
+class _StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def _flaky(*errors, result='ok'):
+    """An attempt that raises the given errors in turn, then returns result."""
+    calls = []
+
+    def attempt(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+    return attempt, calls
+
+
+def test_transient_errors_are_retried():
+    policy = CallPolicy(max_retries=3, backoff_base=0.001)
+    attempt, calls = _flaky(ConnectionError('reset'), _StatusError(503))
+    assert policy.call(attempt, 'm') == 'ok' and len(calls) == 3
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    policy = CallPolicy(max_retries=1, backoff_base=0.001)
+    attempt, calls = _flaky(_StatusError(400))
+    with pytest.raises(_StatusError):
+        policy.call(attempt, 'm')
+    assert len(calls) == 1
+    attempt, calls = _flaky(_StatusError(429), _StatusError(429))
+    with pytest.raises(_StatusError):
+        policy.call(attempt, 'm')
+    assert len(calls) == 2
+
+
+def test_backoff_is_capped():
+    policy = CallPolicy(backoff_base=1.0, backoff_max=2.0)
+    assert all(0 <= policy.backoff(retry) <= 2.0 for retry in range(10))
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0 and bucket.reserve() == 0
+    assert bucket.reserve(max_wait=0.01) is None
+    assert 0.05 < bucket.reserve() <= 0.1
+
+
+def test_concurrency_is_capped():
+    policy = CallPolicy(max_concurrent=2)
+    peak = []
+
+    def attempt(timeout):
+        peak.append(policy.in_flight)
+        time.sleep(0.02)
+
+    threads = [threading.Thread(target=policy.call, args=(attempt, 'm')) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(peak) == 6 and max(peak) == 2 and policy.in_flight == 0
+
+
+def test_waiting_for_a_slot_respects_the_deadline():
+    policy = CallPolicy(max_concurrent=1, deadline=0.05)
+    with policy.slot(policy.new_deadline(), 'm'):
+        with pytest.raises(DeadlineExceeded):
+            policy.call(lambda timeout: 'ok', 'm')
+
+
+def test_retries_stop_at_the_deadline():
+    policy = CallPolicy(max_retries=100, backoff_base=0.02, backoff_max=0.02, deadline=0.1)
+    attempt, calls = _flaky(*[ConnectionError('reset')] * 100)
+    start = time.monotonic()
+    # The last error, or DeadlineExceeded if the deadline passed during the last backoff
+    with pytest.raises((ConnectionError, DeadlineExceeded)):
+        policy.call(attempt, 'm')
+    assert time.monotonic() - start < 0.5 and all(timeout <= 0.1 for timeout in calls)
+
+
+def test_async_attempt_is_cancelled_at_the_deadline():
+    policy = CallPolicy(deadline=0.05)
+
+    async def slow(timeout):
+        await asyncio.sleep(1)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(policy.call_async(slow, 'm'))
+
+
+def test_async_transient_errors_are_retried():
+    policy = CallPolicy(max_retries=2, backoff_base=0.001, max_concurrent=1)
+    attempt, calls = _flaky(asyncio.TimeoutError(), _StatusError(500))
+
+    async def call(timeout):
+        return attempt(timeout)
+
+    assert asyncio.run(policy.call_async(call, 'm')) == 'ok' and len(calls) == 3
+
+
+class _BrokenStream:
+    """A streamed response that fails after its first chunk and cannot be resolved."""
+
+    class _Chunk:
+        text = 'partial'
+        parts = ['partial']
+
+    def __iter__(self):
+        yield self._Chunk()
+        raise ConnectionError('stream dropped')
+
+    async def __aiter__(self):
+        yield self._Chunk()
+        raise ConnectionError('stream dropped')
+
+    def resolve(self):
+        raise ValueError('response is incomplete')
+
+
+class _BrokenSession:
+    def __init__(self):
+        self.sends = 0
+
+    def send_message(self, message, stream=False, **options):
+        self.sends += 1
+        return _BrokenStream()
+
+    async def send_message_async(self, message, stream=False, **options):
+        self.sends += 1
+        stream = _BrokenStream()
+
+        async def resolve():
+            _BrokenStream.resolve(stream)
+        stream.resolve = resolve
+        return stream
+
+
+@pytest.fixture
+def broken_ai(fake_ai, monkeypatch):
+    ai = fake_ai(lambda history, message: 'unused')
+    ai.call_policy = CallPolicy(max_retries=3, backoff_base=0.001)
+    session = _BrokenSession()
+    monkeypatch.setattr(ai, '_open_session', lambda chat_name=None, model=None: ('chat', session))
+    return ai, session
+
+
+def test_stream_failure_is_not_hidden_or_retried(broken_ai):
+    ai, session = broken_ai
+    chunks = []
+    with pytest.raises(Exception, match='stream dropped'):
+        for chunk in ai.chat_stream('hi'):
+            chunks.append(chunk)
+    assert chunks == ['partial'] and session.sends == 1
+
+
+def test_async_stream_failure_is_not_hidden_or_retried(broken_ai):
+    ai, session = broken_ai
+
+    async def consume():
+        return [chunk async for chunk in ai.chat_stream_async('hi')]
+
+    with pytest.raises(Exception, match='stream dropped'):
+        asyncio.run(consume())
+    assert session.sends == 1
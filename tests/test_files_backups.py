@@ -0,0 +1,107 @@
+"""Content-addressed backups, restore and garbage collection in main.files."""
+
+import json
+import os
+import time
+
+
+def _ok(result):
+    assert result['success'], result.get('error')
+    return result['result']
+
+
+def _manifest(result):
+    return json.loads(open(result['backup']['manifest']).read())
+
+
+def test_same_content_is_stored_once(files_tool, tmp_path):
+    a, b = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    for path in (a, b):
+        path.write_text('same content')
+    first = _manifest(_ok(files_tool.execute({'write': str(a), 'content': 'new'})))
+    second = _manifest(_ok(files_tool.execute({'write': str(b), 'content': 'new'})))
+    assert first['files'][0]['hash'] == second['files'][0]['hash']
+    assert first['stored_bytes'] == len('same content') and second['stored_bytes'] == 0
+
+
+def test_deleted_directory_is_restored(files_tool, tmp_path):
+    folder = tmp_path / 'project'
+    (folder / 'src').mkdir(parents=True)
+    (folder / 'src' / 'main.py').write_text('print(1)\n')
+    (folder / 'empty').mkdir()
+    deleted = _ok(files_tool.execute({'delete': str(folder)}))
+    assert not folder.exists()
+
+    restored = _ok(files_tool.execute({'restore': deleted['backup']['backup_id']}))
+    assert restored['files'] == 1
+    assert (folder / 'src' / 'main.py').read_text() == 'print(1)\n' and (folder / 'empty').is_dir()
+
+
+def test_restore_backs_up_what_it_replaces(files_tool, tmp_path):
+    path = tmp_path / 'notes.txt'
+    path.write_text('v1')
+    backup_id = _ok(files_tool.execute({'write': str(path), 'content': 'v2'}))['backup']['backup_id']
+    restored = _ok(files_tool.execute({'restore': backup_id}))
+    assert path.read_text() == 'v1'
+    # The restore itself can be undone
+    _ok(files_tool.execute({'restore': restored['backup']['backup_id']}))
+    assert path.read_text() == 'v2'
+
+    copy = tmp_path / 'copy.txt'
+    _ok(files_tool.execute({'restore': backup_id, 'to': str(copy)}))
+    assert copy.read_text() == 'v1'
+
+
+def test_unknown_backup(files_tool):
+    assert not files_tool.execute({'restore': 'nope'})['success']
+    assert not files_tool.execute({'restore': '../../etc/passwd'})['success']
+
+
+def test_backups_are_listed_newest_first(files_tool, tmp_path):
+    path = tmp_path / 'file.txt'
+    path.write_text('0')
+    ids = [_ok(files_tool.execute({'write': str(path), 'content': str(i)}))['backup']['backup_id']
+           for i in range(1, 4)]
+    assert [backup['backup_id'] for backup in _ok(files_tool.execute({'backups': True}))] == ids[::-1]
+
+
+def test_gc_removes_old_backups_and_their_objects(files_tool, tmp_path, monkeypatch):
+    monkeypatch.setitem(files_tool.execute.__globals__, 'BACKUP_KEEP_MIN', 1)
+    path = tmp_path / 'file.txt'
+    path.write_text('old content')
+    old = _ok(files_tool.execute({'write': str(path), 'content': 'newer content'}))['backup']['backup_id']
+    newest = _ok(files_tool.execute({'write': str(path), 'content': 'newest'}))['backup']['backup_id']
+
+    # Nothing is old enough yet
+    assert files_tool.collect_garbage()['backups_removed'] == 0
+    result = files_tool.collect_garbage(now=time.time() + files_tool.BACKUP_RETENTION_DAYS * 86400 + 7200)
+    assert result == {'backups_removed': 1, 'objects_removed': 1, 'bytes_freed': len('old content')}
+    assert [backup['backup_id'] for backup in files_tool.list_backups()] == [newest]
+    assert not files_tool.execute({'restore': old})['success']
+    _ok(files_tool.execute({'restore': newest}))
+    assert path.read_text() == 'newer content'
+
+
+def test_hard_linked_backup_leaves_the_file_untouched(files_tool, tmp_path):
+    path = tmp_path / 'old.txt'
+    path.write_text('kept by link')
+    os.utime(path, (1_000_000, 1_000_000))
+    for _ in range(2):
+        digest, _ = files_tool.store_blob(path, link=True)
+        assert path.stat().st_mtime == 1_000_000
+    obj = files_tool._object_path(digest)
+    if os.path.samefile(obj, path):
+        # The object is old by its mtime, but the backup in progress keeps it
+        assert files_tool.collect_garbage()['objects_removed'] == 0
+    result = files_tool.collect_garbage(now=time.time() + files_tool.GC_GRACE + 60)
+    assert result['objects_removed'] == 1 and not obj.exists()
+    assert not list(obj.parent.iterdir())
+
+
+def test_creating_an_existing_directory_takes_no_backup(files_tool, tmp_path):
+    folder = tmp_path / 'project'
+    folder.mkdir()
+    (folder / 'big.bin').write_bytes(b'x' * 1000)
+    result = _ok(files_tool.execute({'create': str(folder), 'type': 'dir'}))
+    assert 'backup' not in result and files_tool.list_backups() == []
+    assert 'backup' in _ok(files_tool.execute({'create': str(folder / 'big.bin')}))
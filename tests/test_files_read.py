@@ -0,0 +1,52 @@
+"""Bounded reads in main.files (whole file, line ranges and tail)."""
+
+import pytest
+
+
+@pytest.fixture
+def numbered(tmp_path):
+    path = tmp_path / 'numbered.txt'
+    path.write_text(''.join(f"line {i}\n" for i in range(1, 1001)))
+    return path
+
+
+def _read(files_tool, **params):
+    result = files_tool.execute({'read': str(params.pop('path')), **params})
+    assert result['success'], result.get('error')
+    return result['result']
+
+
+@pytest.mark.parametrize('block', [16, 64 * 1024])
+def test_line_ranges(files_tool, numbered, monkeypatch, block):
+    monkeypatch.setitem(files_tool.execute.__globals__, 'LINE_INDEX_BLOCK', block)
+    assert _read(files_tool, path=numbered, lines='1-2') == 'line 1\nline 2'
+    assert _read(files_tool, path=numbered, lines='500-502') == 'line 500\nline 501\nline 502'
+    assert _read(files_tool, path=numbered, lines='999-1200') == 'line 999\nline 1000'
+    assert _read(files_tool, path=numbered, lines='1500-1501') == ''
+
+
+def test_invalid_line_range(files_tool, numbered):
+    assert not files_tool.execute({'read': str(numbered), 'lines': '5-2'})['success']
+    assert not files_tool.execute({'read': str(numbered), 'lines': 'x'})['success']
+
+
+def test_tail(files_tool, numbered, monkeypatch):
+    monkeypatch.setitem(files_tool.execute.__globals__, 'LINE_INDEX_BLOCK', 16)
+    assert _read(files_tool, path=numbered, tail=3) == 'line 998\nline 999\nline 1000'
+    assert _read(files_tool, path=numbered, tail=5000).splitlines()[0] == 'line 1'
+
+
+def test_reads_stop_at_the_size_limit(files_tool, numbered, monkeypatch):
+    monkeypatch.setitem(files_tool.execute.__globals__, 'MAX_FILE_READ', 100)
+    whole = _read(files_tool, path=numbered)
+    assert whole.startswith('line 1\n') and 'truncated at 100 of' in whole
+    lines = _read(files_tool, path=numbered, lines='1-1000')
+    assert 'truncated at 100 bytes after line' in lines and len(lines) < 300
+    tail = _read(files_tool, path=numbered, tail=1000)
+    assert tail.startswith('[truncated to the last 100 bytes') and tail.endswith('line 1000')
+
+
+def test_line_index_follows_file_changes(files_tool, numbered):
+    assert _read(files_tool, path=numbered, lines='2-2') == 'line 2'
+    numbered.write_text('first\nsecond changed\n')
+    assert _read(files_tool, path=numbered, lines='2-2') == 'second changed'
@@ -0,0 +1,111 @@
+"""Search and paginated listing in main.files."""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / 'project'
+    for rel, text in {
+        'src/app.py': 'def main():\n    return 1\n',
+        'src/util/helpers.py': 'import os\ndef helper():\n    pass\n',
+        'src/util/deep/inner.py': 'def inner():\n    pass\n',
+        'build/out.py': 'def main():\n    pass\n',
+        'node_modules/pkg/index.py': 'def main():\n    pass\n',
+        'notes.log': 'def main() in a log\n',
+        'README.md': 'readme\n',
+    }.items():
+        path = root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    (root / 'data.bin').write_bytes(b'def main\0binary')
+    return root
+
+
+def _search(files_tool, root, **params):
+    result = files_tool.execute({'search': str(root), **params})
+    assert result['success'], result.get('error')
+    return result['result']
+
+
+def _rel(root, matches):
+    return sorted(os.path.relpath(m if isinstance(m, str) else m['path'], root).replace(os.sep, '/')
+                  for m in matches)
+
+
+def test_name_search_skips_default_and_given_excludes(files_tool, tree):
+    result = _search(files_tool, tree, pattern=r'\.py$')
+    assert result['complete']
+    assert _rel(tree, result['matches']) == ['build/out.py', 'src/app.py', 'src/util/deep/inner.py',
+                                             'src/util/helpers.py']
+    result = _search(files_tool, tree, pattern=r'\.py$', exclude='build/,deep/')
+    assert _rel(tree, result['matches']) == ['src/app.py', 'src/util/helpers.py']
+
+
+def test_max_depth(files_tool, tree):
+    result = _search(files_tool, tree, pattern=r'\.py$', max_depth=2)
+    assert _rel(tree, result['matches']) == ['build/out.py', 'src/app.py']
+
+
+def test_grep_reports_lines_and_skips_binary_files(files_tool, tree):
+    result = _search(files_tool, tree, grep=r'def (main|helper)', pattern=r'\.(py|bin)$', exclude='build/')
+    assert [(m['line'], m['text']) for m in result['matches']] == [(1, 'def main():'), (2, 'def helper():')]
+
+
+def test_search_stops_at_max_results(files_tool, tree):
+    result = _search(files_tool, tree, pattern=r'\.py$', max_results=2)
+    assert len(result['matches']) == 2 and not result['complete']
+    assert result['note'] == 'Stopped at 2 results'
+
+
+def test_ignore_rules(files_tool):
+    rules = files_tool.IgnoreRules(['*.log', '!keep.log', 'docs/**/draft?.md', 'tmp/'])
+    assert rules.excluded('a/b.log', False)
+    assert not rules.excluded('keep.log', False)
+    assert rules.excluded('docs/x/y/draft1.md', False)
+    assert not rules.excluded('docs/draft12.md', False)
+    assert rules.excluded('a/tmp', True) and not rules.excluded('a/tmp', False)
+
+
+def test_list_pages_with_a_cursor(files_tool, tmp_path):
+    for i in range(5):
+        (tmp_path / f"file{i}.txt").write_text('x' * i)
+    seen = []
+    cursor = None
+    while True:
+        params = {'list': str(tmp_path), 'page_size': 2}
+        if cursor:
+            params['cursor'] = cursor
+        page = files_tool.execute(params)['result']
+        seen.extend(page['entries'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == sorted(os.listdir(tmp_path))
+    details = files_tool.execute({'list': str(tmp_path), 'details': True, 'page_size': 1})['result']
+    assert details['entries'][0]['type'] in ('file', 'dir') and 'mtime' in details['entries'][0]
+
+
+def test_list_pages_of_a_large_directory(files_tool, tmp_path):
+    folder = tmp_path / 'large'
+    folder.mkdir()
+    names = [f"{prefix}{i}" for prefix in ('b', 'a', 'C', '_') for i in range(30)]
+    for name in names:
+        (folder / name).write_text('')
+    seen, cursor = [], None
+    while True:
+        params = {'list': str(folder), 'page_size': 7, **({'cursor': cursor} if cursor else {})}
+        page = files_tool.execute(params)['result']
+        assert len(page['entries']) <= 7
+        seen.extend(page['entries'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert seen == sorted(names)
+
+
+def test_walk_reports_the_time_budget(files_tool, tree):
+    stats = files_tool.walk(tree, lambda entry, rel, is_dir: False, time_budget=0)
+    assert stats['stopped'] == 'time_budget'
@@ -0,0 +1,69 @@
+"""Atomic writes, append and all-or-nothing ops batches in main.files."""
+
+import os
+import stat
+
+
+def _ok(result):
+    assert result['success'], result.get('error')
+    return result['result']
+
+
+def test_write_replaces_atomically_and_keeps_permissions(files_tool, tmp_path):
+    path = tmp_path / 'script.sh'
+    path.write_text('old')
+    os.chmod(path, 0o750)
+    _ok(files_tool.execute({'write': str(path), 'content': 'new'}))
+    assert path.read_text() == 'new'
+    assert stat.S_IMODE(path.stat().st_mode) == 0o750
+    assert [p.name for p in tmp_path.iterdir() if p.name.endswith('.tmp')] == []
+
+
+def test_append_adds_to_the_file(files_tool, tmp_path):
+    path = tmp_path / 'new' / 'parts.txt'
+    for part in ('a', 'b', 'c'):
+        _ok(files_tool.execute({'write': str(path), 'content': part, 'append': True}))
+    assert path.read_text() == 'abc'
+
+
+def test_failed_operation_rolls_back_the_others(files_tool, tmp_path):
+    existing = tmp_path / 'existing.txt'
+    existing.write_text('original')
+    log = tmp_path / 'log.txt'
+    log.write_text('line 1\n')
+    new_dir = tmp_path / 'app'
+    result = files_tool.execute({'ops': [
+        {'op': 'create', 'path': str(new_dir / 'src'), 'type': 'dir'},
+        {'op': 'write', 'path': str(new_dir / 'src' / 'main.py'), 'content': 'print(1)'},
+        {'op': 'write', 'path': str(existing), 'content': 'changed'},
+        {'op': 'append', 'path': str(log), 'content': 'line 2\n'},
+        {'op': 'delete', 'path': str(tmp_path / 'missing.txt')},
+    ]})
+    assert not result['success']
+    assert 'Operation 5' in result['error'] and 'rolled back 4' in result['error']
+    assert not new_dir.exists()
+    assert existing.read_text() == 'original'
+    assert log.read_text() == 'line 1\n'
+
+
+def test_ops_apply_together(files_tool, tmp_path):
+    doomed = tmp_path / 'doomed.txt'
+    doomed.write_text('bye')
+    result = _ok(files_tool.execute({'ops': [
+        {'op': 'create', 'path': str(tmp_path / 'pkg'), 'type': 'dir'},
+        {'op': 'write', 'path': str(tmp_path / 'pkg' / '__init__.py'), 'content': ''},
+        {'op': 'delete', 'path': str(doomed)},
+    ]}))
+    assert len(result['operations']) == 3
+    assert (tmp_path / 'pkg' / '__init__.py').exists() and not doomed.exists()
+
+
+def test_ops_are_checked_before_anything_is_applied(files_tool, tmp_path):
+    target = tmp_path / 'never.txt'
+    result = files_tool.execute({'ops': [
+        {'op': 'write', 'path': str(target), 'content': 'x'},
+        {'op': 'write', 'path': str(target)},
+    ]})
+    assert not result['success'] and 'Operation 2' in result['error']
+    assert not target.exists()
+    assert not files_tool.execute({'ops': []})['success']
@@ -0,0 +1,98 @@
+"""Chat history compaction (HistoryPolicy)."""
+
+import asyncio
+import threading
+
+from src.ai.history import DIGEST_PREFIX, ELIDED_MARK, TOOL_RESULT_PREFIX, HistoryPolicy
+
+
+def _history(turns, reply='ok'):
+    history = []
+    for text in turns:
+        history.append({'role': 'user', 'parts': [text]})
+        history.append({'role': 'model', 'parts': [reply]})
+    return history
+
+
+def _texts(history):
+    return [entry['parts'][0] for entry in history]
+
+
+def test_history_within_budget_is_unchanged():
+    history = _history(['a', 'b'])
+    compacted, report = HistoryPolicy().compact(history)
+    assert compacted == history and not report.changed
+
+
+def test_window_drops_old_turns_into_a_digest():
+    compacted, report = HistoryPolicy(max_tokens=None, max_turns=2).compact(_history(['one', 'two', 'three']))
+    assert report.turns_dropped == 1 and report.summarized
+    assert compacted[0]['parts'][0] == f"{DIGEST_PREFIX}\nuser: one\nmodel: ok"
+    assert _texts(compacted)[2:] == ['two', 'ok', 'three', 'ok']
+
+
+def test_token_budget_keeps_recent_turns():
+    policy = HistoryPolicy(max_tokens=30, keep_recent=2, summarize=False)
+    compacted, report = policy.compact(_history(['x' * 100 for _ in range(5)]))
+    # Over budget, but the last two turns are never dropped
+    assert report.turns_dropped == 3 and len(compacted) == 4
+    assert report.tokens_saved > 0
+
+
+def test_long_tool_results_are_elided_once():
+    result = f"{TOOL_RESULT_PREFIX}\n" + 'r' * 500
+    policy = HistoryPolicy(max_tool_result_chars=100)
+    compacted, report = policy.compact(_history([result]))
+    assert report.results_elided == 1
+    assert compacted[0]['parts'][0].startswith(result[:100]) and compacted[0]['parts'][0].endswith(ELIDED_MARK)
+    again, report = policy.compact(compacted)
+    assert again == compacted and report.results_elided == 0
+
+
+def test_digest_is_carried_forward():
+    policy = HistoryPolicy(max_tokens=None, max_turns=1)
+    compacted, _ = policy.compact(_history(['first', 'second']))
+    compacted, _ = policy.compact(compacted + _history(['third']))
+    assert compacted[0]['parts'][0].splitlines()[1:] == ['user: first', 'model: ok', 'user: second', 'model: ok']
+    assert _texts(compacted)[2:] == ['third', 'ok']
+
+
+def test_model_summarizer_and_fallback():
+    policy = HistoryPolicy(max_tokens=None, max_turns=1, summarizer=lambda text: 'SUMMARY')
+    compacted, _ = policy.compact(_history(['a', 'b']))
+    assert compacted[0]['parts'][0] == f"{DIGEST_PREFIX}\nSUMMARY"
+
+    def broken(text):
+        raise RuntimeError('model down')
+    compacted, _ = HistoryPolicy(max_tokens=None, max_turns=1, summarizer=broken).compact(_history(['a', 'b']))
+    assert compacted[0]['parts'][0] == f"{DIGEST_PREFIX}\nuser: a\nmodel: ok"
+
+
+def test_client_compacts_before_each_message(fake_ai):
+    ai = fake_ai(lambda history, message: str(len(history)))
+    ai.set_history_policy(HistoryPolicy(max_tokens=None, max_turns=2, summarize=False))
+    replies = [ai.chat(f"message {i}", 'chat') for i in range(4)]
+    assert replies == ['0', '2', '4', '4']
+    assert ai.tokens_saved > 0
+
+
+def test_async_client_summarizes_off_the_event_loop(fake_ai):
+    threads = []
+
+    def summarize(history, message):
+        threads.append(threading.current_thread())
+        return 'SUMMARY'
+
+    ai = fake_ai(lambda history, message: 'ok')
+    ai.set_history_policy(HistoryPolicy.from_config({'max_tokens': None, 'max_turns': 1, 'summarizer': 'model'},
+                                                    summarizer_ai=fake_ai(summarize)))
+
+    async def talk():
+        await ai.chat_async('first', 'chat')
+        await ai.chat_async('second', 'chat')
+        chunks = [chunk async for chunk in ai.chat_stream_async('third', 'chat')]
+        return chunks, threading.current_thread()
+
+    chunks, loop_thread = asyncio.run(talk())
+    assert chunks == ['ok'] and threads and loop_thread not in threads
+    assert ai.get_chat_history('chat')[0]['parts'][0] == f"{DIGEST_PREFIX}\nSUMMARY"
@@ -0,0 +1,68 @@
+"""Parsing tool commands while the response streams (IncrementalToolParser, StreamingBatch)."""
+
+import time
+
+import pytest
+
+from src.tool_loader import ToolLoader
+from src.tool_parser import IncrementalToolParser, ToolParser, ToolSystem
+
+from conftest import write_tool
+
+RESPONSE = (
+    'Sure. {tool main.speak text="hi {there}"} then '
+    '{tool main.files write="/tmp/a.py" content="""def f():\n    return {"a": 1}\n"""} and '
+    "{tool main.speak text='it\\'s'} {toolbox} {tool main.stop} trailing {tool main.speak text=\"open"
+)
+
+
+def _fields(commands):
+    return [(c.name, c.args, c.raw_command, c.start, c.end) for c in commands]
+
+
+def _feed(text, size):
+    parser = IncrementalToolParser()
+    found = []
+    for i in range(0, len(text), size):
+        found.extend(parser.feed(text[i:i + size]))
+    return found + parser.close()
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 16, len(RESPONSE)])
+def test_chunked_parse_matches_full_parse(size):
+    assert _fields(_feed(RESPONSE, size)) == _fields(ToolParser().parse_commands(RESPONSE))
+
+
+def test_commands_are_returned_when_their_brace_arrives():
+    parser = IncrementalToolParser()
+    assert parser.feed('Hello {tool main.speak text="a}') == []
+    found = parser.feed('b"} and then {tool main.st')
+    assert [(c.name, c.args) for c in found] == [('main.speak', 'text="a}b"')]
+    assert [c.name for c in parser.feed('op}')] == ['main.stop']
+    assert parser.close() == []
+
+
+def test_unbalanced_command_completes_on_close():
+    parser = IncrementalToolParser()
+    assert parser.feed('{tool main.speak text="never closed} more') == []
+    assert [(c.name, c.args) for c in parser.close()] == [('main.speak', 'text="never closed')]
+
+
+def test_streaming_batch_starts_commands_before_finish(tools_dir):
+    write_tool(tools_dir, 'test.slow', {}, (
+        "import time\n"
+        "def execute(args):\n"
+        "    time.sleep(0.3)\n"
+        "    return {'success': True, 'result': 'done'}\n"
+    ))
+    system = ToolSystem(loader=ToolLoader(str(tools_dir)), max_workers=4)
+    batch = system.start_batch()
+    parser = system.incremental_parser()
+    for command in parser.feed('{tool test.slow} {tool test.slow} '):
+        batch.add(command)
+    # The rest of the response takes a while to arrive; the commands run meanwhile
+    time.sleep(0.35)
+    start = time.perf_counter()
+    results = batch.finish()
+    assert time.perf_counter() - start < 0.15
+    assert [result['result'] for result in results] == ['done', 'done']
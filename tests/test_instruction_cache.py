@@ -0,0 +1,43 @@
+"""Instructions and models cached per allowed tool set (InstructionCache)."""
+
+from src.tool_info import ToolInfoGenerator
+from src.tool_loader import ToolLoader
+from src.instruction_cache import InstructionCache
+
+from conftest import write_tool
+
+BASE = "You are Zen.\n## Tool System\nplaceholder\n## Rules\nBe brief."
+
+
+def _cache(fake_ai, tools_dir, **kwargs):
+    loader = ToolLoader(str(tools_dir))
+    return InstructionCache(fake_ai(), ToolInfoGenerator(loader=loader), BASE, **kwargs), loader
+
+
+def test_same_tool_set_is_built_once(fake_ai, tools_dir):
+    cache, _ = _cache(fake_ai, tools_dir)
+    instructions, model = cache.get(['test.alpha'])
+    again = cache.get({'test.alpha'})
+    assert again[1] is model
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert 'test.alpha' in instructions and 'test.beta' not in instructions
+    assert instructions.endswith("## Rules\nBe brief.")
+
+
+def test_tool_sets_are_cached_separately(fake_ai, tools_dir):
+    cache, _ = _cache(fake_ai, tools_dir, max_entries=1)
+    alpha = cache.get_model(['test.alpha'])
+    beta = cache.get_model(['test.beta'])
+    assert alpha is not beta
+    # max_entries=1: alpha was evicted and is built again
+    assert cache.get_model(['test.alpha']) is not alpha
+    assert cache.misses == 3
+
+
+def test_reloaded_tools_invalidate_the_cache(fake_ai, tools_dir):
+    cache, loader = _cache(fake_ai, tools_dir)
+    before, _ = cache.get(['test.alpha'])
+    write_tool(tools_dir, 'test.alpha', {'description': 'changed description'})
+    loader.load_tools()
+    after, _ = cache.get(['test.alpha'])
+    assert 'changed description' in after and 'changed description' not in before
@@ -0,0 +1,38 @@
+"""The load-testing harness (benchmarks/load_test.py)."""
+
+import sys
+import json
+import subprocess
+
+from conftest import ROOT
+
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+import load_test  # noqa: E402
+
+
+def test_percentile_interpolates():
+    assert load_test.percentile([], 50) is None
+    assert load_test.percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert load_test.percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
+
+
+def test_script_runs_the_requested_turns():
+    rules = load_test.make_script(2)
+    assert [rule['reply'] for rule in rules] == [
+        '{tool main.stop reason="done"}', '{tool main.speak text="turn 2"}', '{tool main.speak text="turn 1"}']
+
+
+def test_small_run_writes_results(tmp_path):
+    output = tmp_path / 'result.json'
+    subprocess.run(
+        [sys.executable, str(ROOT / 'benchmarks' / 'load_test.py'), '--users', '2', '--requests', '2',
+         '--turns', '2', '--latency', '0', '--chunk-latency', '0', '--output', str(output)],
+        check=True, capture_output=True, timeout=120
+    )
+    results = json.loads(output.read_text())
+    for endpoint in ('chat', 'stream'):
+        result = results['endpoints'][endpoint]
+        assert (result['requests'], result['errors']) == (4, 0)
+        # Two main.speak rounds, then main.stop
+        assert result['tool_calls_per_request'] == 3
+    assert results['endpoints']['stream']['ttfe_ms']['p50'] is not None
@@ -0,0 +1,87 @@
+"""The main.memory tool."""
+
+import time
+import sqlite3
+import threading
+
+
+def _ok(result):
+    assert result['success'], result.get('error')
+    return result['result']
+
+
+def test_write_read_search_delete(memory_tool):
+    run = memory_tool.execute
+    memory_id = _ok(run({'write': 'User prefers short answers', 'type': 'long'}))['id']
+    _ok(run({'write': 'Working on the parser'}))
+    assert _ok(run({'read': memory_id}))['content'] == 'User prefers short answers'
+    assert [entry['id'] for entry in _ok(run({'search': 'answer'}))['entries']] == [memory_id]
+    listed = _ok(run({'list': True, 'page_size': 1}))
+    assert len(listed['entries']) == 1 and listed['has_more']
+    _ok(run({'delete': memory_id}))
+    assert not run({'read': memory_id})['success']
+
+
+def test_expired_memories_move_to_the_calendar(memory_tool):
+    run = memory_tool.execute
+    _ok(run({'write': 'Standup moved to 10:00', 'ttl_hours': 0.001}))
+    conn = memory_tool.connect()
+    assert memory_tool.expire(conn, now=time.time() + 10) == 1
+    assert memory_tool.expire(conn, now=time.time() + 10) == 0
+    day = time.strftime('%Y-%m-%d')
+    assert 'Standup moved to 10:00' in _ok(run({'date': day}))['content']
+    assert _ok(run({'list': True, 'type': 'short'}))['entries'] == []
+
+
+def test_concurrent_expiry_moves_each_memory_once(memory_tool):
+    for i in range(20):
+        _ok(memory_tool.execute({'write': f"note {i}", 'ttl_hours': 0.001}))
+    later = time.time() + 10
+    barrier = threading.Barrier(8)
+
+    def expire():
+        # Each thread has its own connection, like concurrent tool calls
+        conn = memory_tool.connect()
+        barrier.wait()
+        memory_tool.expire(conn, now=later)
+
+    threads = [threading.Thread(target=expire) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    lines = _ok(memory_tool.execute({'date': time.strftime('%Y-%m-%d')}))['content'].splitlines()
+    assert sorted(line.split(' ', 2)[2] for line in lines) == sorted(f"note {i}" for i in range(20))
+
+
+def test_recall_finds_similar_wording(memory_tool):
+    run = memory_tool.execute
+    _ok(run({'write': 'The tool parser handles Windows paths', 'type': 'long'}))
+    _ok(run({'write': 'Dinner with Sam on Friday', 'type': 'long'}))
+    entries = _ok(run({'recall': 'parsing a path', 'top_k': 1}))['entries']
+    assert entries[0]['preview'] == 'The tool parser handles Windows paths'
+
+
+def test_recall_embeds_pending_memories(memory_tool, monkeypatch):
+    numpy = memory_tool.np
+    module = memory_tool.execute.__globals__
+    monkeypatch.setitem(module, 'np', None)
+    _ok(memory_tool.execute({'write': 'Written while NumPy was missing', 'type': 'long'}))
+    monkeypatch.setitem(module, 'np', numpy)
+    conn = memory_tool.connect()
+    assert conn.execute("SELECT count(*) FROM memories WHERE vec_row IS NULL").fetchone()[0] == 1
+    entries = _ok(memory_tool.execute({'recall': 'missing numpy'}))['entries']
+    assert [entry['preview'] for entry in entries] == ['Written while NumPy was missing']
+    assert memory_tool.index_pending(conn) == 0
+
+
+def test_recall_does_not_wait_for_writers(memory_tool, tmp_path):
+    _ok(memory_tool.execute({'write': 'Indexed right away', 'type': 'long'}))
+    writer = sqlite3.connect(tmp_path / 'memory.db')
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        # Nothing to embed, so recall only reads and never needs the write lock
+        reader = sqlite3.connect(tmp_path / 'memory.db', timeout=0.1)
+        assert [row[0][2] for row in memory_tool.recall(reader, 'indexed')] == ['Indexed right away']
+    finally:
+        writer.rollback()
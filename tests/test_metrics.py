@@ -0,0 +1,83 @@
+"""Prometheus metrics and OpenTelemetry-style tracing (src.metrics)."""
+
+import json
+
+import pytest
+
+from src.metrics import NOOP_SPAN, MetricsRegistry, Tracer
+
+
+def test_counter_and_histogram_render():
+    registry = MetricsRegistry()
+    calls = registry.counter('calls_total', 'Calls', ['tool'])
+    calls.inc(tool='a')
+    calls.inc(2, tool='b "quoted"')
+    assert registry.counter('calls_total', 'Calls', ['tool']) is calls
+    seconds = registry.histogram('seconds', 'Durations', buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        seconds.observe(value)
+    registry.gauge('open', 'Open things', lambda: 3)
+
+    lines = registry.render().splitlines()
+    assert '# TYPE calls_total counter' in lines
+    assert 'calls_total{tool="a"} 1' in lines
+    assert 'calls_total{tool="b \\"quoted\\""} 2' in lines
+    assert [line for line in lines if line.startswith('seconds')] == [
+        'seconds_bucket{le="0.1"} 1', 'seconds_bucket{le="1"} 2', 'seconds_bucket{le="+Inf"} 3',
+        'seconds_sum 5.55', 'seconds_count 3']
+    assert 'open 3' in lines
+
+
+@pytest.fixture
+def tracer(tmp_path):
+    tracer = Tracer()
+    tracer.configure({'enabled': True, 'path': str(tmp_path / 'traces.jsonl'), 'keep': 10})
+    return tracer
+
+
+def _spans(document):
+    return document['resourceSpans'][0]['scopeSpans'][0]['spans']
+
+
+def test_nested_spans_form_one_trace(tracer):
+    with tracer.span('request', endpoint='/api/chat') as root:
+        with tracer.span('llm', model='m'):
+            pass
+        with pytest.raises(ValueError):
+            with tracer.span('tool', tool='main.files'):
+                raise ValueError('boom')
+
+    [document] = tracer.recent
+    spans = {span['name']: span for span in _spans(document)}
+    assert set(spans) == {'request', 'llm', 'tool'}
+    assert {span['traceId'] for span in spans.values()} == {root.trace_id}
+    assert spans['llm']['parentSpanId'] == spans['tool']['parentSpanId'] == root.span_id
+    assert spans['tool']['status'] == {'code': 2, 'message': 'boom'}
+    assert {'key': 'endpoint', 'value': {'stringValue': '/api/chat'}} in spans['request']['attributes']
+    with open(tracer.path) as file:
+        assert [json.loads(line) for line in file] == [document]
+
+
+def test_span_ending_after_its_root_is_exported_alone(tracer):
+    with tracer.span('request'):
+        late = tracer.start_span('tool')
+    late.end()
+    assert [[span['name'] for span in _spans(document)] for document in tracer.recent] == [['request'], ['tool']]
+
+
+def test_disabled_tracer_records_nothing():
+    tracer = Tracer()
+    with tracer.span('request') as span:
+        assert span is NOOP_SPAN
+    assert tracer.recent_traces() == {'resourceSpans': []}
+
+
+def test_metrics_endpoint_counts_tool_calls(server_module, script):
+    script(lambda history, message: '{tool main.stop}' if message.startswith('SYSTEM')
+           else '{tool main.speak text="counted"}')
+    client = server_module.app.test_client()
+    assert client.post('/api/chat', json={'message': 'hi'}).status_code == 200
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'zen_tool_calls_total{tool="main.speak",outcome="ok"}' in body
+    assert 'zen_http_requests_total{endpoint="/api/chat",method="POST",status="200"}' in body
+    assert 'zen_sessions ' in body
@@ -0,0 +1,80 @@
+"""Sampled request profiling (src.profiling)."""
+
+import asyncio
+import pstats
+import tracemalloc
+
+import pytest
+
+from src.profiling import RequestProfiler
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    return RequestProfiler(directory=str(tmp_path / 'profiles'), enabled=True, keep=2)
+
+
+def _work(n):
+    for i in range(n):
+        yield sum(range(1000)) + i
+
+
+def test_should_profile():
+    profiler = RequestProfiler(enabled=True)
+    assert profiler.should_profile({'X-Zen-Profile': 'yes'})
+    assert not profiler.should_profile({'X-Zen-Profile': '0'})
+    assert not RequestProfiler(enabled=False, sample_rate=1.0).should_profile({'X-Zen-Profile': '1'})
+    assert RequestProfiler(enabled=True, sample_rate=1.0).should_profile({})
+    assert not RequestProfiler(enabled=True, header=None).should_profile({'X-Zen-Profile': '1'})
+
+
+def test_profile_writes_stats_and_a_record(profiler):
+    assert list(profiler.profile(_work(3), 'chat')) == [sum(range(1000)) + i for i in range(3)]
+    assert not tracemalloc.is_tracing()
+
+    [record] = profiler.list_profiles()
+    assert record['endpoint'] == 'chat' and record['error'] is None
+    assert record['hottest'] and record['peak_memory_kib'] >= 0
+    pstats_file, allocations_file = (profiler.directory / name for name in record['files'])
+    assert any(func == '_work' for _, _, func in pstats.Stats(str(pstats_file)).stats)
+    assert allocations_file.read_text().startswith('Peak traced memory:')
+
+
+def test_failed_request_is_recorded(profiler):
+    def failing():
+        yield 1
+        raise RuntimeError('tool crashed')
+
+    with pytest.raises(RuntimeError):
+        list(profiler.profile(failing(), 'stream'))
+    assert profiler.list_profiles()[0]['error'] == 'tool crashed'
+
+
+def test_one_request_is_profiled_at_a_time(profiler):
+    outer = profiler.profile(_work(2), 'chat')
+    next(outer)
+    # The nested request runs unprofiled
+    assert len(list(profiler.profile(_work(2), 'chat'))) == 2
+    assert profiler.list_profiles() == []
+    list(outer)
+    assert len(profiler.list_profiles()) == 1
+
+
+def test_old_profiles_are_rotated(profiler):
+    for _ in range(4):
+        list(profiler.profile(_work(1), 'chat'))
+    assert len(profiler.list_profiles()) == 2
+    assert len(list(profiler.directory.iterdir())) == 2 * 3
+
+
+def test_profile_async(profiler):
+    async def events():
+        for i in range(3):
+            await asyncio.sleep(0)
+            yield i
+
+    async def consume():
+        return [event async for event in profiler.profile_async(events(), 'chat')]
+
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert profiler.list_profiles()[0]['endpoint'] == 'chat'
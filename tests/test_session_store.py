@@ -0,0 +1,83 @@
+"""Persistent chat sessions (SessionStore and SessionManager with a store)."""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.session_manager import SessionManager
+from src.session_store import SessionStore
+
+
+def _history(*texts):
+    return [{'role': 'user' if i % 2 == 0 else 'model', 'parts': [text]} for i, text in enumerate(texts)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / 'sessions.db'))
+
+
+def test_save_and_load(store):
+    store.save('s', _history('hi', 'hello'))
+    store.save('s', _history('hi', 'hello', 'again', 'sure'))
+    assert store.load('s') == _history('hi', 'hello', 'again', 'sure')
+    assert store.version('s') == 2
+    assert store.load('unknown') == []
+
+
+def test_rewritten_history_replaces_the_stored_one(store):
+    store.save('s', _history('a', 'b', 'c', 'd'))
+    store.save('s', _history('summary', 'ok', 'c', 'd'))
+    assert store.load('s') == _history('summary', 'ok', 'c', 'd')
+
+
+def test_unchanged_history_is_not_written(store):
+    store.save('s', _history('a', 'b'))
+    store.save('s', _history('a', 'b'))
+    assert store.version('s') == 1
+
+
+def test_writes_from_another_process_are_detected(tmp_path, store):
+    store.save('s', _history('a', 'b'))
+    other = SessionStore(str(tmp_path / 'sessions.db'))
+    other.load('s')
+    other.save('s', _history('a', 'b', 'c', 'd'))
+    assert not store.is_current('s')
+    assert store.load('s') == _history('a', 'b', 'c', 'd') and store.is_current('s')
+
+
+def test_evicted_session_is_rehydrated(fake_ai, store):
+    ai = fake_ai(lambda history, message: f"{len(history)} before")
+    sessions = SessionManager(ai, max_sessions=1, store=store)
+    with sessions.session('alice') as chat:
+        ai.chat('hello', chat)
+    with sessions.session('bob'):
+        pass
+    assert 'alice' not in ai.chat_sessions
+    with sessions.session('alice') as chat:
+        assert ai.chat('again', chat) == '2 before'
+    sessions.remove('alice')
+    assert store.load('alice') == []
+
+
+def test_async_sessions_do_store_io_off_the_event_loop(fake_ai, store, monkeypatch):
+    ai = fake_ai(lambda history, message: 'ok')
+    sessions = SessionManager(ai, store=store)
+    threads = []
+    for name in ('load', 'save'):
+        original = getattr(store, name)
+
+        def record(*args, original=original):
+            threads.append(threading.current_thread())
+            return original(*args)
+        monkeypatch.setattr(store, name, record)
+
+    async def talk():
+        async with sessions.session_async('s') as chat:
+            await ai.chat_async('hi', chat)
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(talk())
+    assert len(threads) == 2 and loop_thread not in threads
+    assert [entry['parts'][0] for entry in store.load('s')] == ['hi', 'ok']
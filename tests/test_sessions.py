@@ -0,0 +1,74 @@
+"""Per-client chat sessions (SessionManager and the server endpoints)."""
+
+import threading
+
+from src.session_manager import SessionManager
+
+
+def test_clients_get_separate_histories(fake_ai):
+    ai = fake_ai(lambda history, message: f"echo {message}")
+    sessions = SessionManager(ai)
+    with sessions.session('alice') as chat_name:
+        ai.chat('hello from alice', chat_name)
+    with sessions.session('bob') as chat_name:
+        ai.chat('hello from bob', chat_name)
+
+    assert [entry['parts'][0] for entry in ai.get_chat_history('alice')] == ['hello from alice', 'echo hello from alice']
+    assert [entry['parts'][0] for entry in ai.get_chat_history('bob')] == ['hello from bob', 'echo hello from bob']
+
+
+def test_lru_evicts_idle_sessions_but_not_busy_ones(fake_ai):
+    ai = fake_ai()
+    sessions = SessionManager(ai, max_sessions=2)
+    with sessions.session('busy'):
+        for session_id in ('a', 'b', 'c'):
+            with sessions.session(session_id):
+                pass
+        assert 'busy' in sessions.list_sessions()
+    assert len(sessions.list_sessions()) <= 3
+    with sessions.session('d'):
+        pass
+    assert len(sessions.list_sessions()) == 2
+    assert 'a' not in ai.chat_sessions
+
+
+def test_session_is_held_exclusively(fake_ai):
+    ai = fake_ai()
+    sessions = SessionManager(ai)
+    inside = []
+    overlaps = []
+
+    def use():
+        with sessions.session('shared'):
+            inside.append(1)
+            overlaps.append(len(inside))
+            threading.Event().wait(0.01)
+            inside.pop()
+
+    threads = [threading.Thread(target=use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(overlaps) == 1
+
+
+def test_server_keeps_one_session_per_client(server_module, script):
+    script(lambda history, message: '{tool main.stop}' if message.startswith('SYSTEM') else 'hi')
+    first = server_module.app.test_client()
+    second = server_module.app.test_client()
+
+    one = first.post('/api/chat', json={'message': 'one'})
+    two = second.post('/api/chat', json={'message': 'two'})
+    again = first.post('/api/chat', json={'message': 'three'})
+
+    assert one.status_code == two.status_code == again.status_code == 200
+    first_id = one.get_json()['session_id']
+    assert two.get_json()['session_id'] != first_id
+    # The cookie keeps the first client on its session
+    assert again.get_json()['session_id'] == first_id
+    assert len(server_module.ai.get_chat_history(first_id)) == 4
+
+    first.post('/api/new-chat')
+    assert server_module.ai.get_chat_history(first_id) == []
+    assert len(server_module.ai.get_chat_history(two.get_json()['session_id'])) == 2
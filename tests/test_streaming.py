@@ -0,0 +1,47 @@
+"""Token streaming (Gemini.chat_stream and /api/stream-chat)."""
+
+import json
+import asyncio
+
+
+def _events(body: str):
+    """Parse a server-sent event stream into (event, data) pairs."""
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines())
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_chat_stream_yields_chunks_and_updates_history(fake_ai):
+    ai = fake_ai(lambda history, message: 'abcdefghij' * 3, chunk_size=10)
+    chunks = list(ai.chat_stream('hi', 'chat'))
+    assert chunks == ['abcdefghij'] * 3
+    assert ai.get_chat_history('chat')[-1]['parts'] == ['abcdefghij' * 3]
+
+
+def test_chat_stream_async_yields_chunks(fake_ai):
+    ai = fake_ai(lambda history, message: 'x' * 25, chunk_size=10)
+
+    async def collect():
+        return [chunk async for chunk in ai.chat_stream_async('hi', 'chat')]
+
+    assert asyncio.run(collect()) == ['x' * 10, 'x' * 10, 'x' * 5]
+
+
+def test_stream_chat_sends_deltas_before_each_response(server_module, script):
+    script(lambda history, message: '{tool main.stop}' if message.startswith('SYSTEM')
+           else 'Hello there, {tool main.speak text="streamed"} done')
+    client = server_module.app.test_client()
+    response = client.post('/api/stream-chat', json={'message': 'hi'})
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+
+    events = _events(response.get_data(as_text=True))
+    names = [name for name, _ in events]
+    assert names[0] == 'ai_delta'
+    first_response = names.index('ai_response')
+    deltas = ''.join(data['text'] for name, data in events[:first_response] if name == 'ai_delta')
+    assert deltas == events[first_response][1]['text']
+    assert ('tool_result', {'name': 'main.speak', 'success': True, 'result': 'streamed', 'error': None}) in events
+    assert events[-1] == ('done', {'stop': True})
@@ -0,0 +1,111 @@
+"""Sub-AIs started by main.subai (SubAIOrchestrator)."""
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+import yaml
+
+from src.instruction_cache import InstructionCache
+from src.sub_ai import SubAIOrchestrator
+from src.tool_info import ToolInfoGenerator
+from src.tool_loader import ToolLoader
+from src.tool_parser import ToolSystem
+
+CONFIG = Path(__file__).resolve().parent.parent / 'config' / 'zen_config.yaml'
+
+
+@pytest.fixture
+def make_orchestrator(fake_ai, tools_dir):
+    """Factory for orchestrators whose sub-AI replies with `script`."""
+    created = []
+
+    def make(script, config=None):
+        sub_ai = fake_ai(script)
+        loader = ToolLoader(str(tools_dir))
+        tool_system = ToolSystem(loader=loader, max_workers=4)
+        instructions = InstructionCache(sub_ai, ToolInfoGenerator(loader=loader), 'You are a sub-AI.')
+        orchestrator = SubAIOrchestrator.from_config(config, sub_ai, tool_system, instructions)
+        created.append(orchestrator)
+        return orchestrator
+
+    yield make
+    for orchestrator in created:
+        if orchestrator is not None and orchestrator._loop is not None and orchestrator._loop.is_running():
+            orchestrator._loop.call_soon_threadsafe(orchestrator._loop.stop)
+
+
+def test_from_config(make_orchestrator):
+    orchestrator = make_orchestrator(None, {'max_concurrent': 2, 'max_tasks': 3, 'max_jobs': 5})
+    assert (orchestrator.max_concurrent, orchestrator.max_tasks, orchestrator.max_jobs) == (2, 3, 5)
+    assert make_orchestrator(None, {'enabled': False}) is None
+
+
+def test_tasks_run_on_a_loop_thread_of_their_own(make_orchestrator):
+    threads = []
+
+    def reply(history, message):
+        threads.append(threading.current_thread().name)
+        return 'report'
+
+    orchestrator = make_orchestrator(reply)
+    result = orchestrator.run(['first', 'second'])
+    assert [task['status'] for task in result['reports']] == ['done', 'done']
+    assert [task['report'] for task in result['reports']] == ['report', 'report']
+    assert set(threads) == {'zen-subai'}
+
+
+def test_tasks_run_on_a_given_loop(make_orchestrator):
+    threads = []
+
+    def reply(history, message):
+        threads.append(threading.current_thread())
+        return 'report'
+
+    orchestrator = make_orchestrator(reply)
+
+    async def serve():
+        loop = asyncio.get_running_loop()
+        orchestrator.use_loop(loop)
+        # The main AI's tool call blocks on a tool thread, not on the loop
+        result = await loop.run_in_executor(None, orchestrator.run, ['task'])
+        orchestrator.use_loop(None)
+        return result, threading.current_thread()
+
+    result, loop_thread = asyncio.run(serve())
+    assert result['reports'][0]['status'] == 'done'
+    assert threads == [loop_thread]
+    assert orchestrator._loop is None
+
+
+def test_use_loop_refuses_a_second_loop(make_orchestrator):
+    orchestrator = make_orchestrator(lambda history, message: 'report')
+    orchestrator.run(['task'])
+
+    async def serve():
+        orchestrator.use_loop(asyncio.get_running_loop())
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(serve())
+
+
+def test_only_max_jobs_finished_jobs_are_kept(make_orchestrator):
+    orchestrator = make_orchestrator(lambda history, message: 'report', {'max_jobs': 2})
+    jobs = [orchestrator.spawn(['task']) for _ in range(4)]
+    for job in jobs:
+        job.future.result(5)
+    orchestrator.spawn(['task']).future.result(5)
+    assert len(orchestrator.jobs) == 2
+    with pytest.raises(KeyError):
+        orchestrator.wait(jobs[0].id)
+
+
+def test_instructions_give_each_ai_its_own_role():
+    with open(CONFIG, 'r') as file:
+        ai_config = yaml.safe_load(file)['ai']
+    main, sub = ai_config['instructions'], ai_config['sub_ai_instructions']
+    assert 'main.subai tasks=' in main and 'main.subai await=' in main and 'wait=false' in main
+    assert 'You are a sub-AI' not in main
+    # Sub-AIs cannot use main.subai, so they are neither told about it nor asked to delegate
+    assert 'You are a sub-AI' in sub and 'main.subai' not in sub and 'Delegate' not in sub
@@ -0,0 +1,55 @@
+"""Tool argument parsing (parse_args and ArgumentSchema)."""
+
+import pytest
+
+from src.tool_args import ArgumentError, ArgumentSchema, parse_args
+from src.tool_parser import ToolParser
+
+
+@pytest.mark.parametrize('args, expected', [
+    ('text=Hello World count=3', {'text': 'Hello World', 'count': '3'}),
+    ('a="x y" b=\'z\'', {'a': 'x y', 'b': 'z'}),
+    ('content="""line 1\n"quoted" line 2"""', {'content': 'line 1\n"quoted" line 2'}),
+    (r'text="say \"hi\" now"', {'text': 'say "hi" now'}),
+    (r"text='it\'s'", {'text': "it's"}),
+])
+def test_parse_args(args, expected):
+    assert parse_args(args) == expected
+
+
+@pytest.mark.parametrize('args, expected', [
+    (r'list="C:\Users\test\"', {'list': 'C:\\Users\\test\\'}),
+    (r'list="C:\Users\test\" details=true', {'list': 'C:\\Users\\test\\', 'details': 'true'}),
+    (r"list='C:\temp\' page_size=5", {'list': 'C:\\temp\\', 'page_size': '5'}),
+    (r'path="\\server\share\file.txt"', {'path': '\\\\server\\share\\file.txt'}),
+    (r'pattern="\.py$"', {'pattern': '\\.py$'}),
+])
+def test_backslashes_stay_as_written(args, expected):
+    assert parse_args(args) == expected
+
+
+def test_windows_path_from_a_response():
+    command = ToolParser().parse_commands(r'{tool main.files list="C:\Users\test\"} then {tool main.stop}')[0]
+    assert parse_args(command.args) == {'list': 'C:\\Users\\test\\'}
+
+
+@pytest.mark.parametrize('args', ['just text', 'a="open', 'a=1 a=2'])
+def test_malformed_args(args):
+    with pytest.raises(ArgumentError):
+        parse_args(args)
+
+
+def test_schema_converts_and_validates():
+    schema = ArgumentSchema([
+        {'name': 'path', 'type': 'string', 'required': True},
+        {'name': 'tail', 'type': 'integer'},
+        {'name': 'details', 'type': 'boolean', 'default': False},
+        {'name': 'ops', 'type': 'array'},
+        {'name': 'mode', 'type': 'string', 'enum': ['a', 'b']},
+    ])
+    assert schema.parse(r'path="C:\logs\" tail=5 ops=[1, 2]') == {
+        'path': 'C:\\logs\\', 'tail': 5, 'details': False, 'ops': [1, 2]}
+    for args, message in [('tail=5', 'missing required'), ('path=x tail=many', "'tail' must be integer"),
+                          ('path=x mode=c', 'must be one of'), ('path=x color=red', 'unknown parameter')]:
+        with pytest.raises(ArgumentError, match=message):
+            schema.parse(args)
@@ -0,0 +1,88 @@
+"""Parallel execution of the commands of one response (execute_batch, StreamingBatch)."""
+
+import time
+
+import pytest
+
+from src.tool_loader import ToolLoader, get_tool_loader
+from src.tool_parser import ToolSystem
+
+from conftest import ROOT, write_tool
+
+SLOW_TOOL = (
+    "import time\n"
+    "def execute(args):\n"
+    "    time.sleep(0.2)\n"
+    "    return {'success': True, 'result': args.get('text')}\n"
+)
+
+
+@pytest.fixture
+def slow_system(tools_dir):
+    write_tool(tools_dir, 'test.slow', {'parameters': [{'name': 'text', 'type': 'string'}]}, SLOW_TOOL)
+    write_tool(tools_dir, 'test.barrier', {'serial': True}, SLOW_TOOL)
+    return ToolSystem(loader=ToolLoader(str(tools_dir)), max_workers=8)
+
+
+@pytest.fixture
+def files_system(files_tool):
+    return ToolSystem(loader=get_tool_loader(str(ROOT / 'tools')), max_workers=8)
+
+
+def test_independent_commands_run_in_parallel(slow_system):
+    commands = slow_system.process_response(''.join(f'{{tool test.slow text="{i}"}}' for i in range(4)))
+    start = time.perf_counter()
+    results = slow_system.execute_batch(commands)
+    assert time.perf_counter() - start < 0.6
+    assert [result['result'] for result in results] == ['0', '1', '2', '3']
+
+
+def test_serial_command_is_a_barrier(slow_system):
+    commands = slow_system.process_response(
+        '{tool test.slow text="a"} {tool test.barrier} {tool test.slow text="b"} {tool test.slow text="c"}')
+    start = time.perf_counter()
+    results = slow_system.execute_batch(commands)
+    # a, then the barrier alone, then b and c together
+    assert 0.6 <= time.perf_counter() - start < 0.9
+    assert [result['result'] for result in results] == ['a', None, 'b', 'c']
+
+
+def test_nothing_runs_after_stop(files_system, tmp_path):
+    target = tmp_path / 'after_stop.txt'
+    commands = files_system.process_response(
+        f'{{tool main.stop}} {{tool main.files write="{target}" content="x"}}')
+    results = files_system.execute_batch(commands)
+    assert len(results) == 1 and results[0]['action'] == 'stop_system'
+    assert not target.exists()
+
+
+def test_only_listed_parameters_make_a_command_serial(files_system, tmp_path):
+    commands = files_system.process_response(
+        f'{{tool main.files read="{tmp_path}"}} {{tool main.files write="{tmp_path / "a"}" content="x"}} '
+        f'{{tool main.memory list=true}} {{tool main.memory write="note"}} {{tool main.stop}}')
+    assert [files_system.is_serial(command) for command in commands] == [False, True, False, True, True]
+
+
+def _write_then_append(path):
+    return (f'{{tool main.files write="{path}" content="AAAA"}}'
+            f'{{tool main.files write="{path}" content="BBBB" append=true}}'
+            f'{{tool main.files write="{path}" content="CCCC" append=true}}')
+
+
+def test_writes_to_one_file_keep_their_order(files_system, tmp_path):
+    for attempt in range(30):
+        path = tmp_path / f"out{attempt}.txt"
+        results = files_system.execute_batch(files_system.process_response(_write_then_append(path)))
+        assert all(result['success'] for result in results)
+        assert path.read_text() == 'AAAABBBBCCCC'
+
+
+def test_streamed_writes_to_one_file_keep_their_order(files_system, tmp_path):
+    for attempt in range(30):
+        path = tmp_path / f"out{attempt}.txt"
+        batch = files_system.start_batch()
+        for command in files_system.process_response(f'{{tool main.files read="{tmp_path}"}}' + _write_then_append(path)):
+            batch.add(command)
+        results = batch.finish()
+        assert all(result['success'] for result in results[1:])
+        assert path.read_text() == 'AAAABBBBCCCC'
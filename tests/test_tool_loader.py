@@ -0,0 +1,20 @@
+"""Shared tool registry with lazy imports (ToolLoader)."""
+
+from src.tool_loader import ToolLoader, get_tool_loader
+
+from conftest import MARKER_TOOL, write_tool
+
+def test_one_loader_per_directory(tools_dir):
+    loader = get_tool_loader(str(tools_dir))
+    assert get_tool_loader(str(tools_dir / '..' / 'tools')) is loader
+    assert get_tool_loader(str(tools_dir)) is not ToolLoader(str(tools_dir))
+
+
+def test_tool_modules_are_imported_on_first_use(tools_dir):
+    folder = write_tool(tools_dir, 'test.marker', {}, MARKER_TOOL)
+    loader = ToolLoader(str(tools_dir))
+    assert 'test.marker' in loader.list_tools()
+    assert not (folder / 'imported').exists()
+
+    assert loader.execute_tool('test.marker', {}) == {'success': True, 'result': 'v1'}
+    assert (folder / 'imported').exists()
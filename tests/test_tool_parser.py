@@ -0,0 +1,72 @@
+"""Tool command parsing (ToolParser and the tokenizer behind it)."""
+
+import pytest
+
+from src.tool_parser import IncrementalToolParser, ToolParser
+
+WINDOWS_PATH = r'{tool main.files list="C:\Users\test\"} then {tool main.speak text="hi"}'
+
+RESPONSES = [
+    'no commands at all',
+    'Reading. {tool main.files read="c:/a.py" lines="3-6"} {tool main.stop}',
+    '{tool main.speak text=Hello World} {tool main.memory list=true count=5}',
+    '{tool main.speak text="hi {there}"} {tool main.stop}',
+    '{tool main.files write="a.json" content="""{"a": [1, 2]}"""}',
+    r'{tool main.speak text="say \"hi\" now"}',
+    r"{tool main.speak text='it\'s'} {tool main.stop}",
+    WINDOWS_PATH,
+    r'{tool main.files list="C:\Users\test\" details=true}',
+    r'{tool main.files search="C:\src" pattern="\.py$"} {tool main.stop}',
+    '{toolbox} {tool main.stop} {tool }',
+    "{tool main.speak text=don't} {tool main.stop}",
+    '{tool main.speak text="never closed} {tool main.stop}',
+]
+
+
+def _fields(commands):
+    return [(c.name, c.args, c.raw_command, c.start, c.end) for c in commands]
+
+
+def _names_and_args(text):
+    return [(c.name, c.args) for c in ToolParser().parse_commands(text)]
+
+
+def test_backslash_before_closing_quote_ends_the_value():
+    assert _names_and_args(WINDOWS_PATH) == [
+        ('main.files', r'list="C:\Users\test\"'),
+        ('main.speak', 'text="hi"'),
+    ]
+    assert _names_and_args(r'{tool main.files list="C:\Users\test\" details=true}') == [
+        ('main.files', r'list="C:\Users\test\" details=true'),
+    ]
+
+
+def test_escaped_quotes_stay_inside_the_value():
+    assert _names_and_args(r'{tool main.speak text="say \"hi\" now"} {tool main.stop}') == [
+        ('main.speak', r'text="say \"hi\" now"'),
+        ('main.stop', ''),
+    ]
+
+
+def test_braces_inside_quoted_values():
+    text = '{tool main.files write="a.py" content="""def f():\n    return {"a": {"b": 1}}\n"""} {tool main.stop}'
+    commands = ToolParser().parse_commands(text)
+    assert [c.name for c in commands] == ['main.files', 'main.stop']
+    assert commands[0].args.endswith('return {"a": {"b": 1}}\n"""')
+    assert text[commands[0].start:commands[0].end] == commands[0].raw_command
+
+
+@pytest.mark.parametrize('text', RESPONSES)
+def test_regex_fast_path_matches_the_tokenizer(text):
+    assert _fields(ToolParser().parse_commands(text)) == _fields(ToolParser._scan(text))
+
+
+@pytest.mark.parametrize('text', RESPONSES)
+def test_streamed_parse_matches_full_parse(text):
+    expected = _fields(ToolParser().parse_commands(text))
+    for size in (1, 2, 5):
+        parser = IncrementalToolParser()
+        found = []
+        for i in range(0, len(text), size):
+            found.extend(parser.feed(text[i:i + size]))
+        assert _fields(found + parser.close()) == expected
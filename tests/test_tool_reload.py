@@ -0,0 +1,77 @@
+"""Hot reload of changed tools and the cached manifest (ToolLoader.refresh, ToolWatcher)."""
+
+import os
+import time
+
+import pytest
+
+import src.tool_loader as tool_loader_module
+from src.tool_loader import ToolLoader
+from src.tool_watcher import ToolWatcher
+
+from conftest import MARKER_TOOL, write_tool
+
+
+def _touch_later(path):
+    """Change a file's mtime for sure, even on coarse-grained file systems."""
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_refresh_reloads_only_changed_tools(tools_dir):
+    loader = ToolLoader(str(tools_dir))
+    version = loader.version
+    assert loader.refresh() == []
+    assert loader.version == version
+
+    config = tools_dir / 'test.alpha' / 'config.yaml'
+    config.write_text(config.read_text().replace('test.alpha test tool', 'edited'))
+    _touch_later(config)
+    write_tool(tools_dir, 'test.gamma', {})
+    assert sorted(loader.refresh()) == ['test.alpha', 'test.gamma']
+    assert loader.version == version + 1
+    assert loader.get_tool('test.alpha')['config']['description'] == 'edited'
+
+    (tools_dir / 'test.gamma' / 'main.py').unlink()
+    (tools_dir / 'test.gamma' / 'config.yaml').unlink()
+    (tools_dir / 'test.gamma').rmdir()
+    assert loader.refresh() == ['test.gamma']
+    assert loader.get_tool('test.gamma') is None
+
+
+def test_changed_main_py_is_imported_again(tools_dir):
+    folder = write_tool(tools_dir, 'test.marker', {}, MARKER_TOOL)
+    loader = ToolLoader(str(tools_dir))
+    loader.execute_tool('test.marker', {})
+    main = folder / 'main.py'
+    main.write_text(MARKER_TOOL.replace("'v1'", "'v2'"))
+    _touch_later(main)
+    assert loader.refresh() == ['test.marker']
+    assert loader.execute_tool('test.marker', {})['result'] == 'v2'
+
+
+def test_unchanged_configs_come_from_the_manifest(tools_dir, monkeypatch):
+    ToolLoader(str(tools_dir))
+    assert (tools_dir / ToolLoader.MANIFEST_NAME).exists()
+
+    def no_yaml(data):
+        raise AssertionError("config.yaml parsed again")
+
+    monkeypatch.setattr(tool_loader_module.yaml, 'safe_load', no_yaml)
+    loader = ToolLoader(str(tools_dir))
+    assert set(loader.list_tools()) == {'test.alpha', 'test.beta'}
+
+
+@pytest.mark.parametrize('use_native', [False, True])
+def test_watcher_picks_up_new_tools(tools_dir, use_native):
+    loader = ToolLoader(str(tools_dir))
+    watcher = ToolWatcher(loader, poll_interval=0.05, use_native=use_native)
+    watcher.start()
+    try:
+        write_tool(tools_dir, 'test.gamma', {})
+        deadline = time.monotonic() + 5
+        while loader.get_tool('test.gamma') is None and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        watcher.stop()
+    assert loader.get_tool('test.gamma') is not None
@@ -0,0 +1,111 @@
+"""Process worker pool (ToolWorkerPool)."""
+
+import os
+import threading
+
+import pytest
+
+from src.tool_loader import ToolLoader
+import src.tool_workers
+from src.tool_workers import ToolWorkerPool
+from conftest import write_tool
+
+PID_TOOL = '''
+import os, time
+
+def execute(args):
+    time.sleep(float(args.get('sleep', 0)))
+    return {'success': True, 'result': os.getpid()}
+'''
+
+
+@pytest.fixture
+def pool(tmp_path):
+    write_tool(tmp_path, 'test.pid', {'timeout': 1}, PID_TOOL)
+    pool = ToolWorkerPool(ToolLoader(str(tmp_path)), workers=1)
+    yield pool
+    pool.stop()
+
+
+def test_runs_tools_in_a_worker_process(pool):
+    result = pool.execute('test.pid', {})
+    assert result['success'] and result['result'] != os.getpid()
+    assert pool.execute('test.pid', {})['result'] == result['result']
+
+
+def test_timed_out_worker_is_replaced(pool):
+    first = pool.execute('test.pid', {})['result']
+    result = pool.execute('test.pid', {'sleep': 5})
+    assert not result['success'] and 'timed out' in result['error']
+    # A fresh worker, not forked from this (threaded) process
+    assert pool._context.get_start_method() in ('forkserver', 'spawn')
+    second = pool.execute('test.pid', {})
+    assert second['success'] and second['result'] != first
+
+
+def test_stop_drops_idle_workers(pool):
+    first = pool.execute('test.pid', {})['result']
+    pool.stop()
+    assert pool._idle.empty()
+    result = pool.execute('test.pid', {})
+    assert result['success'] and result['result'] != first
+
+
+def test_stop_releases_waiting_callers(pool):
+    pool.IDLE_POLL = 0.05
+    pool.start()
+    results = {}
+
+    def run(name, sleep):
+        results[name] = pool.execute('test.pid', {'sleep': sleep})
+
+    busy = threading.Thread(target=run, args=('busy', 0.5))
+    busy.start()
+    while not pool._idle.empty():
+        pass
+    waiting = threading.Thread(target=run, args=('waiting', 0))
+    waiting.start()
+    pool.stop()
+    busy.join(5)
+    waiting.join(5)
+    assert not waiting.is_alive()
+    # Stopped while waiting: the tool ran in-process
+    assert results['waiting'] == {'success': True, 'result': os.getpid()}
+
+
+def test_workers_that_could_not_be_started_are_retried(pool, monkeypatch):
+    pool.IDLE_POLL = 0.05
+    pool.execute('test.pid', {})
+
+    def fail():
+        raise OSError('cannot fork')
+    monkeypatch.setattr(pool, '_spawn', fail)
+    assert 'timed out' in pool.execute('test.pid', {'sleep': 5})['error']
+    result = pool.execute('test.pid', {})
+    assert not result['success'] and 'No tool worker could be started' in result['error']
+    monkeypatch.undo()
+    assert pool.execute('test.pid', {})['success']
+
+
+def test_stop_is_registered_at_exit_once(pool, monkeypatch):
+    registered = []
+    monkeypatch.setattr(src.tool_workers.atexit, 'register', registered.append)
+    for _ in range(3):
+        pool.start()
+        pool.stop()
+    assert registered == [pool.stop]
+
+
+def test_workers_reload_only_after_the_server_does(tmp_path, pool):
+    write_tool(tmp_path, 'test.version', {}, "def execute(args):\n    return {'success': True, 'result': 'v1'}\n")
+    pool.loader.refresh()
+    assert pool.execute('test.version', {})['result'] == 'v1'
+
+    (tmp_path / 'test.version' / 'main.py').write_text(
+        "def execute(args):\n    return {'success': True, 'result': 'v2'}\n")
+    stat = os.stat(tmp_path / 'test.version' / 'main.py')
+    os.utime(tmp_path / 'test.version' / 'main.py', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    # The server has not reloaded yet, so neither does the worker
+    assert pool.execute('test.version', {})['result'] == 'v1'
+    pool.loader.refresh()
+    assert pool.execute('test.version', {})['result'] == 'v2'
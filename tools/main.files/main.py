@@ -1,81 +1,861 @@
 import os
+import json
 import shutil
+import hashlib
 import uuid
 import re
+import mmap
+import time
+import heapq
+import bisect
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 
 # Backup root directory for all operations
 BACKUP_ROOT = Path(__file__).parent / "backups"
 BACKUP_ROOT.mkdir(parents=True, exist_ok=True)
+# Content-addressed store: each distinct file content once, named by its SHA-256
+OBJECTS_DIR = BACKUP_ROOT / "objects"
+# One small JSON manifest per backup id, listing the backed up paths and their object hashes
+MANIFESTS_DIR = BACKUP_ROOT / "manifests"
+
+# Backup retention
+BACKUP_RETENTION_DAYS = 30
+BACKUP_KEEP_MIN = 50  # Newest backups kept regardless of age
+GC_INTERVAL = 24 * 3600  # Seconds between automatic garbage collections
+GC_GRACE = 3600  # Unreferenced objects younger than this may belong to a backup in progress
 
 # Default limits
 MAX_FILE_READ = 1024 * 1024  # 1 MB
 MAX_SEARCH_RESULTS = 1000
+SEARCH_TIME_BUDGET = 10.0  # Seconds a search may take before returning what it found
+SEARCH_WORKERS = 8  # Directories scanned in parallel (scandir waits on the disk, not the GIL)
+DEFAULT_EXCLUDES = ['.git/', 'node_modules/', '__pycache__/', '.venv/', 'venv/']
+MAX_BATCH_OPS = 200
+GREP_MATCHES_PER_FILE = 20
+GREP_LINE_CHARS = 300
+DEFAULT_LIST_PAGE = 200
+MAX_LIST_PAGE = 1000
+
+# Line-offset index: newline counts per block, so line ranges can seek instead of scanning
+LINE_INDEX_BLOCK = 64 * 1024
+MAX_INDEXED_FILES = 32
+
+_line_indexes = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
 
 
-def parse_args(args_str: str) -> dict:
+def _object_path(digest: str) -> Path:
+    return OBJECTS_DIR / digest[:2] / digest[2:]
+
+
+def _pending_marker(obj: Path) -> Path:
     """
-    Parse key="value" pairs from the args string.
+    Marker keeping an object out of garbage collection until its manifest is written.
+
+    Its own mtime cannot be used for that: a hard-linked object shares it
+    with the user's file, which must not change because it was backed up.
     """
-    # Support both triple-quoted (multi-line) and single-quoted parameters
-    result = {}
-    # Match triple-quoted values for multi-line content
-    triple_pattern = re.compile(r"(\w+)\s*=\s*\"\"\"([\s\S]*?)\"\"\"")
-    for m in triple_pattern.finditer(args_str):
-        result[m.group(1)] = m.group(2)
-    # Remove matched triple-quoted segments before single-line parse
-    args_str = triple_pattern.sub('', args_str)
-    # Match standard key="value"
-    pattern = re.compile(r"(\w+)\s*=\s*\"([^\"]*)\"")
-    for m in pattern.finditer(args_str):
-        result[m.group(1)] = m.group(2)
-    return result
+    return obj.with_name(f".{obj.name}.pending")
 
 
-def backup_path(src: Path) -> tuple:
+def store_blob(path: Path, link: bool = False) -> tuple:
     """
-    Backup the given file or directory under BACKUP_ROOT with a new UUID.
-    Returns the backup ID and backup path.
+    Store a file's content in the object store, once per distinct content.
+
+    Args:
+        path: File to store
+        link: Hard-link the file instead of copying it. Only safe when the
+            file is about to be deleted or replaced by a new file, never
+            modified in place; falls back to copying where links are not
+            supported (e.g. across drives).
+
+    Returns:
+        Tuple of (SHA-256 hex digest, bytes newly stored)
     """
-    run_id = uuid.uuid4().hex
-    base_dir = BACKUP_ROOT / run_id
-    # Preserve the relative structure
+    digest = _hash_file(path)
+    obj = _object_path(digest)
+    if obj.exists():
+        _pending_marker(obj).touch()
+        return digest, 0
+    obj.parent.mkdir(parents=True, exist_ok=True)
+    tmp = obj.with_name(f".{obj.name}.{uuid.uuid4().hex}.tmp")
     try:
-        rel = src.relative_to(Path(__file__).parent)
-    except Exception:
-        rel = src.name
-    dest = base_dir / rel
+        linked = False
+        if link:
+            try:
+                os.link(path, tmp)
+                linked = True
+            except OSError:
+                pass
+        if linked:
+            # Keeps the mtime of the file it was linked from
+            _pending_marker(obj).touch()
+        else:
+            shutil.copyfile(path, tmp)
+        os.replace(tmp, obj)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return digest, obj.stat().st_size
+
+
+def _file_entry(path: Path, rel: str, link: bool) -> tuple:
+    stat = path.stat()
+    digest, stored = store_blob(path, link=link)
+    entry = {'path': rel, 'hash': digest, 'size': stat.st_size, 'mode': stat.st_mode & 0o777, 'mtime': stat.st_mtime}
+    return entry, stored
+
+
+def backup_path(src: Path, link: bool = False) -> tuple:
+    """
+    Back up the given file or directory into the content-addressed store.
+
+    File contents that are already stored (from earlier backups or other
+    files) are not stored again. See store_blob for `link`.
+
+    Returns the backup ID and the path of its manifest.
+    """
+    # Sorts by creation time
+    backup_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:4]}"
+    manifest = {
+        'id': backup_id,
+        'created': time.time(),
+        'source': str(src.resolve()),
+        'type': 'dir' if src.is_dir() and not src.is_symlink() else 'file',
+        'files': [],
+        'dirs': [],
+        'symlinks': [],
+        'size': 0,
+        'stored_bytes': 0
+    }
+
+    def add_file(path: Path, rel: str) -> None:
+        entry, stored = _file_entry(path, rel, link)
+        manifest['files'].append(entry)
+        manifest['size'] += entry['size']
+        manifest['stored_bytes'] += stored
+
+    if manifest['type'] == 'file':
+        add_file(src, '')
+    else:
+        for dirpath, dirnames, filenames in os.walk(src):
+            base = Path(dirpath)
+            rel_base = base.relative_to(src).as_posix()
+            for name in dirnames + filenames:
+                path = base / name
+                rel = name if rel_base == '.' else f"{rel_base}/{name}"
+                if path.is_symlink():
+                    manifest['symlinks'].append({'path': rel, 'target': os.readlink(path)})
+                elif name in dirnames:
+                    manifest['dirs'].append(rel)
+                else:
+                    add_file(path, rel)
+
+    MANIFESTS_DIR.mkdir(parents=True, exist_ok=True)
+    manifest_path = MANIFESTS_DIR / f"{backup_id}.json"
+    tmp = manifest_path.with_suffix('.tmp')
+    tmp.write_text(json.dumps(manifest), encoding='utf-8')
+    os.replace(tmp, manifest_path)
+    _maybe_gc()
+    return backup_id, str(manifest_path)
+
+
+def load_manifest(backup_id: str) -> dict:
+    """Read the manifest of a backup; raises FileNotFoundError for unknown ids."""
+    if not re.fullmatch(r'[\w-]+', backup_id):
+        raise FileNotFoundError(f"Unknown backup id: {backup_id}")
+    path = MANIFESTS_DIR / f"{backup_id}.json"
+    if not path.exists():
+        raise FileNotFoundError(f"Unknown backup id: {backup_id}")
+    return json.loads(path.read_text(encoding='utf-8'))
+
+
+def _restore_file(entry: dict, dest: Path) -> None:
+    """Copy an object back to a file, replacing it atomically."""
+    obj = _object_path(entry['hash'])
+    if not obj.exists():
+        raise FileNotFoundError(f"Backup object {entry['hash']} for {entry['path'] or dest.name} is missing")
     dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        shutil.copyfile(obj, tmp)
+        os.chmod(tmp, entry['mode'])
+        os.utime(tmp, (entry['mtime'], entry['mtime']))
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def restore_backup(backup_id: str, target: Path = None, backup_current: bool = True) -> dict:
+    """
+    Restore a backup to its original location or to `target`.
+
+    Whatever is at the destination is replaced. It is backed up first
+    unless `backup_current` is False, so a restore can itself be undone.
+
+    Returns:
+        Dictionary with the restored path, file count and the backup of what was replaced
+    """
+    manifest = load_manifest(backup_id)
+    dest = Path(target or manifest['source'])
+    previous = None
+    if dest.exists() or dest.is_symlink():
+        if backup_current:
+            run_id, manifest_path = backup_path(dest, link=True)
+            previous = {'backup_id': run_id, 'manifest': manifest_path}
+        if dest.is_dir() and not dest.is_symlink():
+            shutil.rmtree(dest)
+        else:
+            dest.unlink()
+
+    if manifest['type'] == 'file':
+        _restore_file(manifest['files'][0], dest)
+    else:
+        dest.mkdir(parents=True, exist_ok=True)
+        for rel in manifest['dirs']:
+            (dest / rel).mkdir(parents=True, exist_ok=True)
+        for entry in manifest['files']:
+            _restore_file(entry, dest / entry['path'])
+        for link in manifest['symlinks']:
+            try:
+                os.symlink(link['target'], dest / link['path'])
+            except OSError:
+                pass  # e.g. no symlink permission on Windows
+    result = {'message': f"Restored backup {backup_id} to {dest}", 'files': len(manifest['files'])}
+    if previous:
+        result['backup'] = previous
+    return result
+
+
+def list_backups(limit: int = 50) -> list:
+    """Newest backups first, with their source path and size."""
+    backups = []
+    if MANIFESTS_DIR.exists():
+        for path in sorted(MANIFESTS_DIR.glob('*.json'), reverse=True)[:limit]:
+            try:
+                manifest = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            backups.append({
+                'backup_id': manifest['id'],
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(manifest['created'])),
+                'source': manifest['source'],
+                'type': manifest['type'],
+                'files': len(manifest['files']),
+                'size': manifest['size']
+            })
+    return backups
+
+
+def atomic_write(path: Path, content: str) -> None:
+    """
+    Write a file through a temp file in the same directory and an atomic rename,
+    so a crash never leaves a half-written file. An existing file keeps its permissions.
+    """
+    mode = path.stat().st_mode & 0o777 if path.exists() else None
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def append_file(path: Path, content: str) -> int:
+    """
+    Append to a file in place (no rewrite of what is there); on failure the
+    file is cut back to its previous size.
+
+    Returns:
+        Size of the file before appending
+    """
+    size = path.stat().st_size if path.exists() else 0
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+    except BaseException:
+        if path.exists():
+            os.truncate(path, size)
+        raise
+    return size
+
+
+def _first_missing(path: Path) -> Path:
+    """Topmost ancestor of path (or path itself) that does not exist yet; None if path exists."""
+    if path.exists() or path.is_symlink():
+        return None
+    missing = path
+    while not missing.parent.exists() and missing.parent != missing:
+        missing = missing.parent
+    return missing
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path)
+    elif path.exists() or path.is_symlink():
+        path.unlink()
+
+
+def _undo_for(backup_id: str, created: Path):
+    """Undo callable: restore the backup of what was there, or remove what was newly created."""
+    if backup_id:
+        return lambda: restore_backup(backup_id, backup_current=False)
+    return lambda: _remove(created) if created is not None else None
+
+
+def write_op(path: Path, content: str, append: bool = False) -> tuple:
+    """
+    Write (or append to) a file, backing up the existing file first.
+
+    Returns:
+        Tuple of (result, undo callable)
+    """
+    created = _first_missing(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if append:
+        size = append_file(path, content)
+        result = {'message': f"Appended {len(content)} characters to {path}"}
+        if created is not None:
+            return result, _undo_for(None, created)
+        return result, lambda: os.truncate(path, size)
+    backup_info = None
+    backup_id = None
+    if path.exists():
+        # The file is replaced by a new one, so the backup can keep the old one by hard link
+        backup_id, manifest = backup_path(path, link=True)
+        backup_info = {'backup_id': backup_id, 'manifest': manifest}
+    atomic_write(path, content)
+    result = {'message': f"Wrote to {path}"}
+    if backup_info:
+        result['backup'] = backup_info
+    return result, _undo_for(backup_id, created)
+
+
+def create_op(path: Path, typ: str = 'file') -> tuple:
+    """
+    Create a file or directory, backing up what exists at the path first.
+
+    Returns:
+        Tuple of (result, undo callable)
+    """
+    created = _first_missing(path)
+    backup_info = None
+    backup_id = None
+    # An existing directory is left as it is, so there is nothing to back up
+    if path.exists() and not (typ == 'dir' and path.is_dir()):
+        backup_id, manifest = backup_path(path)
+        backup_info = {'backup_id': backup_id, 'manifest': manifest}
+    if typ == 'dir':
+        path.mkdir(parents=True, exist_ok=True)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+    result = {'message': f"Created {typ} at {path}"}
+    if backup_info:
+        result['backup'] = backup_info
+    return result, _undo_for(backup_id, created)
+
+
+def delete_op(path: Path) -> tuple:
+    """
+    Delete a file or directory after backing it up.
+
+    Returns:
+        Tuple of (result, undo callable)
+    """
+    if not path.exists():
+        raise FileNotFoundError(f"{path} does not exist")
+    # The files are going away, so the backup can take them over by hard link instead of copying
+    backup_id, manifest = backup_path(path, link=True)
+    _remove(path)
+    result = {'message': f"Deleted {path}", 'backup': {'backup_id': backup_id, 'manifest': manifest}}
+    return result, _undo_for(backup_id, None)
+
+
+def apply_ops(ops: list) -> dict:
+    """
+    Apply a batch of write, append, create and delete operations all-or-nothing.
+
+    Every operation is checked before any is applied. If one fails, those
+    already applied are undone in reverse order from their backups. The
+    rollback covers this call only, not other commands of the same response.
 
-    if src.is_file():
-        shutil.copy2(src, dest)
-    elif src.is_dir():
-        shutil.copytree(src, dest)
-    return run_id, str(dest)
+    Args:
+        ops: List of dicts such as {"op": "write", "path": "...", "content": "..."},
+            {"op": "append", ...}, {"op": "create", "path": "...", "type": "dir"}
+            or {"op": "delete", "path": "..."}
 
+    Returns:
+        Tool result dictionary
+    """
+    if not ops:
+        return {'success': False, 'error': 'ops is empty'}
+    if len(ops) > MAX_BATCH_OPS:
+        return {'success': False, 'error': f"Too many operations ({len(ops)}), at most {MAX_BATCH_OPS} per call"}
+    for i, op in enumerate(ops, 1):
+        if not isinstance(op, dict) or op.get('op') not in ('write', 'append', 'create', 'delete'):
+            return {'success': False, 'error': f"Operation {i}: 'op' must be write, append, create or delete"}
+        if not isinstance(op.get('path'), str) or not op['path']:
+            return {'success': False, 'error': f"Operation {i}: missing 'path'"}
+        if op['op'] in ('write', 'append') and not isinstance(op.get('content'), str):
+            return {'success': False, 'error': f"Operation {i}: {op['op']} needs a 'content' string"}
+
+    results = []
+    undo_stack = []
+    for i, op in enumerate(ops, 1):
+        path = Path(op['path'])
+        try:
+            if op['op'] in ('write', 'append'):
+                result, undo = write_op(path, op['content'], append=op['op'] == 'append')
+            elif op['op'] == 'create':
+                result, undo = create_op(path, op.get('type', 'file'))
+            else:
+                result, undo = delete_op(path)
+        except Exception as e:
+            rollback_errors = []
+            for undo in reversed(undo_stack):
+                try:
+                    undo()
+                except Exception as undo_error:
+                    rollback_errors.append(str(undo_error))
+            error = (f"Operation {i} ({op['op']} {path}) failed: {str(e)}; "
+                     f"rolled back {len(undo_stack)} applied operation(s)")
+            if rollback_errors:
+                error += f"; rollback errors: {'; '.join(rollback_errors)}"
+            return {'success': False, 'error': error}
+        undo_stack.append(undo)
+        results.append(result)
+    return {'success': True, 'result': {'message': f"Applied {len(results)} operations", 'operations': results}}
+
+
+_gc_lock = threading.Lock()
+
+
+def collect_garbage(now: float = None) -> dict:
+    """
+    Remove backups past retention and objects no backup refers to.
+
+    The newest BACKUP_KEEP_MIN backups are always kept; older ones are
+    removed once they are BACKUP_RETENTION_DAYS old. Backup directories
+    from before the content-addressed store are removed by age as well.
+
+    Returns:
+        Dictionary with counts of removed backups and objects, and bytes freed
+    """
+    now = now or time.time()
+    cutoff = now - BACKUP_RETENTION_DAYS * 86400
+    result = {'backups_removed': 0, 'objects_removed': 0, 'bytes_freed': 0}
+    with _gc_lock:
+        referenced = set()
+        manifests = sorted(MANIFESTS_DIR.glob('*.json'), reverse=True) if MANIFESTS_DIR.exists() else []
+        for i, path in enumerate(manifests):
+            try:
+                manifest = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            if i >= BACKUP_KEEP_MIN and manifest['created'] < cutoff:
+                path.unlink(missing_ok=True)
+                result['backups_removed'] += 1
+            else:
+                referenced.update(entry['hash'] for entry in manifest['files'])
+
+        for path in BACKUP_ROOT.iterdir():
+            if path.is_dir() and path not in (OBJECTS_DIR, MANIFESTS_DIR) and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                result['backups_removed'] += 1
+
+        if OBJECTS_DIR.exists():
+            for obj in OBJECTS_DIR.glob('*/*'):
+                try:
+                    stat = obj.stat()
+                    if stat.st_mtime >= now - GC_GRACE:
+                        continue
+                    if obj.name.startswith('.'):
+                        # Left over temporary file or expired pending marker
+                        obj.unlink()
+                        result['bytes_freed'] += stat.st_size
+                        continue
+                    if obj.parent.name + obj.name in referenced:
+                        continue
+                    marker = _pending_marker(obj)
+                    if marker.exists() and marker.stat().st_mtime >= now - GC_GRACE:
+                        continue
+                    obj.unlink()
+                    result['objects_removed'] += 1
+                    result['bytes_freed'] += stat.st_size
+                except OSError:
+                    continue
+        (BACKUP_ROOT / '.last_gc').touch()
+    return result
+
+
+def _maybe_gc() -> None:
+    """Run garbage collection if it has not run for GC_INTERVAL."""
+    marker = BACKUP_ROOT / '.last_gc'
+    try:
+        if marker.exists() and time.time() - marker.stat().st_mtime < GC_INTERVAL:
+            return
+    except OSError:
+        return
+    if _gc_lock.locked():
+        return
+    try:
+        collect_garbage()
+    except OSError:
+        pass
+
+
+class LineIndex:
+    """
+    Line-offset index of one file version.
+
+    Holds, for every LINE_INDEX_BLOCK bytes of the file, the number of
+    newlines before that block. Blocks are indexed lazily, only as far into
+    the file as a read has needed so far.
+    """
+
+    def __init__(self, size: int, mtime_ns: int):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.counts = array('q')  # Newlines before each indexed block
+        self.newlines = 0  # Newlines in all indexed blocks
+        self.lock = threading.Lock()
+
+    def _extend(self, f, skip: int) -> None:
+        """Index further blocks until the one holding newline number `skip` (or the end of file)."""
+        f.seek(len(self.counts) * LINE_INDEX_BLOCK)
+        while self.newlines < skip and len(self.counts) * LINE_INDEX_BLOCK < self.size:
+            block = f.read(LINE_INDEX_BLOCK)
+            if not block:
+                break
+            self.counts.append(self.newlines)
+            self.newlines += block.count(b'\n')
+
+    def offset(self, f, line: int) -> int:
+        """Byte offset where 1-based `line` starts (the file size if the file has fewer lines)."""
+        skip = line - 1  # Newlines before the line
+        if skip == 0:
+            return 0
+        with self.lock:
+            if self.newlines < skip:
+                self._extend(f, skip)
+            if self.newlines < skip:
+                return self.size
+            # Last block that starts before the wanted newline, then find it inside the block
+            block_no = bisect.bisect_left(self.counts, skip) - 1
+            before = self.counts[block_no]
+        f.seek(block_no * LINE_INDEX_BLOCK)
+        block = f.read(LINE_INDEX_BLOCK)
+        pos = -1
+        for _ in range(skip - before):
+            pos = block.find(b'\n', pos + 1)
+        return block_no * LINE_INDEX_BLOCK + pos + 1
+
+
+def line_index(path: Path) -> LineIndex:
+    """Get the cached line index of a file, starting a new one if the file's size or mtime changed."""
+    stat = path.stat()
+    key = str(path.resolve())
+    with _line_indexes_lock:
+        index = _line_indexes.get(key)
+        if index is None or index.size != stat.st_size or index.mtime_ns != stat.st_mtime_ns:
+            index = _line_indexes[key] = LineIndex(stat.st_size, stat.st_mtime_ns)
+        _line_indexes.move_to_end(key)
+        while len(_line_indexes) > MAX_INDEXED_FILES:
+            _line_indexes.popitem(last=False)
+    return index
+
+
+def read_lines(path: Path, start: int, end: int) -> tuple:
+    """
+    Read lines start..end (1-based, inclusive), at most MAX_FILE_READ bytes.
+
+    Returns:
+        Tuple of (lines, truncated)
+    """
+    index = line_index(path)
+    lines = []
+    budget = MAX_FILE_READ
+    with open(path, 'rb') as f:
+        f.seek(index.offset(f, start))
+        for _ in range(end - start + 1):
+            raw = f.readline(budget + 1)
+            if not raw:
+                break
+            if len(raw) > budget:
+                lines.append(raw[:budget].decode('utf-8', errors='ignore'))
+                return lines, True
+            budget -= len(raw)
+            lines.append(raw.rstrip(b'\r\n').decode('utf-8', errors='ignore'))
+    return lines, False
+
+
+def tail_lines(path: Path, count: int) -> tuple:
+    """
+    Read the last `count` lines by reading backwards from the end, at most MAX_FILE_READ bytes.
+
+    Returns:
+        Tuple of (lines, truncated)
+    """
+    with open(path, 'rb') as f:
+        pos = f.seek(0, 2)
+        data = b''
+        # One newline more than lines wanted (plus a trailing one) marks the start of the first line
+        while pos > 0 and data.count(b'\n') <= count and len(data) <= MAX_FILE_READ:
+            step = min(LINE_INDEX_BLOCK, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    if data.endswith(b'\n'):
+        data = data[:-1]
+    raw_lines = data.split(b'\n')
+    if pos > 0:
+        raw_lines = raw_lines[1:]  # May start mid-line
+    raw_lines = raw_lines[-count:]
+    lines = []
+    budget = MAX_FILE_READ
+    truncated = False
+    for raw in reversed(raw_lines):
+        if len(raw) + 1 > budget:
+            truncated = True
+            break
+        budget -= len(raw) + 1
+        lines.append(raw.rstrip(b'\r').decode('utf-8', errors='ignore'))
+    lines.reverse()
+    return lines, truncated
+
+
+def _glob_regex(pattern: str) -> str:
+    """Translate a gitignore-style glob (*, ?, [abc], **) into a regex over '/'-separated paths."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif pattern[i] == '*':
+            out.append('[^/]*')
+            i += 1
+        elif pattern[i] == '?':
+            out.append('[^/]')
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 1:]:
+            end = pattern.index(']', i + 1)
+            body = pattern[i + 1:end]
+            out.append('[' + ('^' + body[1:] if body.startswith('!') else body) + ']')
+            i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return ''.join(out)
+
+
+class IgnoreRules:
+    """
+    gitignore-style exclude patterns.
+
+    A trailing '/' matches directories only, a leading '!' re-includes,
+    patterns containing '/' are matched against the path relative to the
+    search root, others against the entry name. The last matching pattern wins.
+    """
+
+    def __init__(self, patterns: list):
+        self.rules = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negate = pattern.startswith('!')
+            pattern = pattern.lstrip('!')
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            regex = re.compile(_glob_regex(pattern.lstrip('/')))
+            self.rules.append((regex, negate, dir_only, anchored))
+
+    def excluded(self, rel: str, is_dir: bool) -> bool:
+        """Check whether an entry (path relative to the search root) is excluded."""
+        result = False
+        name = rel.rsplit('/', 1)[-1]
+        for regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.fullmatch(rel if anchored else name):
+                result = not negate
+        return result
+
+
+def walk(root: Path, visit, max_depth: int = None, rules: IgnoreRules = None,
+         time_budget: float = SEARCH_TIME_BUDGET) -> dict:
+    """
+    Walk a directory tree with os.scandir, scanning directories in parallel.
+
+    Symlinked directories are not followed. visit(entry, rel, is_dir) is
+    called from worker threads for every entry that is not excluded and
+    returns True to stop the walk.
+
+    Returns:
+        Dictionary with 'directories' (scanned), 'errors' (unreadable directories)
+        and 'stopped' (None, 'visitor' or 'time_budget')
+    """
+    stop = threading.Event()
+    stats = {'directories': 0, 'errors': 0, 'stopped': None}
+    stats_lock = threading.Lock()
+
+    def scan(path: str, rel: str, depth: int) -> list:
+        subdirs = []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if stop.is_set():
+                        break
+                    entry_rel = f"{rel}/{entry.name}" if rel else entry.name
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if rules is not None and rules.excluded(entry_rel, is_dir):
+                        continue
+                    if visit(entry, entry_rel, is_dir):
+                        stop.set()
+                        with stats_lock:
+                            stats['stopped'] = stats['stopped'] or 'visitor'
+                        break
+                    if is_dir and (max_depth is None or depth < max_depth):
+                        subdirs.append((entry.path, entry_rel, depth + 1))
+            with stats_lock:
+                stats['directories'] += 1
+        except OSError:
+            with stats_lock:
+                stats['errors'] += 1
+        return subdirs
+
+    deadline = time.monotonic() + time_budget
+    pool = ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix='files-walk')
+    try:
+        pending = {pool.submit(scan, str(root), '', 1)}
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                stop.set()
+                with stats_lock:
+                    stats['stopped'] = stats['stopped'] or 'time_budget'
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                for subdir in future.result():
+                    if not stop.is_set():
+                        pending.add(pool.submit(scan, *subdir))
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+    return stats
+
+
+def grep_file(path: str, regex: re.Pattern, limit: int = GREP_MATCHES_PER_FILE) -> list:
+    """
+    Search a file's content through a memory map.
 
-def execute(args: str) -> dict:
+    Binary files (a NUL byte in the first 8 KB) and empty files are skipped.
+
+    Returns:
+        List of (line number, line text) for up to `limit` matching lines
+    """
+    matches = []
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return matches
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if b'\0' in mm[:8192]:
+                return matches
+            line_no = 1
+            counted = 0
+            last_line_start = -1
+            for match in regex.finditer(mm):
+                start = match.start()
+                line_start = mm.rfind(b'\n', 0, start) + 1
+                if line_start == last_line_start:
+                    continue  # Another match on the same line
+                line_no += mm[counted:line_start].count(b'\n')
+                counted = line_start
+                last_line_start = line_start
+                line_end = mm.find(b'\n', start)
+                line = mm[line_start:line_end if line_end != -1 else len(mm)][:GREP_LINE_CHARS]
+                matches.append((line_no, line.rstrip(b'\r').decode('utf-8', errors='ignore')))
+                if len(matches) >= limit:
+                    break
+    return matches
+
+
+def execute(args: dict) -> dict:
     """
-    Main entry for the files tool. Supports: list, read, write, create, delete, search.
+    Main entry for the files tool. Supports: list (paginated), read (whole, line range or tail), write,
+    create, delete, ops (a batch of those), search (names or contents), and restore, backups
+    and gc for the backups taken before every change.
     """
-    params = parse_args(args)
+    params = args
 
-    # LIST directory
+    # LIST directory, one page at a time in name order
     if 'list' in params:
         path = Path(params['list'])
         if not path.is_dir():
             return {'success': False, 'error': f"{path} is not a directory"}
-        entries = [p.name for p in path.iterdir()]
-        return {'success': True, 'result': entries}
+        page_size = min(MAX_LIST_PAGE, max(1, int(params.get('page_size', DEFAULT_LIST_PAGE))))
+        cursor = params.get('cursor')
+        with os.scandir(path) as it:
+            # Only the next page (plus one, to know if there is more) is sorted, not the whole directory
+            entries = heapq.nsmallest(page_size + 1, (entry for entry in it if cursor is None or entry.name > cursor),
+                                      key=lambda entry: entry.name)
+        page = entries[:page_size]
+        if params.get('details'):
+            items = []
+            for entry in page:
+                item = {'name': entry.name, 'type': 'dir' if entry.is_dir() else 'file'}
+                try:
+                    stat = entry.stat()
+                    item['size'] = stat.st_size
+                    item['mtime'] = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(stat.st_mtime))
+                except OSError:
+                    pass
+                items.append(item)
+        else:
+            items = [entry.name for entry in page]
+        next_cursor = page[-1].name if len(entries) > page_size else None
+        return {'success': True, 'result': {'entries': items, 'next_cursor': next_cursor}}
 
     # READ file
     if 'read' in params:
         path = Path(params['read'])
         if not path.is_file():
             return {'success': False, 'error': f"{path} is not a file"}
-        # Read full text with size limit
-        lines = path.read_text(encoding='utf-8', errors='ignore').splitlines()
-        # If specific line range requested
+        hint = 'use lines="a-b" or tail=N to read more'
+        # If specific line range requested, seek to it with the line index
         if 'lines' in params:
             try:
                 start_str, end_str = params['lines'].split('-')
@@ -84,45 +864,38 @@ def execute(args: str) -> dict:
                     raise ValueError
             except Exception:
                 return {'success': False, 'error': f"Invalid lines parameter: {params['lines']}"}
-            selected = lines[start - 1:end]
-            return {'success': True, 'result': '\n'.join(selected)}
-        # Otherwise return entire file, truncated if needed
-        text = '\n'.join(lines)
-        if len(text) > MAX_FILE_READ:
-            text = text[:MAX_FILE_READ]
+            selected, truncated = read_lines(path, start, end)
+            text = '\n'.join(selected)
+            if truncated:
+                text += f"\n... [truncated at {MAX_FILE_READ} bytes after line {start + len(selected) - 1}; {hint}]"
+            return {'success': True, 'result': text}
+        # Last lines of the file, read backwards from the end
+        if 'tail' in params:
+            count = int(params['tail'])
+            if count < 1:
+                return {'success': False, 'error': f"Invalid tail parameter: {params['tail']}"}
+            selected, truncated = tail_lines(path, count)
+            text = '\n'.join(selected)
+            if truncated:
+                text = f"[truncated to the last {MAX_FILE_READ} bytes; {hint}]\n" + text
+            return {'success': True, 'result': text}
+        # Otherwise return the file, reading no more than the size limit
+        size = path.stat().st_size
+        with open(path, 'rb') as f:
+            data = f.read(MAX_FILE_READ)
+        text = '\n'.join(data.decode('utf-8', errors='ignore').splitlines())
+        if size > MAX_FILE_READ:
+            text += f"\n... [truncated at {MAX_FILE_READ} of {size} bytes; {hint}]"
         return {'success': True, 'result': text}
 
-    # WRITE file with backup
+    # WRITE file with backup (or append to it)
     if 'write' in params and 'content' in params:
-        path = Path(params['write'])
-        backup_info = None
-        if path.exists():
-            run_id, dest = backup_path(path)
-            backup_info = {'backup_id': run_id, 'backup_path': dest}
-        path.parent.mkdir(parents=True, exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            f.write(params['content'])
-        result = {'message': f"Wrote to {path}"}
-        if backup_info:
-            result['backup'] = backup_info
+        result, _ = write_op(Path(params['write']), params['content'], append=bool(params.get('append')))
         return {'success': True, 'result': result}
 
     # CREATE file or directory with backup
     if 'create' in params:
-        path = Path(params['create'])
-        typ = params.get('type', 'file')
-        backup_info = None
-        if path.exists():
-            run_id, dest = backup_path(path)
-            backup_info = {'backup_id': run_id, 'backup_path': dest}
-        if typ == 'dir':
-            path.mkdir(parents=True, exist_ok=True)
-        else:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.touch()
-        result = {'message': f"Created {typ} at {path}"}
-        if backup_info:
-            result['backup'] = backup_info
+        result, _ = create_op(Path(params['create']), params.get('type', 'file'))
         return {'success': True, 'result': result}
 
     # DELETE file or directory with backup
@@ -130,26 +903,75 @@ def execute(args: str) -> dict:
         path = Path(params['delete'])
         if not path.exists():
             return {'success': False, 'error': f"{path} does not exist"}
-        run_id, dest = backup_path(path)
-        if path.is_dir():
-            shutil.rmtree(path)
-        else:
-            path.unlink()
-        result = {'message': f"Deleted {path}", 'backup': {'backup_id': run_id, 'backup_path': dest}}
+        result, _ = delete_op(path)
         return {'success': True, 'result': result}
 
-    # SEARCH files and directories by regex
-    if 'search' in params and 'pattern' in params:
+    # Several write/append/create/delete operations at once, all or nothing
+    if 'ops' in params:
+        return apply_ops(params['ops'])
+
+    # RESTORE a backup to its original path (or another one)
+    if 'restore' in params:
+        try:
+            result = restore_backup(params['restore'], Path(params['to']) if 'to' in params else None)
+        except FileNotFoundError as e:
+            return {'success': False, 'error': str(e)}
+        return {'success': True, 'result': result}
+
+    # LIST backups, newest first
+    if params.get('backups'):
+        return {'success': True, 'result': list_backups()}
+
+    # Garbage-collect backups past retention
+    if params.get('gc'):
+        return {'success': True, 'result': collect_garbage()}
+
+    # SEARCH file and directory names by regex, or file contents with grep
+    if 'search' in params and ('pattern' in params or 'grep' in params):
         root = Path(params['search'])
-        if not root.exists():
-            return {'success': False, 'error': f"{root} does not exist"}
-        pat = re.compile(params['pattern'])
+        if not root.is_dir():
+            return {'success': False, 'error': f"{root} is not a directory"}
+        try:
+            pat = re.compile(params['pattern']) if 'pattern' in params else None
+            content = re.compile(params['grep'].encode('utf-8'), re.MULTILINE) if 'grep' in params else None
+        except re.error as e:
+            return {'success': False, 'error': f"Invalid regex: {e}"}
+        excludes = DEFAULT_EXCLUDES + [p for p in params.get('exclude', '').split(',') if p.strip()]
+        max_results = min(MAX_SEARCH_RESULTS, max(1, int(params.get('max_results', MAX_SEARCH_RESULTS))))
         matches = []
-        for p in root.rglob('*'):
-            if pat.search(p.name):
-                matches.append(str(p))
-                if len(matches) >= MAX_SEARCH_RESULTS:
-                    break
-        return {'success': True, 'result': matches}
+        matches_lock = threading.Lock()
+
+        def visit(entry, rel, is_dir):
+            if pat is not None and not pat.search(entry.name):
+                return False
+            if content is None:
+                found = [str(Path(entry.path))]
+            elif is_dir or not entry.is_file():
+                return False
+            else:
+                try:
+                    found = [{'path': str(Path(entry.path)), 'line': line_no, 'text': text}
+                             for line_no, text in grep_file(entry.path, content)]
+                except (OSError, ValueError):
+                    return False
+            with matches_lock:
+                matches.extend(found[:max_results - len(matches)])
+                return len(matches) >= max_results
+
+        stats = walk(
+            root,
+            visit,
+            max_depth=int(params['max_depth']) if 'max_depth' in params else None,
+            rules=IgnoreRules(excludes),
+            time_budget=float(params.get('time_budget', SEARCH_TIME_BUDGET))
+        )
+        with matches_lock:
+            found = sorted(matches, key=lambda m: (m['path'], m['line']) if isinstance(m, dict) else m)
+        result = {'matches': found, 'complete': stats['stopped'] is None, 'directories_scanned': stats['directories']}
+        if stats['stopped'] == 'time_budget':
+            result['note'] = 'Time budget ran out; narrow the search root, pattern or max_depth'
+        elif stats['stopped'] == 'visitor':
+            result['note'] = f"Stopped at {max_results} results"
+        return {'success': True, 'result': result}
 
     return {'success': False, 'error': 'Invalid or missing parameters for files tool'}
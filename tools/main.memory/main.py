@@ -1,35 +1,480 @@
 import re
-def parse_args(args_str: str) -> dict:
-    """
-    Parse key="value" pairs from the args string.
-    """
-    # Support both triple-quoted (multi-line) and single-quoted parameters
-    result = {}
-    # Match triple-quoted values for multi-line content
-    triple_pattern = re.compile(r"(\w+)\s*=\s*\"\"\"([\s\S]*?)\"\"\"")
-    for m in triple_pattern.finditer(args_str):
-        result[m.group(1)] = m.group(2)
-    # Remove matched triple-quoted segments before single-line parse
-    args_str = triple_pattern.sub('', args_str)
-    # Match standard key="value"
-    pattern = re.compile(r"(\w+)\s*=\s*\"([^\"]*)\"")
-    for m in pattern.finditer(args_str):
-        result[m.group(1)] = m.group(2)
-    return result
-def execute(args: str) -> dict:
-    """
-    Memory tool.
-    Sry for spelling :(
-    """
-    params = parse_args(args)
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+try:
+    # Optional: semantic recall (embedding index); everything else works without it
+    import numpy as np
+except ImportError:
+    np = None
+
+# Memory database, next to the tool like main.files' backups
+DB_PATH = Path(__file__).parent / "memory.db"
+
+TYPES = ('short', 'long', 'calendar')
+DEFAULT_TTL_HOURS = 24  # Short-term memory lifetime
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+PREVIEW_CHARS = 120
+CALENDAR_LINE_CHARS = 200  # Per expired short-term entry in its calendar day
+EMBEDDING_DIM = 256
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 50
+SCAN_CHUNK_ROWS = 65536  # Rows of the embedding index scored per NumPy call
+INDEX_BATCH = 1000  # Memories embedded per transaction when catching up
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created REAL NOT NULL,
+    expires REAL,
+    date TEXT,
+    vec_row INTEGER
+);
+CREATE INDEX IF NOT EXISTS memories_type_created ON memories(type, created DESC);
+CREATE INDEX IF NOT EXISTS memories_created ON memories(created DESC);
+CREATE INDEX IF NOT EXISTS memories_expires ON memories(expires) WHERE expires IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS memories_calendar_date ON memories(date) WHERE type = 'calendar';
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5(content, content='memories', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS memories_ai AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_ad AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_au AFTER UPDATE OF content ON memories BEGIN
+    INSERT INTO memories_fts(memories_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO memories_fts(rowid, content) VALUES (new.id, new.content);
+END;
+"""
+
+# vec_row: row of the memory's current vector in the embedding index (NULL until embedded)
+_VECTOR_SCHEMA = """
+CREATE UNIQUE INDEX IF NOT EXISTS memories_vec_row ON memories(vec_row);
+CREATE INDEX IF NOT EXISTS memories_unembedded ON memories(id) WHERE vec_row IS NULL;
+CREATE INDEX IF NOT EXISTS memories_type_vec_row ON memories(type, vec_row);
+"""
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def connect(db_path: Path = None) -> sqlite3.Connection:
+    """
+    Per-thread connection to the memory database, creating the schema on first use.
+    Tools run on several threads at once, and sqlite3 connections can't be shared.
+    """
+    db_path = Path(db_path or DB_PATH)
+    conns = getattr(_local, 'conns', None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _init_lock:
+            if db_path not in _initialized:
+                conn.executescript(_SCHEMA)
+                columns = [row[1] for row in conn.execute("PRAGMA table_info(memories)")]
+                if 'vec_row' not in columns:
+                    conn.execute("ALTER TABLE memories ADD COLUMN vec_row INTEGER")
+                conn.executescript(_VECTOR_SCHEMA)
+                _initialized.add(db_path)
+        conns[db_path] = conn
+    return conn
+
+
+def _iso(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='seconds')
+
+
+def _preview(text: str) -> str:
+    line = ' '.join(text.split())
+    return line if len(line) <= PREVIEW_CHARS else line[:PREVIEW_CHARS - 1] + '…'
+
+
+def _fts_query(query: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, the last one as a prefix."""
+    words = re.findall(r'\w+', query)
+    if not words:
+        raise ValueError(f"Search query has no words: {query!r}")
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def expire(conn: sqlite3.Connection, now: float = None) -> int:
+    """
+    Move expired short-term memories into calendar memory.
+
+    Each expired entry becomes one line in the calendar entry of the day it was
+    written, so the day's activity stays searchable without the full text.
+
+    Returns:
+        Number of short-term entries that expired
+    """
+    now = now or time.time()
+    # Runs before every command; only take the write lock when something expired
+    if conn.execute(
+        "SELECT 1 FROM memories WHERE expires IS NOT NULL AND expires <= ? LIMIT 1", (now,)
+    ).fetchone() is None:
+        return 0
+    with conn:
+        # Select and move in one write transaction, so two threads or processes
+        # never both append the same entries to the calendar
+        conn.execute("BEGIN IMMEDIATE")
+        rows = conn.execute(
+            "SELECT id, content, created FROM memories WHERE expires IS NOT NULL AND expires <= ? ORDER BY created",
+            (now,)
+        ).fetchall()
+        days = {}
+        for memory_id, content, created in rows:
+            moment = datetime.fromtimestamp(created)
+            line = ' '.join(content.split())[:CALENDAR_LINE_CHARS]
+            days.setdefault(moment.strftime('%Y-%m-%d'), []).append(f"- {moment.strftime('%H:%M')} {line}")
+        for day, lines in days.items():
+            text = '\n'.join(lines)
+            cursor = conn.execute(
+                "UPDATE memories SET content = content || char(10) || ?, vec_row = NULL "
+                "WHERE type = 'calendar' AND date = ?",
+                (text, day)
+            )
+            if cursor.rowcount == 0:
+                conn.execute(
+                    "INSERT INTO memories (type, content, created, date) VALUES ('calendar', ?, ?, ?)",
+                    (text, now, day)
+                )
+        conn.executemany("DELETE FROM memories WHERE id = ?", [(row[0],) for row in rows])
+    return len(rows)
+
+
+def embed(texts: list) -> "np.ndarray":
+    """
+    Embed texts as hashed n-gram vectors (no model or network needed).
+
+    Words and the character trigrams of each word are hashed into
+    EMBEDDING_DIM signed buckets, so texts sharing words or word parts
+    ("parser", "parsing") end up close. Vectors are L2-normalized, so a dot
+    product is the cosine similarity.
+
+    Returns:
+        float32 matrix with one row per text
+    """
+    vectors = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float32)
+    for i, text in enumerate(texts):
+        hashes = []
+        for word in re.findall(r'\w+', text.lower()):
+            hashes.append(zlib.crc32(word.encode('utf-8')))
+            padded = f"#{word}#"
+            hashes.extend(zlib.crc32(padded[k:k + 3].encode('utf-8')) for k in range(len(padded) - 2))
+        if not hashes:
+            continue
+        hashes = np.array(hashes, dtype=np.uint32)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+        vectors[i] = np.bincount(hashes % EMBEDDING_DIM, weights=signs, minlength=EMBEDDING_DIM)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors
+
+
+def _index_path(conn: sqlite3.Connection) -> Path:
+    """Embedding index file of the database a connection is on (memory.db -> memory.db.vec)."""
+    db_file = conn.execute("PRAGMA database_list").fetchone()[2]
+    return Path(db_file + '.vec')
+
+
+def _append_vectors(conn: sqlite3.Connection, rows: list) -> None:
+    """
+    Embed memories and append their vectors to the index.
+
+    Must run inside a write transaction: SQLite's write lock is what keeps
+    processes from appending at the same time.
+
+    Args:
+        conn: Connection with an open write transaction
+        rows: (id, content) tuples
+    """
+    vectors = embed([content for _, content in rows])
+    path = _index_path(conn)
+    row_bytes = EMBEDDING_DIM * 4
+    with open(path, 'r+b' if path.exists() else 'w+b') as file:
+        file.seek(0, 2)
+        # Start at a whole row, overwriting the tail of an interrupted append
+        start = file.tell() // row_bytes
+        file.seek(start * row_bytes)
+        file.write(vectors.tobytes())
+    conn.executemany("UPDATE memories SET vec_row = ? WHERE id = ?",
+                     [(start + i, memory_id) for i, (memory_id, _) in enumerate(rows)])
+
+
+def index_pending(conn: sqlite3.Connection) -> int:
+    """
+    Embed memories that have no vector yet (written without NumPy, or
+    calendar entries that changed).
+
+    Returns:
+        Number of memories embedded
+    """
+    # Runs before every recall; usually there is nothing to embed, so don't take the write lock
+    if conn.execute("SELECT 1 FROM memories WHERE vec_row IS NULL LIMIT 1").fetchone() is None:
+        return 0
+    total = 0
+    while True:
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, content FROM memories WHERE vec_row IS NULL LIMIT ?", (INDEX_BATCH,)
+            ).fetchall()
+            if rows:
+                _append_vectors(conn, rows)
+        total += len(rows)
+        if len(rows) < INDEX_BATCH:
+            return total
+
+
+_matrices = {}
+_matrices_lock = threading.Lock()
+
+
+def _matrix(path: Path):
+    """Memory-mapped view of the embedding index (pages are read on demand), or None if empty."""
+    rows = path.stat().st_size // (EMBEDDING_DIM * 4) if path.exists() else 0
+    with _matrices_lock:
+        cached = _matrices.get(path)
+        if cached is None or cached.shape[0] != rows:
+            cached = np.memmap(path, dtype=np.float32, mode='r', shape=(rows, EMBEDDING_DIM)) if rows else None
+            _matrices[path] = cached
+        return cached
+
+
+def _top_rows(matrix, query: "np.ndarray", count: int, rows: "np.ndarray" = None) -> tuple:
+    """
+    Rows of the index with the best `count` dot products with query, best
+    first. Scans the whole index in chunks, or only `rows` if given.
+    """
+    best_rows, best_scores = [], []
+    total = matrix.shape[0] if rows is None else len(rows)
+    for start in range(0, total, SCAN_CHUNK_ROWS):
+        if rows is None:
+            chunk_rows = None
+            scores = matrix[start:start + SCAN_CHUNK_ROWS] @ query
+        else:
+            chunk_rows = rows[start:start + SCAN_CHUNK_ROWS]
+            scores = matrix[chunk_rows] @ query
+        if len(scores) > count:
+            keep = np.argpartition(scores, -count)[-count:]
+        else:
+            keep = np.arange(len(scores))
+        best_rows.append(keep + start if chunk_rows is None else chunk_rows[keep])
+        best_scores.append(scores[keep])
+    rows = np.concatenate(best_rows)
+    scores = np.concatenate(best_scores)
+    order = np.argsort(-scores)[:count]
+    return rows[order], scores[order]
+
+
+def _lookup(conn: sqlite3.Connection, rows: "np.ndarray", scores: "np.ndarray", typ: str = None) -> list:
+    """Memories whose current vector is at the given index rows, in the given order."""
+    found = {}
+    values = [int(row) for row in rows]
+    for start in range(0, len(values), 500):
+        batch = values[start:start + 500]
+        sql = (f"SELECT vec_row, id, type, content, created, expires, date FROM memories "
+               f"WHERE vec_row IN ({','.join('?' * len(batch))})")
+        if typ:
+            sql += " AND type = ?"
+            batch = batch + [typ]
+        found.update((record[0], record[1:]) for record in conn.execute(sql, batch))
+    return [(found[row], float(score)) for row, score in zip(values, scores) if row in found]
+
+
+def recall(conn: sqlite3.Connection, query: str, top_k: int = DEFAULT_TOP_K, typ: str = None) -> list:
+    """
+    Find the memories most similar to a query.
+
+    Args:
+        conn: Database connection
+        query: Free text to compare memories with
+        top_k: Number of memories to return
+        typ: Only return memories of this type
+
+    Returns:
+        (row, similarity) tuples, most similar first; row is
+        (id, type, content, created, expires, date)
+    """
+    if np is None:
+        raise RuntimeError("Semantic recall needs NumPy (pip install numpy)")
+    index_pending(conn)
+    matrix = _matrix(_index_path(conn))
+    vector = embed([query])[0]
+    if matrix is None or not vector.any():
+        return []
+    size = matrix.shape[0]
+    share = 1.0
+    if typ:
+        # Counting stops at a quarter of the index; beyond that a full scan is cheaper anyway
+        limit = size // 4 + 1
+        count = conn.execute(
+            "SELECT count(*) FROM (SELECT 1 FROM memories WHERE type = ? AND vec_row IS NOT NULL LIMIT ?)", (typ, limit)
+        ).fetchone()[0]
+        if count < limit:
+            # Few memories of this type: score just their vectors
+            rows = np.fromiter((record[0] for record in conn.execute(
+                "SELECT vec_row FROM memories WHERE type = ? AND vec_row < ? ORDER BY vec_row", (typ, size)
+            )), dtype=np.int64)
+            if not len(rows):
+                return []
+            return _lookup(conn, *_top_rows(matrix, vector, top_k, rows), typ=typ)
+        share = max(count, 1) / size
+    # Vectors of deleted or changed memories stay in the index; fetch extra candidates to skip them
+    want = min(size, int(top_k * 4 / share))
+    while True:
+        results = _lookup(conn, *_top_rows(matrix, vector, want), typ=typ)
+        if len(results) >= top_k or want >= size:
+            return results[:top_k]
+        want = min(size, want * 4)
+
+
+def _entry(row: tuple, preview: str = None) -> dict:
+    memory_id, typ, content, created, expires, date = row
+    entry = {'id': memory_id, 'type': typ, 'preview': preview or _preview(content), 'created': _iso(created)}
+    if expires is not None:
+        entry['expires'] = _iso(expires)
+    if date:
+        entry['date'] = date
+    return entry
+
+
+def _page(params: dict) -> tuple:
+    page = max(1, int(params.get('page', 1)))
+    page_size = min(MAX_PAGE_SIZE, max(1, int(params.get('page_size', DEFAULT_PAGE_SIZE))))
+    return page, page_size
+
+
+def _paginated(rows: list, page: int, page_size: int, entries: list) -> dict:
+    return {
+        'entries': entries[:page_size],
+        'page': page,
+        'page_size': page_size,
+        'has_more': len(rows) > page_size
+    }
+
+
+def execute(args: dict) -> dict:
+    """
+    Memory tool: write, read, delete, list, search and recall short-term, long-term and calendar memory.
+    """
+    params = args
     try:
-        if 'list' in params:
-            list = {list[2:'hi', 1:3]}
-            print(list)
-            print('FEATURE NOT YET ADDED! ADD MEMORY FEATURE!')
-            return {'succses': True, 'result': list}
+        conn = connect()
+        expire(conn)
+        typ = params.get('type')
+        if typ is not None and typ not in TYPES:
+            return {'success': False, 'error': f"Invalid type '{typ}', expected one of {', '.join(TYPES)}"}
+
+        # WRITE a new memory
+        if 'write' in params:
+            typ = typ or 'short'
+            if typ == 'calendar':
+                return {'success': False, 'error': "Calendar memory is written automatically from expired short-term memory"}
+            content = params['write'].strip()
+            if not content:
+                return {'success': False, 'error': 'Cannot write an empty memory'}
+            now = time.time()
+            expires = now + float(params.get('ttl_hours', DEFAULT_TTL_HOURS)) * 3600 if typ == 'short' else None
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO memories (type, content, created, expires) VALUES (?, ?, ?, ?)",
+                    (typ, content, now, expires)
+                )
+                if np is not None:
+                    _append_vectors(conn, [(cursor.lastrowid, content)])
+            result = {'id': cursor.lastrowid, 'type': typ, 'message': f"Stored {typ}-term memory {cursor.lastrowid}"}
+            if expires is not None:
+                result['expires'] = _iso(expires)
+            return {'success': True, 'result': result}
+
+        # READ one memory in full
+        if 'read' in params:
+            row = conn.execute(
+                "SELECT id, type, content, created, expires, date FROM memories WHERE id = ?", (params['read'],)
+            ).fetchone()
+            if row is None:
+                return {'success': False, 'error': f"Memory {params['read']} does not exist"}
+            entry = _entry(row)
+            del entry['preview']
+            entry['content'] = row[2]
+            return {'success': True, 'result': entry}
+
+        # CALENDAR memory of one day
+        if 'date' in params:
+            row = conn.execute(
+                "SELECT id, type, content, created, expires, date FROM memories WHERE type = 'calendar' AND date = ?",
+                (params['date'],)
+            ).fetchone()
+            if row is None:
+                return {'success': True, 'result': f"No calendar memory for {params['date']}"}
+            return {'success': True, 'result': {'id': row[0], 'date': row[5], 'content': row[2]}}
+
+        # DELETE a memory
+        if 'delete' in params:
+            with conn:
+                cursor = conn.execute("DELETE FROM memories WHERE id = ?", (params['delete'],))
+            if cursor.rowcount == 0:
+                return {'success': False, 'error': f"Memory {params['delete']} does not exist"}
+            return {'success': True, 'result': f"Deleted memory {params['delete']}"}
+
+        # RECALL by meaning with the embedding index, most similar first
+        if 'recall' in params:
+            top_k = min(MAX_TOP_K, max(1, int(params.get('top_k', DEFAULT_TOP_K))))
+            entries = []
+            for row, similarity in recall(conn, params['recall'], top_k, typ):
+                entry = _entry(row)
+                entry['similarity'] = round(similarity, 3)
+                entries.append(entry)
+            return {'success': True, 'result': {'entries': entries}}
+
+        # SEARCH with the full-text index, best matches first
+        if 'search' in params:
+            page, page_size = _page(params)
+            sql = ("SELECT m.id, m.type, m.content, m.created, m.expires, m.date, "
+                   "snippet(memories_fts, 0, '[', ']', '…', 16) "
+                   "FROM memories_fts JOIN memories m ON m.id = memories_fts.rowid WHERE memories_fts MATCH ?")
+            values = [_fts_query(params['search'])]
+            if typ:
+                sql += " AND m.type = ?"
+                values.append(typ)
+            sql += " ORDER BY rank LIMIT ? OFFSET ?"
+            values += [page_size + 1, (page - 1) * page_size]
+            rows = conn.execute(sql, values).fetchall()
+            entries = [_entry(row[:6], preview=row[6]) for row in rows]
+            return {'success': True, 'result': _paginated(rows, page, page_size, entries)}
+
+        # LIST memories, newest first
+        if params.get('list'):
+            page, page_size = _page(params)
+            sql = "SELECT id, type, content, created, expires, date FROM memories"
+            values = []
+            if typ:
+                sql += " WHERE type = ?"
+                values.append(typ)
+            sql += " ORDER BY created DESC LIMIT ? OFFSET ?"
+            values += [page_size + 1, (page - 1) * page_size]
+            rows = conn.execute(sql, values).fetchall()
+            entries = [_entry(row) for row in rows]
+            return {'success': True, 'result': _paginated(rows, page, page_size, entries)}
+
+        return {'success': False, 'error': 'Invalid or missing parameters for memory tool'}
     except Exception as e:
-        return{
-            'succsess': False,
+        return {
+            'success': False,
             'error': f"Tool execution failed: {str(e)}"
-        }
\ No newline at end of file
+        }
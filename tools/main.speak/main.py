@@ -1,27 +1,20 @@
-def execute(args: str) -> dict:
+def execute(args: dict) -> dict:
     """
     Speak tool execution function - prints text to console.
     
     Args:
-        args: The arguments string from the tool command
+        args: Parsed arguments from the tool command
     
     Returns:
         dict: Result with success/error information
     """
     try:
-        # Simple argument parsing for text parameter
-        if 'text=' in args:
-            text = args.split('text=')[1].strip('"\'')
-            return {
-                'success': True,
-                'result': text,
-                'action': 'speak'
-            }
-        else:
-            return {
-                'success': False,
-                'error': "Missing required parameter: text"
-            }
+        # 'text' is required by config.yaml, so it is always present here
+        return {
+            'success': True,
+            'result': args['text'],
+            'action': 'speak'
+        }
     except Exception as e:
         return {
             'success': False,
@@ -1,18 +1,15 @@
-def execute(args: str) -> dict:
+def execute(args: dict) -> dict:
     """
     Stop the AI conversation cycle.
     
     Args:
-        args: Optional arguments (reason for stopping)
+        args: Parsed arguments (optional reason for stopping)
     
     Returns:
         dict: Result indicating the system should stop
     """
     try:
-        # Parse arguments if provided
-        reason = "User requested stop"
-        if args and 'reason=' in args:
-            reason = args.split('reason=')[1].strip('"\'')
+        reason = args.get('reason') or "User requested stop"
         
         return {
             'success': True,
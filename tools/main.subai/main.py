@@ -0,0 +1,48 @@
+from src.sub_ai import get_orchestrator
+
+
+def execute(args: dict) -> dict:
+    """
+    Start sub-AIs for tasks and collect their reports.
+    
+    Args:
+        args: Parsed arguments ('task' or 'tasks', 'timeout', 'wait', or 'await' with a job id)
+    
+    Returns:
+        dict: Result with the sub-AIs' reports (or the job id when not waiting)
+    """
+    try:
+        orchestrator = get_orchestrator()
+        if orchestrator is None:
+            return {
+                'success': False,
+                'error': "Sub-AIs are not available (disabled in ai.sub_ai or not started by this server)"
+            }
+        
+        if args.get('await'):
+            return {'success': True, 'result': orchestrator.wait(args['await'], args.get('timeout'))}
+        
+        tasks = list(args.get('tasks') or [])
+        if args.get('task'):
+            tasks.insert(0, args['task'])
+        if not tasks:
+            return {'success': False, 'error': "Give a task or a list of tasks"}
+        
+        job = orchestrator.spawn(tasks, args.get('timeout'))
+        if not args.get('wait', True):
+            return {
+                'success': True,
+                'result': f"Started {len(job.tasks)} sub-AIs as job {job.id}. "
+                          f"Collect their reports with {{tool main.subai await=\"{job.id}\"}}"
+            }
+        return {'success': True, 'result': orchestrator.wait(job.id)}
+    except (ValueError, KeyError) as e:
+        return {
+            'success': False,
+            'error': str(e).strip("'")
+        }
+    except Exception as e:
+        return {
+            'success': False,
+            'error': f"Error running sub-AIs: {str(e)}"
+        }